@@ -0,0 +1,154 @@
+# _helper/bq_scheduler.py
+# Process-wide scheduler for BigQuery jobs.
+# Every job goes through one queue that admits at most `limit` jobs at a time,
+# highest priority first (FIFO within a priority), and at most DML_PER_TABLE
+# mutating jobs per table. Rate-limit and quota errors are retried with
+# full-jitter exponential backoff, and each one halves the limit; successful
+# jobs grow it back by roughly one per `limit` jobs (AIMD), so concurrency
+# settles just under what the project's quotas allow.
+import itertools
+import os
+import random
+import threading
+import time
+
+from _helper.timing import span
+
+MAX_CONCURRENCY = int(os.getenv("BQ_MAX_CONCURRENCY", "8"))
+DML_PER_TABLE = int(os.getenv("BQ_DML_PER_TABLE", "2"))  # BigQuery runs 2 mutating DML per table at once
+RETRIES = int(os.getenv("BQ_JOB_RETRIES", "5"))
+BACKOFF = float(os.getenv("BQ_BACKOFF", "1"))
+BACKOFF_MAX = float(os.getenv("BQ_BACKOFF_MAX", "32"))
+
+# Priorities: lower runs first
+FETCH = 0
+WRITE = 1
+HOUSEKEEPING = 2
+PRIORITY_NAMES = {FETCH: "fetch", WRITE: "write", HOUSEKEEPING: "housekeeping"}
+
+_THROTTLE_REASONS = {"rateLimitExceeded", "quotaExceeded", "jobRateLimitExceeded", "backendError"}
+_THROTTLE_MESSAGES = ("exceeded rate limits", "quota exceeded", "too many dml statements outstanding",
+                      "too many concurrent", "could not serialize access")
+
+
+def is_throttled(error):
+    """True for errors that mean "slow down and try again" rather than a broken job"""
+    if getattr(error, "code", None) in (429, 503):
+        return True
+    for entry in getattr(error, "errors", None) or ():
+        if isinstance(entry, dict) and entry.get("reason") in _THROTTLE_REASONS:
+            return True
+    message = str(error).lower()
+    return any(m in message for m in _THROTTLE_MESSAGES)
+
+
+class JobScheduler:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, retries=RETRIES, backoff=BACKOFF,
+                 backoff_max=BACKOFF_MAX, dml_per_table=DML_PER_TABLE, min_concurrency=1):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.dml_per_table = dml_per_table
+        self._limit = float(self.max_concurrency)
+        self._epoch = 0  # bumped on every decrease, so one burst of throttles halves the limit once
+        self._cond = threading.Condition()
+        self._queue = {}  # (priority, seq) -> table of each waiting job
+        self._seq = itertools.count()
+        self._running = 0
+        self._tables = {}  # table -> running DML jobs
+        self._counts = {"jobs": 0, "throttled": 0, "retries": 0, "failed": 0, "max_queued": 0}
+        self._waits = {}  # priority name -> [jobs, total ms, max ms]
+
+    def _table_free(self, table):
+        return table is None or self._tables.get(table, 0) < self.dml_per_table
+
+    def _admissible(self, ticket):
+        if self._running >= int(self._limit):
+            return False
+        # First in line among the jobs whose table has room, so a DML job waiting
+        # on its table does not hold up the jobs behind it
+        return min((t for t, table in self._queue.items() if self._table_free(table)), default=None) == ticket
+
+    def _acquire(self, priority, table):
+        start = time.perf_counter()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            self._queue[ticket] = table
+            self._counts["max_queued"] = max(self._counts["max_queued"], len(self._queue))
+            while not self._admissible(ticket):
+                self._cond.wait()
+            del self._queue[ticket]
+            self._running += 1
+            if table is not None:
+                self._tables[table] = self._tables.get(table, 0) + 1
+            waited = (time.perf_counter() - start) * 1000
+            entry = self._waits.setdefault(PRIORITY_NAMES.get(priority, str(priority)), [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += waited
+            entry[2] = max(entry[2], waited)
+            # The next ticket in line may be admissible too
+            self._cond.notify_all()
+            return self._epoch
+
+    def _release(self, table, throttled, epoch):
+        with self._cond:
+            self._running -= 1
+            if table is not None:
+                self._tables[table] -= 1
+                if not self._tables[table]:
+                    del self._tables[table]
+            if throttled:
+                if epoch == self._epoch:
+                    self._limit = max(float(self.min_concurrency), self._limit / 2)
+                    self._epoch += 1
+            else:
+                self._limit = min(float(self.max_concurrency), self._limit + 1 / self._limit)
+            self._cond.notify_all()
+
+    def run(self, fn, priority=WRITE, table=None):
+        """
+        Call fn() (which should start a job and wait for its result) once a slot
+        is free; table marks a mutating DML job against that table. Throttling
+        errors are retried; anything else, or a throttle past the retry budget,
+        is raised.
+        """
+        attempt = 0
+        while True:
+            with span("bq_queue"):
+                epoch = self._acquire(priority, table)
+            throttled = False
+            try:
+                result = fn()
+            except Exception as e:
+                throttled = is_throttled(e)
+                with self._cond:
+                    self._counts["throttled" if throttled else "failed"] += 1
+                    if throttled and attempt >= self.retries:
+                        self._counts["failed"] += 1
+                if not throttled or attempt >= self.retries:
+                    raise
+            else:
+                with self._cond:
+                    self._counts["jobs"] += 1
+                return result
+            finally:
+                self._release(table, throttled, epoch)
+            attempt += 1
+            with self._cond:
+                self._counts["retries"] += 1
+            with span("bq_backoff"):
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1))))
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._counts,
+                limit=round(self._limit, 2),
+                max_concurrency=self.max_concurrency,
+                running=self._running,
+                queued=len(self._queue),
+                wait_ms={name: {"jobs": n, "avg": round(total / n, 1), "max": round(longest, 1)}
+                         for name, (n, total, longest) in self._waits.items()},
+            )
@@ -0,0 +1,251 @@
+# _helper/copy_batch.py
+# Batch export for the generate-copy functions.
+# Takes many llm_output documents (google, facebook and/or seo) and returns either
+# one workbook with a sheet per campaign or a zip with one workbook per campaign.
+# Parsing and filling run in worker processes where the platform allows it, and
+# each template is parsed once per process via _helper.xlsx_templates. Large
+# documents are written through _helper.xlsx_stream, and the finished file is
+# spooled rather than held as bytes.
+import os
+import re
+import tempfile
+import zipfile
+from io import BytesIO
+
+from _helper.handler_loader import API_DIR, load_handler_module
+from _helper.timing import span
+from _helper.xlsx_stream import STREAM_ROWS, SheetRecorder, StreamingWorkbook, file_size, spooled
+from _helper.xlsx_templates import checkout
+
+GENERATE_COPY_DIR = os.path.join(API_DIR, "generate-copy")
+OUTPUT_MODES = ("workbook", "zip")
+
+# Template sheets each export fills, in the order its fill function expects them
+SHEETS = {
+    "google": ("Ad Copy", "Sitelinks"),
+    "facebook": ("Ad Copy",),
+    "seo": ("Ad Copy",),
+}
+
+
+def load_handler(kind):
+    return load_handler_module(os.path.join(GENERATE_COPY_DIR, kind, "handler.py"))
+
+
+def parse_document(kind, llm_output):
+    mod = load_handler(kind)
+    if kind == "google":
+        return mod.parse_google_ads_output(llm_output)
+    if kind == "facebook":
+        return mod.parse_llm_output(llm_output)
+    return mod.parse_seo_output(llm_output)
+
+
+def _template(kind):
+    return os.path.abspath(load_handler(kind).TEMPLATE_PATH)
+
+
+def _has_rows(kind, parsed):
+    return bool(parsed[0] if kind == "google" else parsed)
+
+
+def _row_count(kind, parsed):
+    """Rows a document fills across its sheets"""
+    if kind == "google":
+        return 2 * len(parsed[0]) + len(parsed[1])
+    return len(parsed)
+
+
+def _fill(kind, sheets, parsed):
+    mod = load_handler(kind)
+    if kind == "google":
+        rows, sitelinks = parsed
+        mod.fill_google_ads_sheets(sheets[0], sheets[1], rows, sitelinks)
+    elif kind == "facebook":
+        mod.fill_facebook_sheet(sheets[0], parsed)
+    else:
+        mod.fill_seo_sheet(sheets[0], parsed)
+
+
+def _export_job(kind, llm_output):
+    """
+    Worker: parse one document and return its filled workbook as bytes, or as
+    the path of a temporary file past STREAM_ROWS rows (None if nothing parsed)
+    """
+    parsed = parse_document(kind, llm_output)
+    if not _has_rows(kind, parsed):
+        return None
+    template = _template(kind)
+    with checkout(template) as (wb, prototypes):
+        if _row_count(kind, parsed) <= STREAM_ROWS:
+            _fill(kind, [prototypes[(template, title)] for title in SHEETS[kind]], parsed)
+            output = BytesIO()
+            wb.save(output)
+            return output.getvalue()
+        recorders = {title: SheetRecorder() for title in SHEETS[kind]}
+        _fill(kind, list(recorders.values()), parsed)
+        out = StreamingWorkbook()
+        for ws in wb.worksheets:
+            out.add_sheet(ws.title, ws, recorders.get(ws.title) or SheetRecorder())
+    # Large files go back to the parent by path, not pickled through the pool
+    with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as f:
+        out.save(f)
+    return f.name
+
+
+def _executor(workers):
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    if workers > 1:
+        try:
+            return ProcessPoolExecutor(max_workers=workers), "process"
+        except (OSError, NotImplementedError, ImportError):
+            # AWS Lambda (and so Vercel) has no /dev/shm for multiprocessing locks
+            pass
+    return ThreadPoolExecutor(max_workers=max(1, workers)), "thread"
+
+
+def _safe_name(name, limit):
+    return re.sub(r'[\[\]:*?/\\]', "-", name).strip()[:limit] or "Campaign"
+
+
+def _unique(name, used, limit):
+    candidate, n = name, 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate = name[:limit - len(suffix)] + suffix
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def validate_documents(documents):
+    if not isinstance(documents, list) or not documents:
+        raise ValueError("documents must be a non-empty JSON array")
+    docs = []
+    for i, doc in enumerate(documents):
+        if not isinstance(doc, dict):
+            raise ValueError(f"documents[{i}] must be an object")
+        kind = doc.get("type")
+        if not isinstance(kind, str) or kind not in SHEETS:
+            raise ValueError(f"documents[{i}].type must be one of {', '.join(SHEETS)}")
+        if not doc.get("llm_output"):
+            raise ValueError(f"documents[{i}] has no llm_output")
+        if not isinstance(doc["llm_output"], str):
+            raise ValueError(f"documents[{i}].llm_output must be a string")
+        name = str(doc.get("name") or f"{kind.title()} {i + 1}")
+        docs.append((kind, doc["llm_output"], name))
+    return docs
+
+
+def run_batch(documents, output="workbook", workers=None):
+    """
+    Export a list of {"type", "llm_output", "name"} documents in one go.
+    Returns (file, report): file is a spooled file at offset 0 that the caller
+    closes, and report lists skipped documents, the file size and how the work
+    was spread across workers.
+    """
+    if output not in OUTPUT_MODES:
+        raise ValueError(f"output must be one of {', '.join(OUTPUT_MODES)}")
+    docs = validate_documents(documents)
+    kinds = [kind for kind, _, _ in docs]
+    texts = [text for _, text, _ in docs]
+    if workers is None:
+        workers = int(os.getenv("BATCH_WORKERS") or os.cpu_count() or 1)
+    workers = max(1, min(workers, len(docs)))
+
+    executor, executor_kind = _executor(workers)
+    with span("workers"), executor:
+        if output == "zip":
+            results = list(executor.map(_export_job, kinds, texts))
+        else:
+            results = list(executor.map(parse_document, kinds, texts))
+
+    skipped = []
+    if output == "zip":
+        out = spooled()
+        used = set()
+        streamed = sum(isinstance(r, str) for r in results)
+        try:
+            # .xlsx files are already deflated, so store them as-is
+            with span("zip"), zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as zf:
+                for (kind, _, name), result in zip(docs, results):
+                    if result is None:
+                        skipped.append(name)
+                        continue
+                    arcname = _unique(_safe_name(name, 120), used, 120) + ".xlsx"
+                    if isinstance(result, str):
+                        zf.write(result, arcname)
+                    else:
+                        zf.writestr(arcname, result)
+        finally:
+            for result in results:
+                if isinstance(result, str):
+                    os.unlink(result)
+    else:
+        out, skipped, streamed = _single_workbook(docs, results)
+    exported = len(docs) - len(skipped)
+
+    if exported == 0:
+        if out is not None:
+            out.close()
+        raise ValueError("No valid copy parsed in any document.")
+    out.seek(0)
+    return out, {
+        "documents": len(docs),
+        "exported": exported,
+        "skipped": skipped,
+        "workers": workers,
+        "executor": executor_kind,
+        "streamed": streamed,
+        "bytes": file_size(out),
+    }
+
+
+def _single_workbook(docs, parsed_docs):
+    """(spooled file or None, skipped names, documents streamed)"""
+    templates = tuple(sorted({_template(kind) for kind, _, _ in docs}))
+    rows = sum(_row_count(kind, parsed) for (kind, _, _), parsed in zip(docs, parsed_docs))
+    # Past STREAM_ROWS each campaign's sheets are written out as soon as they are
+    # filled, instead of copying every template cell into one in-memory workbook
+    stream = StreamingWorkbook() if rows > STREAM_ROWS else None
+    skipped = []
+    with checkout(*templates) as (wb, prototypes):
+        out_sheets = []
+        used = {ws.title.lower() for ws in wb.worksheets}
+        with span("fill"):
+            for (kind, _, name), parsed in zip(docs, parsed_docs):
+                if not _has_rows(kind, parsed):
+                    skipped.append(name)
+                    continue
+                template = _template(kind)
+                titles = SHEETS[kind]
+                sheets = []
+                for title in titles:
+                    label = f"{name} - {title}" if len(titles) > 1 else name
+                    out_title = _unique(_safe_name(label, 31), used, 31)
+                    if stream is not None:
+                        sheets.append((out_title, prototypes[(template, title)], SheetRecorder()))
+                    else:
+                        ws = wb.copy_worksheet(prototypes[(template, title)])
+                        ws.title = out_title
+                        sheets.append(ws)
+                if stream is not None:
+                    _fill(kind, [recorder for _, _, recorder in sheets], parsed)
+                    for out_title, prototype, recorder in sheets:
+                        stream.add_sheet(out_title, prototype, recorder)
+                else:
+                    _fill(kind, sheets, parsed)
+                out_sheets.extend(sheets)
+        if not out_sheets:
+            return None, skipped, 0
+        out = spooled()
+        with span("save"):
+            if stream is not None:
+                stream.save(out)
+            else:
+                # Only the campaign sheets go out; checkout() restores the prototypes afterwards
+                wb._sheets = out_sheets
+                wb.active = 0
+                wb.save(out)
+        return out, skipped, 0 if stream is None else len(docs) - len(skipped)
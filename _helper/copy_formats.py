@@ -0,0 +1,85 @@
+# _helper/copy_formats.py
+# Lightweight response formats for the generate-copy functions.
+# Consumers that only need the parsed rows and character counts can ask for
+# JSON, CSV or NDJSON and skip workbook generation entirely.
+import csv
+import json
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+
+XLSX = "xlsx"
+FORMATS = ("xlsx", "json", "csv", "ndjson")
+CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+_MEDIA_TYPES = {
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+    "application/json": "json",
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+def _from_accept(accept):
+    """
+    Pick a format from an Accept header.
+    Only an Accept header that names no wildcard and no xlsx switches format,
+    so generic clients (axios sends "application/json, text/plain, */*")
+    keep getting the workbook they always got.
+    """
+    ranked = []
+    for pos, part in enumerate(accept.split(",")):
+        media, _, params = part.strip().partition(";")
+        media = media.strip().lower()
+        if "*" in media or _MEDIA_TYPES.get(media) == XLSX:
+            return XLSX
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media in _MEDIA_TYPES and q > 0:
+            ranked.append((-q, pos, _MEDIA_TYPES[media]))
+    return min(ranked)[2] if ranked else XLSX
+
+
+def negotiate_format(headers, path, requested=None):
+    """
+    Resolve the response format: ?format= wins, then a "format" field from the
+    JSON body, then the Accept header. Defaults to xlsx.
+    """
+    if requested is not None and not isinstance(requested, str):
+        raise ValueError("format must be a string")
+    query = parse_qs(urlparse(path).query)
+    fmt = (query.get("format", [None])[0] or requested or "").strip().lower()
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+        return fmt
+    accept = headers.get("Accept") or ""
+    return _from_accept(accept) if accept.strip() else XLSX
+
+
+def render_records(records, fmt):
+    """Serialise a list of flat dicts as (body bytes, content type)"""
+    if fmt == "json":
+        body = json.dumps({"count": len(records), "records": records}, ensure_ascii=False)
+    elif fmt == "ndjson":
+        body = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+    elif fmt == "csv":
+        columns = list(dict.fromkeys(key for r in records for key in r))
+        buf = StringIO()
+        writer = csv.DictWriter(buf, fieldnames=columns, restval="", lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(records)
+        body = buf.getvalue()
+    else:
+        raise ValueError(f"render_records does not produce {fmt}")
+    return body.encode("utf-8"), CONTENT_TYPES[fmt]
@@ -0,0 +1,204 @@
+# _helper/copy_generation.py
+# Generate llm_output for the generate-copy functions from a brief.
+# A brief fans out into one prompt per landing page (google, seo) or channel
+# (facebook). Prompts are sent to an OpenAI-compatible API concurrently with
+# asyncio, bounded by GENERATION_CONCURRENCY, and completions are cached by
+# prompt hash so a repeated brief only pays for the prompts that changed.
+# The SDK reads OPENAI_API_KEY and OPENAI_BASE_URL itself; point the latter at
+# benchmarks/mock_openai.py to run locally.
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+
+from _helper.export_cache import ExportCache, _env_bytes
+
+MODEL = os.getenv("GENERATION_MODEL", "gpt-4o-mini")
+TEMPERATURE = float(os.getenv("GENERATION_TEMPERATURE", "0.7"))
+CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "8"))
+TIMEOUT = float(os.getenv("GENERATION_TIMEOUT", "60"))
+MAX_PROMPTS = int(os.getenv("GENERATION_MAX_PROMPTS", "50"))
+
+FACEBOOK_CHANNELS = ("Image Facebook Feed", "Facebook Stories", "Facebook Reels", "Facebook Video Feed")
+
+SYSTEM_PROMPT = (
+    "You are a senior performance-marketing copywriter. Follow the requested output format "
+    "exactly, one field per line, with no commentary before or after it."
+)
+
+_GOOGLE_AD = """Headline (1): <headline, max 30 characters>
+Headline (2): <headline, max 30 characters>
+Description (1): <description, max 90 characters>
+Description (2): <description, max 90 characters>
+Path (1): <display path, max 15 characters, no spaces>
+Path (2): <display path, max 15 characters, no spaces>
+---"""
+_GOOGLE_SITELINK = """SiteLink ({n}): <sitelink text, max 25 characters>
+SiteLink Description ({n}): <sitelink description, max 35 characters>
+SiteLink URL ({n}): <url of a page on the same site>"""
+_FACEBOOK_AD = """Primary text: <primary text, max 125 characters>
+Headline: <headline, max 40 characters>"""
+_SEO_PAGE = """Title 1: <title tag, max 60 characters>
+Meta Description 1: <meta description, max 155 characters>"""
+
+# One completion cache per process; same tiers and eviction as the export cache
+completion_cache = ExportCache(
+    max_bytes=_env_bytes("COMPLETION_CACHE_MEMORY_MB", 16),
+    disk_dir=os.getenv("COMPLETION_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "generate-copy-completions"),
+    disk_max_bytes=_env_bytes("COMPLETION_CACHE_DISK_MB", 64),
+)
+
+
+def _text(brief, field, required=False):
+    value = brief.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ValueError(f"brief.{field} is required")
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"brief.{field} must be a string")
+    return value.strip()
+
+
+def _count(brief, field, default, low, high):
+    value = brief.get(field, default)
+    if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+        raise ValueError(f"brief.{field} must be an integer between {low} and {high}")
+    return value
+
+
+def _pages(brief, required):
+    """brief.urls as a list of (url, topic); entries are URLs or {"url", "topic"} objects"""
+    urls = brief.get("urls") or []
+    if not isinstance(urls, list):
+        raise ValueError("brief.urls must be a list")
+    pages = []
+    for entry in urls:
+        if isinstance(entry, str) and entry.strip():
+            pages.append((entry.strip(), ""))
+        elif isinstance(entry, dict) and isinstance(entry.get("url"), str) and entry["url"].strip():
+            pages.append((entry["url"].strip(), str(entry.get("topic") or "").strip()))
+        else:
+            raise ValueError("brief.urls entries must be URLs or {\"url\", \"topic\"} objects")
+    if required and not pages:
+        raise ValueError("brief.urls must list at least one landing page")
+    return pages
+
+
+def _context(brief):
+    lines = [f"Brand: {_text(brief, 'brand', required=True)}"]
+    for field, label in (("description", "About the brand"), ("audience", "Audience"), ("tone", "Tone of voice")):
+        value = _text(brief, field)
+        if value:
+            lines.append(f"{label}: {value}")
+    keywords = brief.get("keywords") or []
+    if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+        raise ValueError("brief.keywords must be a list of strings")
+    if keywords:
+        lines.append(f"Keywords: {', '.join(k.strip() for k in keywords if k.strip())}")
+    return "\n".join(lines)
+
+
+def _messages(context, task, template):
+    user = f"{context}\n\n{task}\nUse exactly this format:\n```\n{template}\n```"
+    return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": user}]
+
+
+def build_prompts(kind, brief):
+    """
+    Turn a brief into [(prefix, messages)]. The prefix holds the lines the
+    parser needs that the model is not trusted to reproduce (channel headings,
+    SEO "Line n (URL: ...)" markers); it is prepended to the completion.
+    """
+    if not isinstance(brief, dict):
+        raise ValueError("brief must be a JSON object")
+    context = _context(brief)
+    prompts = []
+    if kind == "google":
+        ads = _count(brief, "ads_per_url", 3, 1, 10)
+        sitelinks = _count(brief, "sitelinks", 4, 0, 20)
+        block = "\n".join([_GOOGLE_SITELINK.format(n=n) for n in range(1, sitelinks + 1)] + [_GOOGLE_AD])
+        for url, topic in _pages(brief, required=False) or [("", "")]:
+            target = f"Landing page: {url}" + (f" ({topic})" if topic else "") if url else "Landing page: the brand's home page"
+            task = f"{target}\nWrite exactly {ads} Google Search ads for this landing page, one block per ad."
+            prompts.append(("", _messages(context, task, block)))
+    elif kind == "facebook":
+        ads = _count(brief, "ads_per_channel", 3, 1, 10)
+        channels = brief.get("channels") or list(FACEBOOK_CHANNELS)
+        if not isinstance(channels, list) or any(c not in FACEBOOK_CHANNELS for c in channels):
+            raise ValueError(f"brief.channels must be a subset of: {', '.join(FACEBOOK_CHANNELS)}")
+        for channel in dict.fromkeys(channels):
+            task = f"Placement: {channel}\nWrite exactly {ads} ads for this placement, one block per ad."
+            prompts.append((f"### {channel}", _messages(context, task, _FACEBOOK_AD)))
+    elif kind == "seo":
+        brand = _text(brief, "brand", required=True)
+        for i, (url, topic) in enumerate(_pages(brief, required=True), start=1):
+            task = f"Page URL: {url}" + (f"\nPage topic: {topic}" if topic else "")
+            task += "\nWrite exactly 1 SEO title tag and meta description for this page."
+            prefix = f"Line {i} (URL: {url}):\nFor input: Page {{{topic or url}}} Brand {{{brand}}}"
+            prompts.append((prefix, _messages(context, task, _SEO_PAGE)))
+    else:
+        raise ValueError(f"Unknown copy type '{kind}'")
+    if len(prompts) > MAX_PROMPTS:
+        raise ValueError(f"brief expands to {len(prompts)} prompts; the limit is {MAX_PROMPTS}")
+    return prompts
+
+
+def prompt_key(messages, model=MODEL, temperature=TEMPERATURE):
+    payload = json.dumps({"model": model, "temperature": temperature, "messages": messages},
+                         sort_keys=True, ensure_ascii=False)
+    return f'"{hashlib.sha256(payload.encode("utf-8")).hexdigest()[:40]}.completion"'
+
+
+async def _complete_all(pending, concurrency):
+    """pending: {key: messages}; returns {key: completion text}"""
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(timeout=TIMEOUT, max_retries=2)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def complete(key, messages):
+        async with semaphore:
+            response = await client.chat.completions.create(model=MODEL, messages=messages, temperature=TEMPERATURE)
+        return key, response.choices[0].message.content or ""
+
+    try:
+        return dict(await asyncio.gather(*(complete(k, m) for k, m in pending.items())))
+    finally:
+        await client.close()
+
+
+def generate_llm_output(kind, brief, use_cache=True, concurrency=None):
+    """
+    Generate the llm_output text a generate-copy handler would otherwise be
+    POSTed. Returns (text, report).
+    """
+    prompts = build_prompts(kind, brief)
+    keys = [prompt_key(messages) for _, messages in prompts]
+    completions = {}
+    pending = {}
+    for key, (_, messages) in zip(keys, prompts):
+        if key in completions or key in pending:
+            continue
+        cached = completion_cache.get(key) if use_cache else None
+        if cached is not None:
+            completions[key] = cached.decode("utf-8")
+        else:
+            pending[key] = messages
+    if pending:
+        generated = asyncio.run(_complete_all(pending, concurrency or CONCURRENCY))
+        for key, text in generated.items():
+            completion_cache.put(key, text.encode("utf-8"))
+        completions.update(generated)
+
+    sections = []
+    for key, (prefix, _) in zip(keys, prompts):
+        body = completions[key].strip().strip("`").strip()
+        sections.append(f"{prefix}\n{body}" if prefix else body)
+    return "\n\n".join(sections), {
+        "model": MODEL,
+        "prompts": len(prompts),
+        "generated": len(pending),
+        "cached": len(prompts) - len(pending),
+    }
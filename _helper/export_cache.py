@@ -0,0 +1,206 @@
+# _helper/export_cache.py
+# Content-addressed cache for generate-copy exports.
+# The key is a sha256 over (cache version, endpoint, template/logo versions,
+# llm_output lines) plus the response format, so identical requests map to
+# identical bytes. Entries live in a size-bounded in-memory LRU backed by a
+# second size-bounded LRU on local disk (/tmp survives warm invocations).
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Bump when a change to the parsers or fill code alters what an input exports to
+CACHE_VERSION = "1"
+
+_versions = {}
+
+
+def _file_version(path):
+    """Content hash of a template or image, computed once per process"""
+    version = _versions.get(path)
+    if version is None:
+        try:
+            with open(path, "rb") as f:
+                version = hashlib.sha256(f.read()).hexdigest()[:16]
+        except OSError:
+            version = "missing"
+        _versions[path] = version
+    return version
+
+
+class ExportKey:
+    """Incremental cache key for one request; feed it the llm_output before asking for the etag"""
+
+    def __init__(self, endpoint, *resource_paths):
+        self._hash = hashlib.sha256(f"{CACHE_VERSION}\0{endpoint}\0".encode())
+        for path in resource_paths:
+            self._hash.update(_file_version(path).encode() + b"\0")
+
+    def _line(self, line):
+        self._hash.update(line.encode("utf-8", "surrogatepass") + b"\n")
+
+    def _hashed(self, lines):
+        # Blank lines are held back until a non-blank line follows, so blank
+        # lines at either end never reach the hash
+        started = False
+        blanks = 0
+        for line in lines:
+            if not line.strip():
+                blanks += started
+            else:
+                for _ in range(blanks):
+                    self._line("")
+                blanks = 0
+                started = True
+                self._line(line)
+            yield line
+
+    def update_text(self, text):
+        # Hash line by line so a JSON llm_output and the same text streamed as
+        # text/plain produce the same key
+        for _ in self._hashed(text.splitlines()):
+            pass
+
+    def lines(self, lines):
+        """Pass-through generator that hashes lines on their way to a parser"""
+        return self._hashed(lines)
+
+    def etag(self, fmt):
+        return f'"{self._hash.hexdigest()[:40]}.{fmt}"'
+
+
+def etag_matches(headers, etag):
+    value = (headers.get("If-None-Match") or "").strip()
+    if not value:
+        return False
+    tags = [t.strip() for t in value.split(",")]
+    return etag in tags or f"W/{etag}" in tags
+
+
+class ExportCache:
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir if disk_max_bytes > 0 else None
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # etag -> bytes
+        self._memory_bytes = 0
+        self._disk = None  # etag -> size, loaded lazily from disk_dir
+        self._disk_bytes = 0
+        self._counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "not_modified": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def _filename(etag):
+        return etag.strip('"').replace("/", "_")
+
+    def _disk_index(self):
+        if self._disk is None:
+            self._disk = OrderedDict()
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+                entries = []
+                for name in os.listdir(self.disk_dir):
+                    if name.startswith(".tmp-"):
+                        continue
+                    st = os.stat(os.path.join(self.disk_dir, name))
+                    entries.append((st.st_mtime, name, st.st_size))
+                for _, name, size in sorted(entries):
+                    self._disk[f'"{name}"'] = size
+                    self._disk_bytes += size
+            except OSError:
+                self.disk_dir = None
+        return self._disk
+
+    def _remember(self, etag, data):
+        if len(data) > self.max_bytes:
+            return
+        if etag in self._memory:
+            self._memory_bytes -= len(self._memory.pop(etag))
+        self._memory[etag] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+            self._counts["evictions"] += 1
+
+    def get(self, etag):
+        with self._lock:
+            data = self._memory.get(etag)
+            if data is not None:
+                self._memory.move_to_end(etag)
+                self._counts["memory_hits"] += 1
+                return data
+            if self.disk_dir and etag in self._disk_index():
+                path = os.path.join(self.disk_dir, self._filename(etag))
+                try:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    os.utime(path)
+                    self._disk.move_to_end(etag)
+                    self._remember(etag, data)
+                    self._counts["disk_hits"] += 1
+                    return data
+                except OSError:
+                    self._disk_bytes -= self._disk.pop(etag)
+            self._counts["misses"] += 1
+            return None
+
+    def put(self, etag, data):
+        with self._lock:
+            self._remember(etag, data)
+            self._counts["stores"] += 1
+            if not self.disk_dir or len(data) > self.disk_max_bytes:
+                return
+            index = self._disk_index()
+            if not self.disk_dir or etag in index:
+                return
+            try:
+                fd, tmp = tempfile.mkstemp(dir=self.disk_dir, prefix=".tmp-")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, os.path.join(self.disk_dir, self._filename(etag)))
+            except OSError:
+                return
+            self._disk[etag] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.disk_max_bytes:
+                old, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                try:
+                    os.remove(os.path.join(self.disk_dir, self._filename(old)))
+                except OSError:
+                    pass
+
+    def not_modified(self):
+        with self._lock:
+            self._counts["not_modified"] += 1
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            hits = counts["memory_hits"] + counts["disk_hits"]
+            lookups = hits + counts["misses"]
+            counts.update({
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk) if self._disk is not None else None,
+                "disk_bytes": self._disk_bytes,
+            })
+            return counts
+
+
+def _env_bytes(name, default_mb):
+    try:
+        return int(float(os.getenv(name, default_mb)) * 1024 * 1024)
+    except ValueError:
+        return default_mb * 1024 * 1024
+
+
+# One cache per process, shared by every handler in it
+export_cache = ExportCache(
+    max_bytes=_env_bytes("EXPORT_CACHE_MEMORY_MB", 64),
+    disk_dir=os.getenv("EXPORT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "generate-copy-cache"),
+    disk_max_bytes=_env_bytes("EXPORT_CACHE_DISK_MB", 256),
+)
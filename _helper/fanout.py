@@ -0,0 +1,84 @@
+# _helper/fanout.py
+# Scatter-gather across function invocations.
+# A coordinator splits a list into shards, sends each shard to a separate
+# invocation of an endpoint, retries shards that fail with jittered exponential
+# backoff, and merges the per-item results back in input order.
+import http.client
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ShardError(RuntimeError):
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def split(items, shard_size):
+    shard_size = max(1, int(shard_size))
+    return [items[i:i + shard_size] for i in range(0, len(items), shard_size)]
+
+
+def post_json(url, payload, headers=None, timeout=300):
+    """POST JSON and return the decoded response; 5xx and network errors are retryable"""
+    body = json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(url, data=body, method="POST",
+                                     headers={"Content-Type": "application/json", **(headers or {})})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            return json.loads(resp.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        detail = e.read()[:500].decode("utf-8", "replace")
+        raise ShardError(f"HTTP {e.code} from {url}: {detail}", retryable=e.code >= 500 or e.code == 429)
+    except (urllib.error.URLError, http.client.HTTPException, TimeoutError, ConnectionError) as e:
+        raise ShardError(f"{url}: {e}")
+    except ValueError as e:
+        raise ShardError(f"Invalid JSON from {url}: {e}")
+
+
+def scatter_gather(items, shard_size, call, concurrency=8, retries=2, backoff=0.5, on_failure=None):
+    """
+    Run call(shard) for every shard concurrently and merge the results.
+    call returns one result per item in the shard. A shard that still fails
+    after `retries` retries contributes on_failure(item, error) for each of
+    its items. Returns (results in input order, report).
+    """
+    shards = split(list(items), shard_size)
+    attempts = [0] * len(shards)
+
+    def run(index):
+        shard = shards[index]
+        while True:
+            attempts[index] += 1
+            try:
+                results = call(shard)
+                if not isinstance(results, list):
+                    raise ShardError(f"Shard returned {type(results).__name__} instead of a list of results")
+                if len(results) != len(shard):
+                    raise ShardError(f"Shard returned {len(results)} results for {len(shard)} items")
+                return results, None
+            except ShardError as e:
+                error = e
+                if not e.retryable or attempts[index] > retries:
+                    break
+            # Full jitter keeps retried shards from hitting the endpoint in lockstep
+            time.sleep(random.uniform(0, backoff * 2 ** (attempts[index] - 1)))
+        if on_failure is None:
+            raise error
+        return [on_failure(item, str(error)) for item in shard], str(error)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(shards) or 1))) as pool:
+        outcomes = list(pool.map(run, range(len(shards))))
+
+    merged = [result for results, _ in outcomes for result in results]
+    return merged, {
+        "shards": len(shards),
+        "attempts": sum(attempts),
+        "retried_shards": sum(1 for a in attempts if a > 1),
+        "failed_shards": [{"items": shard, "error": error}
+                          for shard, (_, error) in zip(shards, outcomes) if error],
+    }
@@ -0,0 +1,49 @@
+# _helper/handler_loader.py
+# Load a vercel/api/**/handler.py by file path.
+# The function folders (brand-sentiment, generate-copy, ...) are not valid package
+# names, so each handler is registered under a synthetic package whose __path__ is
+# its folder; that keeps relative imports like `from .pipeline import ...` working.
+import importlib.util
+import os
+import re
+import sys
+import threading
+import types
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(PROJECT_ROOT, "vercel", "api")
+
+_lock = threading.RLock()
+
+
+def package_name(handler_path):
+    folder = os.path.dirname(os.path.abspath(handler_path))
+    rel = os.path.relpath(folder, API_DIR)
+    if rel.startswith(os.pardir):
+        # Entry points outside vercel/api (the router) are named from the project root
+        return "_" + re.sub(r"\W", "_", os.path.relpath(folder, PROJECT_ROOT))
+    return "_api_" + re.sub(r"\W", "_", rel)
+
+
+def load_handler_module(handler_path):
+    """Import a handler.py once per process and return the module"""
+    handler_path = os.path.abspath(handler_path)
+    package = package_name(handler_path)
+    name = f"{package}.handler"
+    with _lock:
+        mod = sys.modules.get(name)
+        if mod is not None:
+            return mod
+        if package not in sys.modules:
+            pkg = types.ModuleType(package)
+            pkg.__path__ = [os.path.dirname(handler_path)]
+            sys.modules[package] = pkg
+        spec = importlib.util.spec_from_file_location(name, handler_path)
+        mod = importlib.util.module_from_spec(spec)
+        sys.modules[name] = mod
+        try:
+            spec.loader.exec_module(mod)
+        except BaseException:
+            del sys.modules[name]
+            raise
+        return mod
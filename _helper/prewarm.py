@@ -0,0 +1,113 @@
+# _helper/prewarm.py
+# Warm-up requests for cron jobs and deploy hooks.
+# `GET <function URL>?warm=1` runs that function's warm-up steps: the imports,
+# templates, lexicons, credentials and clients its first real request would
+# otherwise pay for. Steps never start BigQuery jobs or LLM calls. The response
+# lists each step with its duration; a second call shows what stayed warm.
+import importlib
+import json
+import os
+import time
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+from _helper.timing import span
+
+_warm_templates = set()  # (pooled, template paths) already warmed by this process
+
+
+def requested(path):
+    return parse_qs(urlparse(path).query).get("warm", [""])[0].lower() in ("1", "true", "yes")
+
+
+def import_modules(*names):
+    for name in names:
+        importlib.import_module(name)
+    return f"{len(names)} module(s)"
+
+
+def run_steps(steps):
+    """Run (name, fn) steps in order; a failing step is reported and the rest still run"""
+    started = time.perf_counter()
+    report = []
+    for name, fn in steps:
+        start = time.perf_counter()
+        entry = {"step": name, "ok": True}
+        try:
+            with span(f"warm_{name}"):
+                detail = fn()
+            if detail is not None:
+                entry["detail"] = detail
+        except Exception as e:
+            entry.update(ok=False, error=f"{type(e).__name__}: {e}")
+        entry["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        report.append(entry)
+    return {
+        "ok": all(entry["ok"] for entry in report),
+        "pid": os.getpid(),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "steps": report,
+    }
+
+
+def respond(handler, steps):
+    """Run steps and write the report as the response; 500 if any step failed"""
+    report = run_steps(steps)
+    body = json.dumps(report).encode("utf-8")
+    handler.send_response(200 if report["ok"] else 500)
+    handler.send_header('Access-Control-Allow-Origin', '*')
+    handler.send_header('Content-Type', 'application/json')
+    handler.send_header('Cache-Control', 'no-store')
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def generate_copy_steps(template_paths, image_path, pooled=False, generation=True):
+    """
+    Steps for a generate-copy function: openpyxl reader and writer, the
+    templates (also parked in the xlsx_templates pool when pooled), the logo,
+    and the OpenAI client library used for briefs
+    """
+    def openpyxl():
+        return import_modules("openpyxl", "openpyxl.drawing.image", "openpyxl.writer.excel")
+
+    def templates():
+        from openpyxl import load_workbook
+        from _helper import xlsx_templates
+
+        keys = [(os.path.abspath(p),) for p in template_paths]
+        if pooled and len(keys) > 1:
+            # Batch exports borrow one template per document, or all of them for a combined workbook
+            keys.append(tuple(sorted(os.path.abspath(p) for p in template_paths)))
+        loaded = 0
+        for key in keys:
+            if (pooled, key) in _warm_templates:
+                continue
+            if pooled:
+                with xlsx_templates.checkout(*key) as (wb, _):
+                    # Saving once pulls in the writer modules openpyxl imports lazily
+                    wb.save(BytesIO())
+            else:
+                load_workbook(key[0]).save(BytesIO())
+            _warm_templates.add((pooled, key))
+            loaded += 1
+        return f"{loaded} loaded, {len(keys) - loaded} already warm"
+
+    def image():
+        from openpyxl.drawing.image import Image
+
+        if not os.path.exists(image_path):
+            # Exports log the missing logo and go on without it, so this is not a failure
+            return f"missing {image_path}; exports skip the logo"
+        try:
+            img = Image(image_path)
+        except ImportError:
+            # Exports skip the logo without Pillow; nothing to warm
+            return "Pillow not installed"
+        return f"{img.width}x{img.height}"
+
+    steps = [("openpyxl", openpyxl), ("templates", templates), ("image", image)]
+    if generation:
+        steps.append(("generation", lambda: import_modules("openai", "_helper.copy_generation")))
+    return steps
@@ -0,0 +1,118 @@
+# _helper/profiling.py
+# Opt-in per-request profiling for TimedRequestHandler.
+# A request is profiled when PROFILE_REQUESTS=1, or when it carries
+# `X-Profile: <PROFILE_TOKEN>` and PROFILE_TOKEN is set. The handler then runs
+# under cProfile and tracemalloc; the top functions by cumulative time and the
+# top allocation sites are logged as one JSON line ("event": "profile") and
+# written to PROFILE_DIR/<id>.json, and the response carries X-Profile-Id.
+# Disabled, the cost is an env lookup per request; the profilers are only
+# imported when a request asks for them.
+import hmac
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+TOP = int(os.getenv("PROFILE_TOP", "25"))
+
+# tracemalloc is process-wide, so only one request is profiled at a time
+_busy = threading.Lock()
+
+
+def requested(headers):
+    if os.getenv("PROFILE_REQUESTS", "").lower() in ("1", "true", "yes"):
+        return True
+    token = os.getenv("PROFILE_TOKEN", "")
+    supplied = headers.get("X-Profile") if headers is not None else None
+    return bool(token and supplied) and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+class RequestProfile:
+    def __init__(self):
+        import cProfile
+        import tracemalloc
+
+        self.id = uuid.uuid4().hex[:16]
+        self._tracemalloc = tracemalloc
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start(int(os.getenv("PROFILE_TRACEBACK_DEPTH", "1")))
+        tracemalloc.reset_peak()
+        self._profiler = cProfile.Profile()
+        self._started = time.perf_counter()
+        self._profiler.enable()
+
+    @classmethod
+    def start(cls, headers):
+        """A running profile if this request asked for one, else None"""
+        if not requested(headers):
+            return None
+        if not _busy.acquire(blocking=False):
+            return None
+        try:
+            return cls()
+        except Exception:
+            _busy.release()
+            raise
+
+    def finish(self, meta):
+        self._profiler.disable()
+        wall_ms = (time.perf_counter() - self._started) * 1000
+        try:
+            snapshot = self._tracemalloc.take_snapshot()
+            current, peak = self._tracemalloc.get_traced_memory()
+            if self._owns_tracemalloc:
+                self._tracemalloc.stop()
+        finally:
+            _busy.release()
+        report = {
+            "event": "profile",
+            "id": self.id,
+            **meta,
+            "wall_ms": round(wall_ms, 2),
+            "traced_peak_kb": round(peak / 1024, 1),
+            "traced_current_kb": round(current / 1024, 1),
+            "functions": self._functions(),
+            "allocations": self._allocations(snapshot),
+        }
+        self._store(report)
+        return report
+
+    def _functions(self):
+        import pstats
+
+        stats = pstats.Stats(self._profiler).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP]
+        return [{
+            "function": f"{os.path.basename(filename)}:{line}({name})" if line else name,
+            "calls": nc,
+            "cumulative_ms": round(ct * 1000, 3),
+            "own_ms": round(tt * 1000, 3),
+        } for (filename, line, name), (cc, nc, tt, ct, _) in rows]
+
+    def _allocations(self, snapshot):
+        snapshot = snapshot.filter_traces((
+            self._tracemalloc.Filter(False, self._tracemalloc.__file__),
+            self._tracemalloc.Filter(False, __file__),
+        ))
+        return [{
+            "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        } for stat in snapshot.statistics("lineno")[:TOP]]
+
+    def _store(self, report):
+        line = json.dumps(report, separators=(",", ":"))
+        sys.stderr.write(line + "\n")
+        sys.stderr.flush()
+        directory = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "request-profiles")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"{self.id}.json"), "w") as f:
+                f.write(line)
+            self._profiler.dump_stats(os.path.join(directory, f"{self.id}.prof"))
+        except OSError as e:
+            sys.stderr.write(f"Could not store profile {self.id}: {e}\n")
@@ -0,0 +1,101 @@
+# _helper/request_body.py
+# Request body readers for the BaseHTTPRequestHandler functions.
+# Handles both Content-Length and chunked framing, and can hand text bodies
+# to a parser line by line straight off rfile instead of buffering them whole.
+import codecs
+
+CHUNK_SIZE = 64 * 1024
+_MAX_CHUNK_LINE = 1024
+
+
+class BodyError(ValueError):
+    """Raised when the request body framing is malformed or truncated"""
+
+
+def is_chunked(headers) -> bool:
+    return "chunked" in (headers.get("Transfer-Encoding") or "").lower()
+
+
+def content_type(headers) -> str:
+    return (headers.get("Content-Type") or "").split(";", 1)[0].strip().lower()
+
+
+def is_text_body(headers) -> bool:
+    """True when the client sent the LLM output as a raw text/plain body"""
+    return content_type(headers) == "text/plain"
+
+
+def _charset(headers) -> str:
+    charset = "utf-8"
+    if hasattr(headers, "get_content_charset"):
+        charset = headers.get_content_charset() or charset
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = "utf-8"
+    return charset
+
+
+def _iter_chunked(rfile, chunk_size):
+    while True:
+        size_line = rfile.readline(_MAX_CHUNK_LINE)
+        if not size_line:
+            raise BodyError("Chunked body ended before the terminating chunk")
+        try:
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+        except ValueError:
+            raise BodyError(f"Invalid chunk size line: {size_line[:64]!r}")
+        if size == 0:
+            # Skip any trailer headers up to the blank line that ends the body
+            while rfile.readline(_MAX_CHUNK_LINE) not in (b"\r\n", b"\n", b""):
+                pass
+            return
+        while size > 0:
+            data = rfile.read(min(chunk_size, size))
+            if not data:
+                raise BodyError("Chunked body ended mid-chunk")
+            size -= len(data)
+            yield data
+        if rfile.readline(_MAX_CHUNK_LINE) not in (b"\r\n", b"\n"):
+            raise BodyError("Missing CRLF after chunk data")
+
+
+def iter_body_chunks(rfile, headers, chunk_size=CHUNK_SIZE):
+    """Yield the raw request body in pieces of at most chunk_size bytes"""
+    if is_chunked(headers):
+        yield from _iter_chunked(rfile, chunk_size)
+        return
+    remaining = int(headers.get("Content-Length") or 0)
+    while remaining > 0:
+        data = rfile.read(min(chunk_size, remaining))
+        if not data:
+            raise BodyError("Request body ended before Content-Length bytes were read")
+        remaining -= len(data)
+        yield data
+
+
+def read_body(rfile, headers) -> bytes:
+    """Read the whole body regardless of framing (used for JSON payloads)"""
+    return b"".join(iter_body_chunks(rfile, headers))
+
+
+def iter_body_lines(rfile, headers, chunk_size=CHUNK_SIZE):
+    """
+    Decode the body incrementally and yield it one line at a time.
+    Lines are split exactly like str.splitlines(), so parsers written against
+    llm_text.splitlines() see the same sequence of lines. Only the current
+    partial line is held between reads.
+    """
+    decoder = codecs.getincrementaldecoder(_charset(headers))(errors="replace")
+    pending = ""
+    for chunk in iter_body_chunks(rfile, headers, chunk_size):
+        text = pending + decoder.decode(chunk)
+        parts = text.splitlines(keepends=True)
+        # A trailing part without a line break may continue in the next chunk,
+        # and a trailing \r may be the first half of a \r\n split across chunks
+        last = parts[-1] if parts else ""
+        pending = parts.pop() if last and (last.splitlines()[0] == last or last.endswith("\r")) else ""
+        for part in parts:
+            yield part.splitlines()[0]
+    pending += decoder.decode(b"", final=True)
+    yield from pending.splitlines()
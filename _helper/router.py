@@ -0,0 +1,145 @@
+# _helper/router.py
+# Single-entry dispatcher for every /api/... route.
+# Routes resolve exactly like the vercel.json rewrites
+# (/api/<fn> and /api/<fn>/<sub> -> vercel/api/.../handler.py); each handler
+# module is imported on the first request for its route and reused after that,
+# so one warm process serves all endpoints without paying for unused imports.
+import json
+import os
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+from _helper import prewarm
+from _helper.handler_loader import API_DIR, load_handler_module, package_name
+from _helper.timing import TimedRequestHandler, span
+
+_ROUTE = re.compile(r"^/api/([\w-]+)(?:/([\w-]+))?/?$")
+STATUS_PATHS = ("/api", "/api/router")
+
+_started = time.time()
+_lock = threading.Lock()
+_routes = {}  # route -> {"load_ms", "loaded_at", "requests", "errors"}
+_counts = {"requests": 0, "cold_loads": 0, "not_found": 0}
+
+
+def resolve(path):
+    """Map a request path to (route, handler.py path), or None"""
+    m = _ROUTE.match(urlparse(path).path)
+    if not m:
+        return None
+    route = "/".join(p for p in m.groups() if p)
+    handler_path = os.path.join(API_DIR, *route.split("/"), "handler.py")
+    return (route, handler_path) if os.path.isfile(handler_path) else None
+
+
+def load_route(route, handler_path):
+    """Import a route's handler module once; returns (handler class, cold)"""
+    with _lock:
+        entry = _routes.get(route)
+    if entry is not None:
+        return load_handler_module(handler_path).handler, False
+    start = time.perf_counter()
+    with span("route_load"):
+        cls = load_handler_module(handler_path).handler
+    load_ms = (time.perf_counter() - start) * 1000
+    with _lock:
+        if route in _routes:
+            return cls, False
+        _routes[route] = {"load_ms": round(load_ms, 2), "loaded_at": time.time(), "requests": 0, "errors": 0}
+        _counts["cold_loads"] += 1
+    return cls, True
+
+
+def discover():
+    """Every (route, handler.py path) under the API directory"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(API_DIR):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith(("_", ".")))
+        if "handler.py" in filenames:
+            route = os.path.relpath(dirpath, API_DIR).replace(os.sep, "/")
+            found.append((route, os.path.join(dirpath, "handler.py")))
+    return found
+
+
+def warmup_steps():
+    """Load every route, then run the warm-up steps its module defines"""
+    for route, handler_path in discover():
+        yield f"{route}/load", lambda route=route, handler_path=handler_path: load_route(route, handler_path) and None
+        module = sys.modules.get(f"{package_name(handler_path)}.handler")
+        for name, fn in (module.warmup_steps() if hasattr(module, "warmup_steps") else ()):
+            yield f"{route}/{name}", fn
+
+
+def stats():
+    with _lock:
+        return {
+            "uptime_s": round(time.time() - _started, 3),
+            **_counts,
+            "routes": {route: dict(entry) for route, entry in _routes.items()},
+        }
+
+
+class RouterHandler(TimedRequestHandler):
+    def log_fields(self):
+        return getattr(self, "_route_fields", {})
+
+    def _json(self, code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self):
+        with _lock:
+            _counts["requests"] += 1
+            first = _counts["requests"] == 1
+        self._route_fields = {"process_cold": first}
+        if urlparse(self.path).path.rstrip("/") in STATUS_PATHS:
+            self._route_fields["route"] = "router"
+            if self.command == "GET" and prewarm.requested(self.path):
+                prewarm.respond(self, warmup_steps())
+                return
+            self._json(200, {"message": "API router", **stats()})
+            return
+        resolved = resolve(self.path)
+        if resolved is None:
+            with _lock:
+                _counts["not_found"] += 1
+            self._json(404, {"error": f"No handler for {urlparse(self.path).path}"})
+            return
+        route, handler_path = resolved
+        self._route_fields["route"] = route
+        try:
+            cls, cold = load_route(route, handler_path)
+        except Exception as e:
+            self._json(500, {"error": f"Could not load {route}: {e}"})
+            return
+        self._route_fields["route_cold"] = cold
+        with _lock:
+            _routes[route]["requests"] += 1
+
+        method = getattr(cls, "do_" + self.command, None)
+        if method is None:
+            self.send_error(501, f"Unsupported method ({self.command!r})")
+            return
+        # Run the route's handler on this connection: same socket, parsed request
+        # and timer; whatever it changes (status, keep-alive) is copied back
+        target = cls.__new__(cls)
+        target.__dict__.update(self.__dict__)
+        target.protocol_version = self.protocol_version
+        try:
+            method(target)
+        except Exception:
+            with _lock:
+                _routes[route]["errors"] += 1
+            raise
+        finally:
+            self.__dict__.update(target.__dict__)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_OPTIONS = _dispatch
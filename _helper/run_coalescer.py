@@ -0,0 +1,338 @@
+# _helper/run_coalescer.py
+# Per-key request coalescing for long-running jobs (brand-sentiment runs).
+# Concurrent requests for a key that is already running attach to that run and
+# get its result instead of starting their own. Within a process this is a
+# plain single-flight; across instances a lease in a shared store decides who
+# runs, and everyone else polls the store for the leader's published outcome.
+# The leader renews its lease while the run is going, so a lease only expires
+# when the instance holding it has died.
+#
+# Stores (RUN_LOCK_BACKEND):
+#   memory  in-process only (default)
+#   sqlite  SQLite file shared by processes on one host (RUN_LOCK_PATH)
+#   s3      lease objects written with conditional puts (RUN_LOCK_BUCKET, RUN_LOCK_PREFIX)
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from _helper.timing import span
+
+LEASE_TTL = float(os.getenv("RUN_LEASE_TTL", "900"))  # how long a lease outlives its last renewal
+OUTCOME_TTL = float(os.getenv("RUN_OUTCOME_TTL", "600"))  # how long late followers can still read an outcome
+POLL_INTERVAL = float(os.getenv("RUN_POLL_INTERVAL", "1"))
+
+
+class RemoteRunError(RuntimeError):
+    """The run this request attached to failed in another instance"""
+
+
+class SqliteRunStore:
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, run_id TEXT NOT NULL, expires_at REAL NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS outcomes (run_id TEXT PRIMARY KEY, key TEXT NOT NULL, ok INTEGER NOT NULL, "
+                       "payload TEXT NOT NULL, created_at REAL NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def acquire(self, key, run_id, ttl):
+        """Take the lease and return None, or return the run_id holding it"""
+        now = time.time()
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT run_id, expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+            if row and row[1] > now:
+                db.execute("COMMIT")
+                return row[0]
+            db.execute("INSERT OR REPLACE INTO leases (key, run_id, expires_at) VALUES (?, ?, ?)", (key, run_id, now + ttl))
+            db.execute("COMMIT")
+            return None
+        finally:
+            db.close()
+
+    def renew(self, key, run_id, ttl):
+        """Extend a lease run_id still holds; False once it has been taken over"""
+        db = self._connect()
+        try:
+            cur = db.execute("UPDATE leases SET expires_at = ? WHERE key = ? AND run_id = ?", (time.time() + ttl, key, run_id))
+            return cur.rowcount == 1
+        finally:
+            db.close()
+
+    def release(self, key, run_id, ok, payload):
+        now = time.time()
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("INSERT OR REPLACE INTO outcomes (run_id, key, ok, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                       (run_id, key, int(ok), json.dumps(payload), now))
+            db.execute("DELETE FROM leases WHERE key = ? AND run_id = ?", (key, run_id))
+            db.execute("DELETE FROM outcomes WHERE created_at < ?", (now - OUTCOME_TTL,))
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def outcome(self, run_id):
+        """(ok, payload) once the run has finished, else None"""
+        db = self._connect()
+        try:
+            row = db.execute("SELECT ok, payload FROM outcomes WHERE run_id = ?", (run_id,)).fetchone()
+        finally:
+            db.close()
+        return (bool(row[0]), json.loads(row[1])) if row else None
+
+    def holds(self, key, run_id):
+        db = self._connect()
+        try:
+            row = db.execute("SELECT expires_at FROM leases WHERE key = ? AND run_id = ?", (key, run_id)).fetchone()
+        finally:
+            db.close()
+        return bool(row) and row[0] > time.time()
+
+
+class S3RunStore:
+    """
+    Leases are S3 objects created with If-None-Match: *, so only one writer wins.
+    An expired lease is taken over, renewed or released with If-Match on the
+    ETag that was read, so a lease replaced in the meantime is left alone.
+    Outcomes are kept under outcomes/; expire them with a bucket lifecycle rule.
+    """
+
+    def __init__(self, bucket, prefix="sentiment/locks/", client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("s3")
+        return self._client
+
+    def _lease_key(self, key):
+        return f"{self.prefix}leases/{key}.json"
+
+    def _read(self, object_key):
+        """(parsed object, ETag), or (None, None) if it does not exist"""
+        from botocore.exceptions import ClientError
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=object_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None, None
+            raise
+        return json.loads(obj["Body"].read()), obj.get("ETag")
+
+    def _get(self, object_key):
+        return self._read(object_key)[0]
+
+    @staticmethod
+    def _lost_race(e):
+        """The object changed or disappeared between our read and a conditional write"""
+        return e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict", "NoSuchKey", "404")
+
+    def _lease_body(self, run_id, ttl):
+        return json.dumps({"run_id": run_id, "expires_at": time.time() + ttl}).encode("utf-8")
+
+    def acquire(self, key, run_id, ttl):
+        from botocore.exceptions import ClientError
+        for _ in range(3):
+            try:
+                self.client.put_object(Bucket=self.bucket, Key=self._lease_key(key), Body=self._lease_body(run_id, ttl),
+                                       IfNoneMatch="*")
+                return None
+            except ClientError as e:
+                if not self._lost_race(e):
+                    raise
+            lease, etag = self._read(self._lease_key(key))
+            if lease and lease["expires_at"] > time.time():
+                return lease["run_id"]
+            if lease:
+                # Abandoned by an instance that died mid-run. Overwrite exactly the
+                # lease that was read: if another instance took it over first the
+                # ETag no longer matches and the next round sees its lease instead
+                try:
+                    self.client.put_object(Bucket=self.bucket, Key=self._lease_key(key), Body=self._lease_body(run_id, ttl),
+                                           IfMatch=etag)
+                    return None
+                except ClientError as e:
+                    if not self._lost_race(e):
+                        raise
+        raise RuntimeError(f"Could not acquire or read the run lease for {key}")
+
+    def renew(self, key, run_id, ttl):
+        from botocore.exceptions import ClientError
+        lease, etag = self._read(self._lease_key(key))
+        if not lease or lease["run_id"] != run_id:
+            return False
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=self._lease_key(key), Body=self._lease_body(run_id, ttl),
+                                   IfMatch=etag)
+            return True
+        except ClientError as e:
+            if not self._lost_race(e):
+                raise
+            return False
+
+    def release(self, key, run_id, ok, payload):
+        from botocore.exceptions import ClientError
+        self.client.put_object(Bucket=self.bucket, Key=f"{self.prefix}outcomes/{run_id}.json",
+                               Body=json.dumps({"ok": ok, "payload": payload}).encode("utf-8"))
+        lease, etag = self._read(self._lease_key(key))
+        if lease and lease["run_id"] == run_id:
+            try:
+                self.client.delete_object(Bucket=self.bucket, Key=self._lease_key(key), IfMatch=etag)
+            except ClientError as e:
+                if not self._lost_race(e):
+                    raise
+
+    def outcome(self, run_id):
+        data = self._get(f"{self.prefix}outcomes/{run_id}.json")
+        return (data["ok"], data["payload"]) if data else None
+
+    def holds(self, key, run_id):
+        lease = self._get(self._lease_key(key))
+        return bool(lease) and lease["run_id"] == run_id and lease["expires_at"] > time.time()
+
+
+def store_from_env():
+    backend = (os.getenv("RUN_LOCK_BACKEND") or "memory").strip().lower()
+    if backend == "memory":
+        return None
+    if backend == "sqlite":
+        return SqliteRunStore(os.getenv("RUN_LOCK_PATH") or os.path.join(tempfile.gettempdir(), "run-locks.sqlite"))
+    if backend == "s3":
+        bucket = (os.getenv("RUN_LOCK_BUCKET") or "").strip()
+        if not bucket:
+            raise RuntimeError("RUN_LOCK_BACKEND=s3 needs RUN_LOCK_BUCKET")
+        return S3RunStore(bucket, os.getenv("RUN_LOCK_PREFIX", "sentiment/locks/"))
+    raise RuntimeError(f"Unknown RUN_LOCK_BACKEND '{backend}'. Use memory, sqlite or s3")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.info = None
+
+
+class RunCoalescer:
+    def __init__(self, store=None, lease_ttl=LEASE_TTL, poll_interval=POLL_INTERVAL):
+        self.store = store
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> _Flight
+        self._counts = {"runs": 0, "joined": 0, "joined_remote": 0, "errors": 0}
+
+    def run(self, key, fn):
+        """
+        Run fn() for key unless a run is already in flight, in which case wait
+        for it. Returns (result, info); info["role"] is "leader", "joined"
+        (same process) or "joined_remote" (another instance).
+        """
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._counts["joined"] += 1
+        if not leader:
+            with span("coalesce_wait"):
+                flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, dict(flight.info, role="joined")
+
+        try:
+            flight.value, flight.info = self._lead(key, fn)
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._counts["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+        return flight.value, flight.info
+
+    def _lead(self, key, fn):
+        if self.store is None:
+            return self._execute(key, fn, None)
+        while True:
+            run_id = uuid.uuid4().hex
+            holder = self.store.acquire(key, run_id, self.lease_ttl)
+            if holder is None:
+                return self._execute(key, fn, run_id)
+            with span("coalesce_wait"):
+                outcome = self._wait_remote(key, holder)
+            if outcome is None:
+                continue  # the holder vanished without an outcome; try to take over
+            with self._lock:
+                self._counts["joined_remote"] += 1
+            ok, payload = outcome
+            if not ok:
+                raise RemoteRunError(f"Run {holder} for {key} failed: {payload}")
+            return payload, {"role": "joined_remote", "run_id": holder}
+
+    def _execute(self, key, fn, run_id):
+        with self._lock:
+            self._counts["runs"] += 1
+        stop = threading.Event()
+        if run_id is not None:
+            threading.Thread(target=self._heartbeat, args=(key, run_id, stop), daemon=True).start()
+        try:
+            try:
+                result = fn()
+            finally:
+                stop.set()
+        except Exception as e:
+            if run_id is not None:
+                self._publish(key, run_id, False, str(e))
+            raise
+        if run_id is not None:
+            self._publish(key, run_id, True, result)
+        return result, {"role": "leader", "run_id": run_id}
+
+    def _heartbeat(self, key, run_id, stop):
+        """Renew the lease every third of its TTL until the run finishes"""
+        while not stop.wait(self.lease_ttl / 3):
+            try:
+                if not self.store.renew(key, run_id, self.lease_ttl):
+                    sys.stderr.write(f"Run lease for {key} was taken over during run {run_id}\n")
+                    return
+            except Exception as e:
+                # Try again on the next beat; the lease only lapses after a full TTL
+                sys.stderr.write(f"Could not renew the run lease for {key}: {e}\n")
+
+    def _publish(self, key, run_id, ok, payload):
+        try:
+            self.store.release(key, run_id, ok, payload)
+        except Exception as e:
+            # Followers fall back to taking over once the lease expires
+            sys.stderr.write(f"Could not publish run outcome for {key}: {e}\n")
+
+    def _wait_remote(self, key, run_id):
+        while True:
+            outcome = self.store.outcome(run_id)
+            if outcome is not None:
+                return outcome
+            if not self.store.holds(key, run_id):
+                return self.store.outcome(run_id)
+            time.sleep(self.poll_interval)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, in_flight=len(self._inflight))
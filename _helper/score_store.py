@@ -0,0 +1,264 @@
+# _helper/score_store.py
+# Persistent key -> score snapshot shared across runs and cold starts.
+# The snapshot is one gzipped JSON object {"version", "scores"}; a snapshot
+# whose version differs from the caller's (e.g. a new lexicon) is ignored, so
+# changing what a score means invalidates everything scored before. Entries
+# are loaded once per process and looked up in memory, where the least
+# recently used are dropped past MEMORY_ENTRIES. New ones are merged into the
+# stored snapshot once per request; the write is conditional on the snapshot
+# read for the merge, so concurrent savers retry instead of overwriting each
+# other's entries.
+#
+# Backends (SCORE_STORE_BACKEND):
+#   file  local file (SCORE_STORE_PATH, default under the temp dir)
+#   s3    object SCORE_STORE_KEY in SCORE_STORE_BUCKET
+#   none  in-process only
+import gzip
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are still serialized within the process
+    fcntl = None
+
+MAX_ENTRIES = int(os.getenv("SCORE_STORE_MAX_ENTRIES", "2000000"))
+MEMORY_ENTRIES = int(os.getenv("SCORE_STORE_MEMORY_ENTRIES", "500000"))
+SAVE_ATTEMPTS = 5
+
+
+class SnapshotConflict(Exception):
+    """The snapshot changed between the read and the conditional write"""
+
+
+class FileSnapshot:
+    """
+    read() returns (data, version); write(data, version) replaces the file only
+    if it is still that version, checked under an exclusive lock on a sidecar
+    file so processes on the host take turns
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _version(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        # os.replace gives every write a new inode
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def read(self):
+        version = self._version()
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None, None
+        if self._version() != version:
+            raise SnapshotConflict(self.path)
+        return data, version
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def write(self, data, version):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        try:
+            with self._locked():
+                if self._version() != version:
+                    raise SnapshotConflict(self.path)
+                os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+class S3Snapshot:
+    def __init__(self, bucket, key, client=None):
+        self.bucket = bucket
+        self.key = key
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("s3")
+        return self._client
+
+    def read(self):
+        """(data, ETag), or (None, None) if there is no snapshot yet"""
+        from botocore.exceptions import ClientError
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self.key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None, None
+            raise
+        return obj["Body"].read(), obj.get("ETag")
+
+    def write(self, data, version):
+        """Put only over the ETag that was read, or only if still absent"""
+        from botocore.exceptions import ClientError
+        condition = {"IfMatch": version} if version is not None else {"IfNoneMatch": "*"}
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=data, ContentEncoding="gzip",
+                                   ContentType="application/json", **condition)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict",
+                                                           "NoSuchKey", "404"):
+                raise SnapshotConflict(self.key) from e
+            raise
+
+
+def snapshot_from_env(default_bucket=""):
+    backend = (os.getenv("SCORE_STORE_BACKEND") or "file").strip().lower()
+    if backend == "none":
+        return None
+    if backend == "file":
+        return FileSnapshot(os.getenv("SCORE_STORE_PATH") or os.path.join(tempfile.gettempdir(), "sentiment-scores.json.gz"))
+    if backend == "s3":
+        bucket = (os.getenv("SCORE_STORE_BUCKET") or default_bucket).strip()
+        if not bucket:
+            raise RuntimeError("SCORE_STORE_BACKEND=s3 needs SCORE_STORE_BUCKET")
+        return S3Snapshot(bucket, os.getenv("SCORE_STORE_KEY", "sentiment/scores/vader-scores.json.gz"))
+    raise RuntimeError(f"Unknown SCORE_STORE_BACKEND '{backend}'. Use file, s3 or none")
+
+
+class ScoreStore:
+    def __init__(self, snapshot, version, memory_entries=MEMORY_ENTRIES):
+        self.snapshot = snapshot
+        self.version = version
+        self.memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._scores = None  # OrderedDict, least recently used first
+        self._pending = {}
+        self._counts = {"loaded": 0, "hits": 0, "misses": 0, "saved": 0, "invalidated": 0, "evicted": 0,
+                        "save_conflicts": 0}
+
+    def _decode(self, data):
+        """Scores from stored bytes, or {} for a missing, unreadable or outdated snapshot"""
+        if not data:
+            return {}
+        try:
+            doc = json.loads(gzip.decompress(data))
+        except (OSError, ValueError) as e:
+            sys.stderr.write(f"Ignoring unreadable score snapshot: {e}\n")
+            return {}
+        if doc.get("version") != self.version:
+            self._counts["invalidated"] += 1
+            return {}
+        return doc.get("scores") or {}
+
+    def _trim(self):
+        """Drop least recently used entries past memory_entries; call with _lock held"""
+        while len(self._scores) > self.memory_entries:
+            self._scores.popitem(last=False)
+            self._counts["evicted"] += 1
+
+    def load(self):
+        with self._lock:
+            if self._scores is not None:
+                return
+            scores = {}
+            if self.snapshot is not None:
+                try:
+                    scores = self._decode(self.snapshot.read()[0])
+                except Exception as e:
+                    # The store only saves work; scoring goes ahead without it
+                    sys.stderr.write(f"Could not load score snapshot: {e}\n")
+            self._counts["loaded"] = len(scores)
+            # Snapshots keep the newest entries last, so trimming drops the oldest
+            self._scores = OrderedDict(scores)
+            self._trim()
+
+    def get_many(self, keys, compute):
+        """Scores for keys, calling compute(key) only for keys not already stored"""
+        self.load()
+        with self._lock:
+            scores = self._scores
+            out = []
+            for key in keys:
+                value = scores.get(key)
+                if value is not None:
+                    scores.move_to_end(key)
+                out.append(value)
+        hits = 0
+        fresh = {}
+        for i, key in enumerate(keys):
+            if out[i] is not None:
+                hits += 1
+                continue
+            value = fresh.get(key)
+            if value is None:
+                value = fresh[key] = compute(key)
+            out[i] = value
+        with self._lock:
+            self._scores.update(fresh)
+            self._trim()
+            self._pending.update(fresh)
+            self._counts["hits"] += hits
+            self._counts["misses"] += len(fresh)
+        return out
+
+    def save(self):
+        """Merge this process's new entries into the stored snapshot"""
+        if self.snapshot is None:
+            return 0
+        with self._save_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                for _ in range(SAVE_ATTEMPTS):
+                    try:
+                        # Re-read so entries written by other instances since our load survive
+                        data, version = self.snapshot.read()
+                        merged = self._decode(data)
+                        merged.update(pending)
+                        if len(merged) > MAX_ENTRIES:
+                            # Oldest entries first in insertion order; drop them to stay compact
+                            merged = dict(list(merged.items())[len(merged) - MAX_ENTRIES:])
+                        doc = {"version": self.version, "scores": merged}
+                        self.snapshot.write(gzip.compress(json.dumps(doc, separators=(",", ":")).encode("utf-8"), 6),
+                                            version)
+                        break
+                    except SnapshotConflict:
+                        # Another instance saved in between; merge again on top of its snapshot
+                        with self._lock:
+                            self._counts["save_conflicts"] += 1
+                else:
+                    raise SnapshotConflict(f"gave up after {SAVE_ATTEMPTS} conflicting writes")
+            except Exception as e:
+                sys.stderr.write(f"Could not save score snapshot: {e}\n")
+                with self._lock:
+                    self._pending = {**pending, **self._pending}
+                return 0
+            with self._lock:
+                self._counts["saved"] += len(pending)
+        return len(pending)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, entries=len(self._scores or ()), pending=len(self._pending))
@@ -0,0 +1,125 @@
+# _helper/secret_cache.py
+# Per-process cache in front of _helper.one_password.
+# Every 1Password lookup is a full SDK round-trip (client auth + item fetch), so
+# notes are kept for a TTL, concurrent misses for the same note share one fetch,
+# and a note close to expiry is refreshed in the background while the cached
+# value keeps being served.
+import copy
+import importlib
+import os
+import sys
+import threading
+import time
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SecretCache:
+    def __init__(self, fetch, ttl=300.0, refresh_ahead=60.0, clock=time.monotonic):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (value, expires_at)
+        self._inflight = {}  # key -> _Flight
+        self._counts = {"hits": 0, "misses": 0, "coalesced": 0, "background_refreshes": 0, "errors": 0}
+
+    def get(self, *key):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry[1]:
+                self._counts["hits"] += 1
+                if now >= entry[1] - self.refresh_ahead and key not in self._inflight:
+                    flight = self._inflight[key] = _Flight()
+                    self._counts["background_refreshes"] += 1
+                    threading.Thread(target=self._run, args=(key, flight), daemon=True).start()
+                return entry[0]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self._counts["misses"] += 1
+            else:
+                self._counts["coalesced"] += 1
+        if leader:
+            self._run(key, flight)
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _run(self, key, flight):
+        try:
+            flight.value = self._fetch(*key)
+            with self._lock:
+                self._entries[key] = (flight.value, self._clock() + self.ttl)
+        except Exception as e:
+            # A failed background refresh leaves the current value in place until it expires
+            flight.error = e
+            with self._lock:
+                self._counts["errors"] += 1
+            sys.stderr.write(f"Secret fetch failed for {key}: {e}\n")
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def invalidate(self, *key):
+        with self._lock:
+            if key:
+                self._entries.pop(key, None)
+            else:
+                self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            lookups = counts["hits"] + counts["misses"] + counts["coalesced"]
+            counts["hit_rate"] = round(counts["hits"] / lookups, 4) if lookups else None
+            counts["entries"] = len(self._entries)
+            return counts
+
+
+def _provider():
+    """SECRET_PROVIDER=module:function swaps 1Password for another source (e.g. a local fake)"""
+    spec = (os.getenv("SECRET_PROVIDER") or "").strip()
+    if spec:
+        module, _, attr = spec.partition(":")
+        return getattr(importlib.import_module(module), attr or "get_json_note_sync")
+    from _helper.one_password import get_json_note_sync
+    return get_json_note_sync
+
+
+def _env_seconds(name, default):
+    """A float from the environment; a malformed value falls back to default with a warning"""
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        sys.stderr.write(f"Ignoring {name}={raw!r}: not a number, using {default}\n")
+        return default
+
+
+def _fetch_note(vault_id, item_id):
+    return _provider()(vault_id, item_id)
+
+
+note_cache = SecretCache(
+    _fetch_note,
+    ttl=_env_seconds("SECRET_CACHE_TTL", 300.0),
+    refresh_ahead=_env_seconds("SECRET_REFRESH_AHEAD", 60.0),
+)
+
+
+def get_json_note(vault_id, item_id):
+    """Cached drop-in for get_json_note_sync; callers get their own copy of the note"""
+    return copy.deepcopy(note_cache.get(vault_id, item_id))
@@ -0,0 +1,181 @@
+# _helper/server.py
+# Self-hosted server for the API handlers, for running them on our own boxes.
+#
+#   python -m _helper.server --port 8000 --workers 4
+#
+# Every /api/... route is mounted through the router. The parent binds the
+# listening socket and pre-forks --workers processes that accept on it; each
+# worker is a ThreadingHTTPServer speaking HTTP/1.1 with persistent connections.
+# SIGTERM/SIGINT drain: workers stop accepting, finish in-flight requests
+# (closing their connections afterwards) and exit; stragglers are killed after
+# --graceful-timeout. Workers that die unexpectedly are replaced.
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from _helper.router import RouterHandler
+
+
+def debug(msg):
+    sys.stderr.write(msg + "\n")
+    sys.stderr.flush()
+
+
+class ServerHandler(RouterHandler):
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections are closed after this many seconds
+    timeout = float(os.getenv("KEEPALIVE_TIMEOUT", "15"))
+
+    def handle_one_request(self):
+        # Idle until a request line arrives; drain() hangs up on idle connections
+        self.server.track_idle(self.connection, True)
+        try:
+            super().handle_one_request()
+        finally:
+            self.server.track_idle(self.connection, False)
+
+    def parse_request(self):
+        self.server.track_idle(self.connection, False)
+        return super().parse_request()
+
+
+class WorkerServer(ThreadingHTTPServer):
+    daemon_threads = False  # server_close() waits for in-flight requests
+    draining = False
+
+    def __init__(self, sock, handler_class=ServerHandler):
+        super().__init__(sock.getsockname()[:2], handler_class, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self._idle_lock = threading.Lock()
+        self._idle = set()
+
+    def track_idle(self, conn, idle):
+        with self._idle_lock:
+            if idle and not self.draining:
+                self._idle.add(conn)
+            else:
+                self._idle.discard(conn)
+        if idle and self.draining:
+            conn.shutdown(socket.SHUT_RD)
+
+    def drain(self, graceful_timeout):
+        """Stop accepting, close idle keep-alive connections, then wait up to graceful_timeout for open requests"""
+        self.shutdown()
+        with self._idle_lock:
+            self.draining = True
+            idle, self._idle = self._idle, set()
+        for conn in idle:
+            try:
+                conn.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+        done = threading.Thread(target=self.server_close, daemon=True)
+        done.start()
+        done.join(graceful_timeout)
+
+
+def listen(host, port, backlog=1024):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    # Workers share this socket; a worker that loses the accept race must not block in accept()
+    sock.setblocking(False)
+    return sock
+
+
+def run_worker(sock, graceful_timeout):
+    server = WorkerServer(sock)
+    stop = threading.Event()
+
+    def on_signal(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stop.wait()
+    debug(f"Worker {os.getpid()} draining")
+    server.drain(graceful_timeout)
+
+
+def serve(host="0.0.0.0", port=8000, workers=1, graceful_timeout=30.0, ready=None):
+    sock = listen(host, port)
+    debug(f"Serving /api on http://{host}:{sock.getsockname()[1]} with {workers} worker(s)")
+    if ready is not None:
+        ready(sock.getsockname()[1])
+    if workers <= 1 or not hasattr(os, "fork"):
+        run_worker(sock, graceful_timeout)
+        return
+
+    children = set()
+    stopping = threading.Event()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(sock, graceful_timeout)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def on_signal(signum, frame):
+        stopping.set()
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    deadline = None
+    while children:
+        if stopping.is_set() and deadline is None:
+            deadline = time.monotonic() + graceful_timeout + 5
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            if deadline is not None and time.monotonic() > deadline:
+                for child in children:
+                    os.kill(child, signal.SIGKILL)
+            time.sleep(0.1)
+            continue
+        children.discard(pid)
+        if not stopping.is_set():
+            debug(f"Worker {pid} exited with status {status}; restarting")
+            spawn()
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the /api handlers with pre-forked HTTP/1.1 workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1))
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_TIMEOUT", "30")))
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.graceful_timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# _helper/task_graph.py
+# Run a handful of dependent I/O steps concurrently.
+# Each task names the tasks it needs; it starts as soon as those have finished
+# and is called with their results as keyword arguments. Every task is timed
+# as a span of the current request (the request context is copied into the
+# worker threads) and its start/end offsets are returned, so the overlap and
+# the critical path are visible per run.
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from _helper.timing import span
+
+
+class Task:
+    def __init__(self, fn, needs=()):
+        self.fn = fn
+        self.needs = tuple(needs)
+
+
+def critical_path(stages, needs):
+    """Names along the chain of dependencies that finished last"""
+    path = []
+    name = max(stages, key=lambda n: stages[n]["end_ms"], default=None)
+    while name is not None:
+        path.append(name)
+        name = max(needs[name], key=lambda n: stages[n]["end_ms"], default=None)
+    return path[::-1]
+
+
+def run_graph(tasks, max_workers=None):
+    """
+    tasks: {name: Task}. Returns (results by name, timings) where timings has
+    per-stage {"start_ms", "end_ms", "ms"} offsets, the wall time, the summed
+    stage time (what running them one after another would cost) and the
+    critical path. The first task error is raised once running tasks finish;
+    tasks that have not started by then are skipped.
+    """
+    for name, task in tasks.items():
+        missing = [n for n in task.needs if n not in tasks]
+        if missing:
+            raise ValueError(f"Task {name} needs unknown task(s): {', '.join(missing)}")
+
+    started = time.perf_counter()
+    results = {}
+    stages = {}
+    lock = threading.Lock()
+
+    def call(name):
+        task = tasks[name]
+        begin = time.perf_counter()
+        try:
+            with span(name):
+                return task.fn(**{n: results[n] for n in task.needs})
+        finally:
+            end = time.perf_counter()
+            with lock:
+                stages[name] = {
+                    "start_ms": round((begin - started) * 1000, 1),
+                    "end_ms": round((end - started) * 1000, 1),
+                    "ms": round((end - begin) * 1000, 1),
+                }
+
+    pending = dict(tasks)
+    running = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=max_workers or len(tasks) or 1) as pool:
+        while pending or running:
+            if error is None:
+                for name in [n for n, t in pending.items() if all(d in results for d in t.needs)]:
+                    del pending[name]
+                    # Each task gets its own copy of the request context so spans land on the request
+                    running[pool.submit(contextvars.copy_context().run, call, name)] = name
+            if not running:
+                if error is None and pending:
+                    raise ValueError(f"Tasks with circular dependencies: {', '.join(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    error = error or e
+    if error is not None:
+        raise error
+
+    timings = {
+        "stages": stages,
+        "wall_ms": round((time.perf_counter() - started) * 1000, 1),
+        "serial_ms": round(sum(s["ms"] for s in stages.values()), 1),
+        "critical_path": critical_path(stages, {n: t.needs for n, t in tasks.items()}),
+    }
+    return results, timings
@@ -0,0 +1,153 @@
+# _helper/timing.py
+# Per-request latency instrumentation shared by every handler.
+# Handlers subclass TimedRequestHandler instead of BaseHTTPRequestHandler and wrap
+# interesting work in `with span("name"):`. Spans are returned in a Server-Timing
+# header and one JSON log line per request goes to stderr with the totals.
+import contextvars
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+from _helper.profiling import RequestProfile
+
+_current = contextvars.ContextVar("request_timing", default=None)
+
+
+class Timing:
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.started = clock()
+        self.spans = {}  # name -> [total ms, count]
+        self._lock = threading.Lock()  # spans may close on worker threads
+
+    def add(self, name, ms):
+        with self._lock:
+            entry = self.spans.setdefault(name, [0.0, 0])
+            entry[0] += ms
+            entry[1] += 1
+
+    @contextmanager
+    def span(self, name):
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.add(name, (self._clock() - start) * 1000)
+
+    def restart(self):
+        self.started = self._clock()
+
+    def elapsed_ms(self):
+        return (self._clock() - self.started) * 1000
+
+    def header(self):
+        parts = [f"{name};dur={ms:.1f}" for name, (ms, _) in self.spans.items()]
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def span(name):
+    """Time a block against the current request; a no-op outside a request"""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    with timing.span(name):
+        yield
+
+
+def current():
+    return _current.get()
+
+
+class _CountingWriter:
+    def __init__(self, raw):
+        self._raw = raw
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        return self._raw.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class TimedRequestHandler(BaseHTTPRequestHandler):
+    def setup(self):
+        super().setup()
+        self.wfile = _CountingWriter(self.wfile)
+
+    def handle_one_request(self):
+        self.timing = Timing()
+        self._status = None
+        self._body_start = None
+        self.profile = None
+        token = _current.set(self.timing)
+        try:
+            super().handle_one_request()
+        finally:
+            _current.reset(token)
+            if self.profile is not None:
+                self.profile.finish({"method": self.command, "path": urlparse(self.path).path, "status": self._status})
+            if getattr(self, "command", None) and self._status is not None:
+                self._log_request()
+
+    def parse_request(self):
+        # The request line has just arrived; time from here so the wait for it
+        # on an idle keep-alive connection is not counted
+        self.timing.restart()
+        ok = super().parse_request()
+        if ok:
+            self.profile = RequestProfile.start(self.headers)
+        return ok
+
+    def send_response(self, code, message=None):
+        self._status = code
+        self._framed = False
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() in ("content-length", "transfer-encoding"):
+            self._framed = True
+        super().send_header(keyword, value)
+
+    def end_headers(self):
+        # Spans recorded after this point (the body write) only reach the log line
+        self.send_header('Server-Timing', self.timing.header())
+        if self.profile is not None:
+            self.send_header('X-Profile-Id', self.profile.id)
+        if (self.protocol_version >= "HTTP/1.1" and not getattr(self, "_framed", True)
+                and self._status not in (204, 304) and self._status >= 200 and self.command != "HEAD"):
+            # No length to frame the body with on a persistent connection: end it at close instead
+            self.send_header('Connection', 'close')
+        elif getattr(self.server, "draining", False):
+            # Shutting down (see _helper.server): tell keep-alive clients to reconnect elsewhere
+            self.send_header('Connection', 'close')
+        super().end_headers()
+        self._body_start = self.wfile.bytes
+
+    def log_fields(self):
+        """Extra fields for the request log line"""
+        return {}
+
+    def _log_request(self):
+        body_bytes = self.wfile.bytes - self._body_start if self._body_start is not None else 0
+        record = {
+            "event": "request",
+            "handler": type(self).__module__,
+            "method": self.command,
+            "path": urlparse(self.path).path,
+            "status": self._status,
+            "duration_ms": round(self.timing.elapsed_ms(), 2),
+            "response_bytes": body_bytes,
+            "spans": {name: {"ms": round(ms, 2), "count": count} for name, (ms, count) in self.timing.spans.items()},
+        }
+        record.update(self.log_fields())
+        sys.stderr.write(json.dumps(record, separators=(",", ":")) + "\n")
+        sys.stderr.flush()
@@ -0,0 +1,130 @@
+# _helper/xlsx_stream.py
+# Memory-bounded .xlsx output for large exports.
+# openpyxl keeps a styled Cell object for every template and data cell until the
+# workbook is saved. Past STREAM_ROWS rows a sheet is instead filled into a
+# SheetRecorder (plain values only) and written row by row into a write-only
+# workbook, with the template sheet's cells, styles and dimensions merged in as
+# each row goes out. Finished files are spooled to disk past SPOOL_BYTES and
+# sent to the client CHUNK_BYTES at a time.
+import os
+import tempfile
+from copy import copy
+
+STREAM_ROWS = int(os.getenv("XLSX_STREAM_ROWS", "2000"))
+SPOOL_BYTES = int(float(os.getenv("XLSX_SPOOL_MB", "8")) * 1024 * 1024)
+CHUNK_BYTES = 64 * 1024
+
+
+def spooled():
+    """A file that stays in memory up to SPOOL_BYTES and moves to a temporary file beyond"""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+
+
+def file_size(f):
+    pos = f.tell()
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(pos)
+    return size
+
+
+def send_file(wfile, f):
+    """Copy f to the response from the start, a chunk at a time"""
+    f.seek(0)
+    while True:
+        chunk = f.read(CHUNK_BYTES)
+        if not chunk:
+            break
+        wfile.write(chunk)
+
+
+class SheetRecorder:
+    """
+    Stands in for a worksheet in the fill functions, which only call
+    cell(row=, column=, value=) and add_image(img, anchor)
+    """
+
+    def __init__(self):
+        self.rows = {}  # row -> {column: value}
+        self.images = []
+
+    def cell(self, row, column, value=None):
+        # Like Worksheet.cell, None leaves the template value in place
+        if value is not None:
+            self.rows.setdefault(row, {})[column] = value
+
+    def add_image(self, img, anchor=None):
+        self.images.append((img, anchor))
+
+
+class StreamingWorkbook:
+    """Write-only workbook built from template sheets and recorded values"""
+
+    def __init__(self):
+        from openpyxl import Workbook
+
+        self.wb = Workbook(write_only=True)
+        self._styles = {}  # (template workbook, template style) -> style in this workbook
+
+    def _style(self, ws, src):
+        from openpyxl.cell import WriteOnlyCell
+
+        key = (id(src.parent.parent), tuple(src._style))
+        style = self._styles.get(key)
+        if style is None:
+            # Styles are indexes into each workbook's tables, so they are copied
+            # by value once per distinct template style
+            scratch = WriteOnlyCell(ws)
+            scratch.font = copy(src.font)
+            scratch.fill = copy(src.fill)
+            scratch.border = copy(src.border)
+            scratch.alignment = copy(src.alignment)
+            scratch.protection = copy(src.protection)
+            scratch.number_format = src.number_format
+            style = self._styles[key] = scratch._style
+        return style
+
+    def _cell(self, ws, value, src):
+        from openpyxl.cell import WriteOnlyCell
+
+        if src is None or not src.has_style:
+            return value
+        cell = WriteOnlyCell(ws, value)
+        cell._style = copy(self._style(ws, src))
+        return cell
+
+    def add_sheet(self, title, template, recorder):
+        """Write template (a worksheet of another workbook) with recorder's values on top"""
+        from openpyxl.worksheet.cell_range import CellRange
+
+        ws = self.wb.create_sheet(title)
+        # Everything but the rows must be in place before the first row is written
+        for key, dim in template.column_dimensions.items():
+            ws.column_dimensions[key].width = dim.width
+            ws.column_dimensions[key].hidden = dim.hidden
+        for key, dim in template.row_dimensions.items():
+            ws.row_dimensions[key].height = dim.height
+        for rng in template.merged_cells.ranges:
+            ws.merged_cells.add(CellRange(str(rng)))
+        ws.sheet_format = copy(template.sheet_format)
+        ws.sheet_view.showGridLines = template.sheet_view.showGridLines
+        for img, anchor in recorder.images:
+            ws.add_image(img, anchor)
+
+        template_rows = {}
+        for (row, col), cell in template._cells.items():
+            template_rows.setdefault(row, {})[col] = cell
+        last = max([*template_rows, *recorder.rows], default=0)
+        for row in range(1, last + 1):
+            src_cells = template_rows.get(row, {})
+            values = recorder.rows.pop(row, {})
+            out = [None] * max([*src_cells, *values], default=0)
+            for col, src in src_cells.items():
+                out[col - 1] = self._cell(ws, src.value, src)
+            for col, value in values.items():
+                out[col - 1] = self._cell(ws, value, src_cells.get(col))
+            ws.append(out)
+        return ws
+
+    def save(self, f):
+        self.wb.save(f)
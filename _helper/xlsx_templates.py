@@ -0,0 +1,106 @@
+# _helper/xlsx_templates.py
+# Process-wide cache of parsed .xlsx templates.
+# Parsing a template with load_workbook() costs more than filling it, so each
+# template is parsed once per process and lent out as a pristine workbook that
+# is put back exactly as loaded after use.
+import os
+import threading
+from contextlib import contextmanager
+from copy import copy
+
+from _helper.timing import span
+
+_lock = threading.Lock()
+_idle = {}  # tuple of template paths -> list of idle _Pristine workbooks
+_loads = 0
+
+
+class _Pristine:
+    def __init__(self, paths):
+        from openpyxl import load_workbook
+
+        self.wb = load_workbook(paths[0])
+        # Extra templates are imported as prototype sheets keyed by (path, title)
+        self.prototypes = {(paths[0], ws.title): ws for ws in self.wb.worksheets}
+        for path in paths[1:]:
+            src = load_workbook(path)
+            for src_ws in src.worksheets:
+                ws = import_sheet(self.wb, src_ws, f"__tpl{len(self.wb.worksheets)}")
+                self.prototypes[(path, src_ws.title)] = ws
+        self.sheets = list(self.wb._sheets)
+        self.active = self.wb.index(self.wb.active)
+        self.values = {ws: {key: cell.value for key, cell in ws._cells.items()} for ws in self.sheets}
+        self.images = {ws: list(ws._images) for ws in self.sheets}
+
+    def reset(self):
+        wb = self.wb
+        wb._sheets = list(self.sheets)
+        for ws in self.sheets:
+            snapshot = self.values[ws]
+            for key in [k for k in ws._cells if k not in snapshot]:
+                del ws._cells[key]
+            for key, value in snapshot.items():
+                cell = ws._cells[key]
+                if cell.value != value:
+                    cell.value = value
+            ws._images = list(self.images[ws])
+        wb.active = self.active
+
+
+def import_sheet(wb, src_ws, title):
+    """Copy a worksheet from another workbook (values, styles, dimensions, merges)"""
+    ws = wb.create_sheet(title)
+    for (row, col), src in src_ws._cells.items():
+        cell = ws.cell(row=row, column=col, value=src.value)
+        if src.has_style:
+            cell.font = copy(src.font)
+            cell.fill = copy(src.fill)
+            cell.border = copy(src.border)
+            cell.alignment = copy(src.alignment)
+            cell.protection = copy(src.protection)
+            cell.number_format = src.number_format
+    for key, dim in src_ws.column_dimensions.items():
+        ws.column_dimensions[key].width = dim.width
+        ws.column_dimensions[key].hidden = dim.hidden
+    for key, dim in src_ws.row_dimensions.items():
+        ws.row_dimensions[key].height = dim.height
+    for rng in src_ws.merged_cells.ranges:
+        ws.merge_cells(str(rng))
+    ws.sheet_format = copy(src_ws.sheet_format)
+    ws.sheet_view.showGridLines = src_ws.sheet_view.showGridLines
+    return ws
+
+
+@contextmanager
+def checkout(*paths):
+    """
+    Borrow a parsed copy of the template(s) at paths.
+    Yields (workbook, prototypes) where prototypes maps (absolute path, sheet
+    title) to the template sheet inside the workbook. The workbook is reset when the
+    block exits, so callers must finish saving it before then.
+    """
+    global _loads
+    paths = tuple(os.path.abspath(p) for p in paths)
+    with span("template"):
+        with _lock:
+            idle = _idle.setdefault(paths, [])
+            pristine = idle.pop() if idle else None
+        if pristine is None:
+            pristine = _Pristine(paths)
+            with _lock:
+                _loads += 1
+    try:
+        yield pristine.wb, pristine.prototypes
+    finally:
+        try:
+            pristine.reset()
+        except Exception:
+            pristine = None  # never hand out a half-reset workbook; the next caller reloads
+        if pristine is not None:
+            with _lock:
+                _idle[paths].append(pristine)
+
+
+def stats():
+    with _lock:
+        return {"loads": _loads, "idle": {"+".join(k): len(v) for k, v in _idle.items()}}
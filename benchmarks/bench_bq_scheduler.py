@@ -0,0 +1,73 @@
+# benchmarks/bench_bq_scheduler.py
+# Many brand-sentiment datasets in parallel against the fake BigQuery client
+# with project-level job quotas that reject excess jobs, with and without the
+# job scheduler. Reports failed datasets, wall time, rejected jobs, peak
+# concurrent jobs and the scheduler's retry and queue-wait metrics.
+#
+#   python benchmarks/bench_bq_scheduler.py [--datasets 24] [--parallel 12] [--max-jobs 6] [--error-rate 0.05]
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("SCORE_STORE_BACKEND", "none")
+
+from fakes import FakeBigQueryClient, install_pipeline_fakes
+from _helper.bq_scheduler import JobScheduler
+from _helper.handler_loader import API_DIR, load_handler_module
+
+
+def run(pipeline, scheduler, datasets, parallel):
+    bq, _ = install_pipeline_fakes(pipeline)
+    pipeline.bq_jobs = scheduler
+    pipeline._verified_tables.clear()
+
+    def one(ds):
+        try:
+            return pipeline.run_one(ds)["rows"] > 0
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        ok = list(pool.map(one, datasets))
+    return {
+        "failed_datasets": ok.count(False),
+        "wall_s": round(time.perf_counter() - start, 2),
+        "rejected_jobs": bq.rejected,
+        "peak_jobs": bq.peak_running,
+        "scheduler": scheduler.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--datasets", type=int, default=24)
+    parser.add_argument("--parallel", type=int, default=12, help="datasets processed at once")
+    parser.add_argument("--max-jobs", type=int, default=6, help="fake project limit on concurrent jobs")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="random rate-limit errors per job")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per fake job")
+    args = parser.parse_args()
+
+    os.environ.update(FAKE_BQ_MAX_JOBS=str(args.max_jobs), FAKE_BQ_REJECT="1",
+                      FAKE_BQ_ERROR_RATE=str(args.error_rate), FAKE_BQ_LATENCY=str(args.latency),
+                      FAKE_BQ_ROWS="500")
+    load_handler_module(os.path.join(API_DIR, "brand-sentiment", "handler.py"))
+    pipeline = sys.modules["_api_brand_sentiment.pipeline"]
+    pipeline.logging.disable()
+    datasets = [f"dataset_{i}" for i in range(args.datasets)]
+
+    # Unscheduled: no concurrency bound and no retries, i.e. every job straight to BigQuery
+    for name, scheduler in (("unscheduled", JobScheduler(max_concurrency=1000, min_concurrency=1000, retries=0)),
+                            ("scheduled", JobScheduler(backoff=args.latency))):
+        print(name, json.dumps(run(pipeline, scheduler, datasets, args.parallel), indent=2))
+
+
+if __name__ == "__main__":
+    main()
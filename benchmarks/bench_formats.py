@@ -0,0 +1,74 @@
+# benchmarks/bench_formats.py
+# Latency and response size of each generate-copy output format versus xlsx.
+#
+#   python benchmarks/bench_formats.py [--sizes 10,100,1000] [--repeat 5]
+#
+# Each handler is served from a local ThreadingHTTPServer and called over real HTTP.
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+# Measure real work, not export cache hits
+os.environ.setdefault("EXPORT_CACHE_MEMORY_MB", "0")
+os.environ.setdefault("EXPORT_CACHE_DISK_MB", "0")
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import GENERATORS
+from _helper.copy_batch import load_handler
+from _helper.copy_formats import FORMATS
+
+
+def serve(kind):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), load_handler(kind).handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def post(port, body, fmt):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    start = time.perf_counter()
+    conn.request("POST", f"/?format={fmt}", body=body, headers={"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    payload = resp.read()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    if resp.status != 200:
+        raise RuntimeError(f"{fmt}: HTTP {resp.status} {payload[:200]!r}")
+    return elapsed, len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare generate-copy output formats against xlsx")
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--kinds", default=",".join(GENERATORS))
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<9} {'rows':>6} {'format':<7} {'p50 ms':>9} {'bytes':>10} {'vs xlsx':>8}")
+    for kind in args.kinds.split(","):
+        server = serve(kind)
+        port = server.server_address[1]
+        for size in (int(s) for s in args.sizes.split(",")):
+            body = json.dumps({"llm_output": GENERATORS[kind](size)})
+            results = {}
+            for fmt in FORMATS:
+                post(port, body, fmt)  # warm-up
+                runs = [post(port, body, fmt) for _ in range(args.repeat)]
+                results[fmt] = (statistics.median(t for t, _ in runs) * 1000, runs[0][1])
+            base = results["xlsx"][0]
+            for fmt, (ms, size_bytes) in results.items():
+                print(f"{kind:<9} {size:>6} {fmt:<7} {ms:>9.1f} {size_bytes:>10} {base / ms:>7.1f}x")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_generation.py
+# Brief -> workbook through each generate-copy handler against the local mock
+# OpenAI server: serial versus concurrent generation, then a repeat brief that
+# is served from the completion cache.
+#
+#   python benchmarks/bench_generation.py [--pages 12] [--latency 0.3] [--concurrency 8]
+import argparse
+import http.client
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Measure generation, not cache hits left over from earlier runs
+os.environ.setdefault("EXPORT_CACHE_MEMORY_MB", "0")
+os.environ.setdefault("EXPORT_CACHE_DISK_MB", "0")
+os.environ.setdefault("COMPLETION_CACHE_DISK_MB", "0")
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+import mock_openai
+from bench_formats import serve
+from _helper import copy_generation
+
+
+def brief(kind, pages):
+    urls = [{"url": f"https://example.com/safari/{i}", "topic": f"Safari holiday {i}"} for i in range(pages)]
+    base = {"brand": "Acme Travel", "description": "Tailor-made luxury safaris", "keywords": ["safari", "kenya"]}
+    if kind == "facebook":
+        return {**base, "ads_per_channel": 3}
+    if kind == "google":
+        return {**base, "urls": urls, "ads_per_url": 2}
+    return {**base, "urls": urls}
+
+
+def post(port, payload):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    start = time.perf_counter()
+    conn.request("POST", "/", body=json.dumps(payload), headers={"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    body = resp.read()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    if resp.status != 200:
+        raise RuntimeError(f"HTTP {resp.status} {body[:200]!r}")
+    return elapsed * 1000, len(body), resp.getheader("Server-Timing")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent copy generation against a mock OpenAI server")
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--kinds", default="google,facebook,seo")
+    args = parser.parse_args()
+
+    mock = mock_openai.serve(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{mock.server_address[1]}/v1"
+
+    print(f"{'endpoint':<9} {'prompts':>7} {'mode':<11} {'ms':>9} {'bytes':>9} {'api calls':>9}")
+    for kind in args.kinds.split(","):
+        server = serve(kind)
+        port = server.server_address[1]
+        prompts = len(copy_generation.build_prompts(kind, brief(kind, args.pages)))
+        for mode, concurrency, regenerate in (("serial", 1, True), ("concurrent", args.concurrency, True),
+                                              ("cached", args.concurrency, False)):
+            copy_generation.CONCURRENCY = concurrency
+            calls = mock_openai.MockOpenAIHandler.calls
+            ms, size, _ = post(port, {"brief": brief(kind, args.pages), "regenerate": regenerate})
+            calls = mock_openai.MockOpenAIHandler.calls - calls
+            print(f"{kind:<9} {prompts:>7} {mode:<11} {ms:>9.1f} {size:>9} {calls:>9}")
+        server.shutdown()
+    mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_row_batch.py
+# Memory of the brand-sentiment rows between scoring and the staging load:
+# the columnar SentimentBatch versus the list of row dicts (and the second list
+# of staging dicts) the pipeline used to build. Scores are synthetic, so VADER
+# is not part of the measurement. Checks that both produce the same NDJSON.
+#
+#   python benchmarks/bench_row_batch.py [--queries 1000000]
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("SCORE_STORE_BACKEND", "none")
+
+from fakes import search_queries
+from _helper.handler_loader import API_DIR, load_handler_module
+
+NOW = "2026-01-05 06:00:00"
+
+
+def dict_rows(queries, scores, monday):
+    """What analyze_sentiment used to return"""
+    return [{"query": q, "Sentiment_Score": float(s), "MONDAY": monday} for q, s in zip(queries, scores)]
+
+
+def dict_ndjson(rows):
+    """What stage_rows used to build before the load"""
+    staged_rows = [{
+        "MONDAY": r["MONDAY"],
+        "query": r["query"],
+        "Sentiment_Score": r["Sentiment_Score"],
+        "inserted_at": NOW,
+        "updated_at": NOW
+    } for r in rows]
+    return ("\n".join(json.dumps(x, separators=(",", ":")) for x in staged_rows)).encode("utf-8")
+
+
+def measure(build, serialize):
+    """(retained bytes after build, peak bytes while serializing, seconds, output bytes)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = build()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    data = serialize(rows)
+    peak = tracemalloc.get_traced_memory()[1]
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    del rows
+    return retained, peak, elapsed, data
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    load_handler_module(os.path.join(API_DIR, "brand-sentiment", "handler.py"))
+    pipeline = sys.modules["_api_brand_sentiment.pipeline"]
+
+    # The fetched query strings exist either way and are allocated outside the measurement
+    queries = search_queries("bench", args.queries)
+    rng = random.Random(0)
+    scores = [round(rng.uniform(-1, 1), 4) for _ in queries]
+    monday = pipeline.last_monday_str()
+    query_mb = sum(sys.getsizeof(q) for q in queries) / 1e6
+
+    results = {
+        "dicts": measure(lambda: dict_rows(queries, scores, monday), dict_ndjson),
+        "columnar": measure(lambda: pipeline.SentimentBatch(queries, array("d", scores), monday),
+                            lambda batch: batch.to_ndjson(NOW).getvalue()),
+    }
+    if results["dicts"][3] != results["columnar"][3]:
+        print("NDJSON differs between the two representations")
+        sys.exit(1)
+
+    print(f"{args.queries} queries ({query_mb:.1f} MB of query strings, not counted); NDJSON identical, "
+          f"{len(results['columnar'][3]) / 1e6:.1f} MB")
+    print(f"{'rows':<10} {'held MB':>8} {'B/row':>6} {'staging peak MB':>16} {'B/row':>6} {'seconds':>8}")
+    for name, (retained, peak, elapsed, _) in results.items():
+        print(f"{name:<10} {retained / 1e6:>8.1f} {retained / args.queries:>6.0f} "
+              f"{peak / 1e6:>16.1f} {peak / args.queries:>6.0f} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmarks/bench_xlsx_stream.py
+# Peak memory of large batch exports: the in-memory path (every cell held by
+# openpyxl, the file built in a BytesIO and sent in one write) versus the
+# streaming path (write-only sheets, output spooled to disk, sent in chunks).
+# Each export runs in a fresh interpreter; peak RSS is read from /proc after
+# the templates are loaded, so it covers filling, saving and sending only.
+#
+#   python benchmarks/bench_xlsx_stream.py [--rows 2000,10000,40000] [--docs 4] [--output workbook,zip]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+KINDS = ("google", "facebook", "seo")
+
+
+def _status(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class _Sink:
+    """Stands in for the response socket"""
+
+    def __init__(self):
+        self.bytes = 0
+        self.writes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        self.writes += 1
+
+
+def child(mode, output, rows, docs):
+    """Runs in a fresh interpreter: one export, reported as JSON on stdout"""
+    if mode == "memory":
+        os.environ["XLSX_STREAM_ROWS"] = str(10 ** 9)
+        os.environ["XLSX_SPOOL_MB"] = str(10 ** 6)
+    os.environ["BATCH_WORKERS"] = "1"
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from corpus import GENERATORS
+    from _helper.copy_batch import _row_count, _template, load_handler, parse_document, run_batch
+    from _helper.xlsx_stream import send_file
+    from _helper.xlsx_templates import checkout
+
+    # Documents of each kind; google ads fill two rows each plus their sitelinks
+    per_doc = max(1, rows // docs)
+    documents = []
+    for i in range(docs):
+        kind = KINDS[i % len(KINDS)]
+        count = max(1, per_doc // 6) if kind == "google" else per_doc
+        documents.append({"type": kind, "name": f"{kind} {i}", "llm_output": GENERATORS[kind](count, seed=i)})
+    exported_rows = sum(_row_count(d["type"], parse_document(d["type"], d["llm_output"])) for d in documents)
+
+    # Load handlers and templates first so only the export itself is measured
+    for kind in KINDS:
+        load_handler(kind)
+    templates = tuple(sorted({_template(d["type"]) for d in documents}))
+    for key in ([(t,) for t in templates] + [templates]):
+        with checkout(*key):
+            pass
+    import gc
+    gc.collect()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # reset the peak RSS counter
+    except OSError:
+        pass
+    baseline = _status("VmRSS")
+
+    start = time.perf_counter()
+    sink = _Sink()
+    file_obj, report = run_batch(documents, output=output)
+    with file_obj:
+        if mode == "memory":
+            sink.write(file_obj.read())
+        else:
+            send_file(sink, file_obj)
+    elapsed = time.perf_counter() - start
+    peak = _status("VmHWM") - baseline
+    print(json.dumps({"rows": exported_rows, "peak": peak, "seconds": elapsed, "bytes": sink.bytes,
+                      "writes": sink.writes, "streamed": report["streamed"],
+                      "on_disk": getattr(file_obj, "_rolled", False)}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="2000,10000,40000", help="approximate exported rows per request")
+    parser.add_argument("--docs", type=int, default=4, help="documents per request")
+    parser.add_argument("--output", default="workbook,zip")
+    parser.add_argument("--child", nargs=4, metavar=("MODE", "OUTPUT", "ROWS", "DOCS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        mode, output, rows, docs = args.child
+        child(mode, output, int(rows), int(docs))
+        return
+
+    print(f"{'output':<9} {'rows':>7} {'path':<9} {'peak MB':>8} {'KB/row':>7} {'seconds':>8} {'MB out':>7} {'writes':>7}")
+    for output in args.output.split(","):
+        for rows in (int(r) for r in args.rows.split(",")):
+            for mode in ("memory", "streaming"):
+                proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, output,
+                                       str(rows), str(args.docs)], capture_output=True, text=True, cwd=ROOT)
+                if proc.returncode:
+                    print(proc.stderr[-2000:])
+                    sys.exit(1)
+                r = json.loads(proc.stdout.strip().splitlines()[-1])
+                path = mode + ("*" if r["on_disk"] else "")
+                print(f"{output:<9} {r['rows']:>7} {path:<9} {r['peak'] / 2 ** 20:>8.1f} "
+                      f"{r['peak'] / 1024 / r['rows']:>7.2f} {r['seconds']:>8.2f} {r['bytes'] / 1e6:>7.2f} {r['writes']:>7}")
+    print("* output spooled to a temporary file")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# benchmarks/cold_start.py
+# Cold-start latency and frequency: one function per endpoint (vercel.json)
+# versus the single router function (vercel.router.json).
+#
+#   python benchmarks/cold_start.py [--runs 3] [--rate 0.5] [--keep-warm 5] [--hours 24]
+#
+# Latency is measured for real: every sample is a fresh interpreter that imports
+# the handler (or the router), serves the first request over HTTP and exits.
+# Frequency is simulated: Poisson traffic per endpoint, where an instance that
+# has been idle for --keep-warm minutes is recycled, combined with the measured
+# latencies.
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ROUTES = ("test", "generate-copy/google", "generate-copy/facebook", "generate-copy/seo", "generate-copy/batch")
+
+
+def _request(route):
+    """(method, body) for a route's first request"""
+    kind = route.rsplit("/", 1)[-1]
+    if route.startswith("generate-copy/") and kind != "batch":
+        from corpus import GENERATORS
+        return "POST", json.dumps({"llm_output": GENERATORS[kind](5)})
+    return "GET", None
+
+
+def child(layout, routes):
+    """Runs in a fresh interpreter: load, serve the first request per route, report ms since start"""
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from _helper.handler_loader import API_DIR, load_handler_module
+
+    if layout == "router":
+        cls = load_handler_module(os.path.join(ROOT, "vercel", "router", "handler.py")).handler
+    else:
+        cls = load_handler_module(os.path.join(API_DIR, *routes[0].split("/"), "handler.py")).handler
+    import_ms = (time.perf_counter() - start) * 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), cls)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    first = {}
+    for route in routes:
+        method, body = _request(route)
+        t = time.perf_counter()
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        conn.request(method, f"/api/{route}", body=body, headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        resp.read()
+        conn.close()
+        if resp.status != 200:
+            raise SystemExit(f"{route}: HTTP {resp.status}")
+        first[route] = {"request_ms": (time.perf_counter() - t) * 1000, "since_start_ms": (time.perf_counter() - start) * 1000}
+    server.shutdown()
+    print(json.dumps({"import_ms": import_ms, "first": first}))
+
+
+def spawn(layout, routes):
+    env = dict(os.environ, EXPORT_CACHE_MEMORY_MB="0", EXPORT_CACHE_DISK_MB="0")
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, __file__, "--child", layout, ",".join(routes)],
+                         capture_output=True, text=True, env=env, check=True)
+    wall = (time.perf_counter() - start) * 1000
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    # Interpreter start-up is part of a cold start too
+    startup = wall - max(f["since_start_ms"] for f in result["first"].values())
+    return startup, result
+
+
+def measure(routes, runs):
+    """Median cold latency per route for both layouts, plus the router's per-route lazy load cost"""
+    function_ms = {}
+    for route in routes:
+        samples = []
+        for _ in range(runs):
+            startup, result = spawn("function", [route])
+            samples.append(startup + result["first"][route]["since_start_ms"])
+        function_ms[route] = statistics.median(samples)
+
+    router_cold, route_load = [], {r: [] for r in routes}
+    for i in range(runs):
+        # Rotate so each route is measured both as the process's first request and as a later one
+        order = list(routes[i % len(routes):]) + list(routes[:i % len(routes)])
+        startup, result = spawn("router", order)
+        router_cold.append(startup + result["import_ms"])
+        for route in order:
+            f = result["first"][route]
+            route_load[route].append(f["request_ms"])
+    return function_ms, statistics.median(router_cold), {r: statistics.median(v) for r, v in route_load.items()}
+
+
+def simulate(routes, rate_per_min, keep_warm_min, hours, function_ms, router_ms, route_ms, seed=1):
+    rng = random.Random(seed)
+    horizon = hours * 3600
+    arrivals = []
+    for route in routes:
+        t = rng.expovariate(rate_per_min / 60)
+        while t < horizon:
+            arrivals.append((t, route))
+            t += rng.expovariate(rate_per_min / 60)
+    arrivals.sort()
+    keep_warm = keep_warm_min * 60
+
+    per_function = {"cold_starts": 0, "cold_ms": 0.0}
+    last_seen = {}
+    for t, route in arrivals:
+        if route not in last_seen or t - last_seen[route] > keep_warm:
+            per_function["cold_starts"] += 1
+            per_function["cold_ms"] += function_ms[route]
+        last_seen[route] = t
+
+    router = {"cold_starts": 0, "route_loads": 0, "cold_ms": 0.0}
+    last, loaded = None, set()
+    for t, route in arrivals:
+        if last is None or t - last > keep_warm:
+            router["cold_starts"] += 1
+            router["cold_ms"] += router_ms
+            loaded = set()
+        if route not in loaded:
+            router["route_loads"] += 1
+            router["cold_ms"] += route_ms[route]
+            loaded.add(route)
+        last = t
+    return len(arrivals), per_function, router
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold starts: per-function layout versus the single router")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--routes", default=",".join(ROUTES))
+    parser.add_argument("--rate", type=float, default=0.5, help="requests per minute per endpoint")
+    parser.add_argument("--keep-warm", type=float, default=5.0, help="idle minutes before an instance is recycled")
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--child", nargs=2, metavar=("LAYOUT", "ROUTES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child[0], args.child[1].split(","))
+        return
+
+    routes = args.routes.split(",")
+    function_ms, router_ms, route_ms = measure(routes, args.runs)
+    print(f"{'route':<24} {'function cold ms':>17} {'router route load ms':>21}")
+    for route in routes:
+        print(f"{route:<24} {function_ms[route]:>17.1f} {route_ms[route]:>21.1f}")
+    print(f"{'router process start':<24} {'':>17} {router_ms:>21.1f}")
+
+    requests, per_function, router = simulate(routes, args.rate, args.keep_warm, args.hours,
+                                              function_ms, router_ms, route_ms)
+    print(f"\nSimulated {requests} requests over {args.hours:g} h "
+          f"({args.rate:g}/min per endpoint, {args.keep_warm:g} min keep-warm)")
+    print(f"{'layout':<14} {'cold starts':>12} {'route loads':>12} {'cold ms total':>14} {'cold ms/request':>16}")
+    print(f"{'per-function':<14} {per_function['cold_starts']:>12} {'-':>12} "
+          f"{per_function['cold_ms']:>14.0f} {per_function['cold_ms'] / max(requests, 1):>16.1f}")
+    print(f"{'router':<14} {router['cold_starts']:>12} {router['route_loads']:>12} "
+          f"{router['cold_ms']:>14.0f} {router['cold_ms'] / max(requests, 1):>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
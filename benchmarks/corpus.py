@@ -0,0 +1,108 @@
+# benchmarks/corpus.py
+# Synthetic LLM outputs shaped like what the generate-copy functions receive.
+import random
+import zlib
+
+_WORDS = ("luxury safari kenya tanzania escape beach villa private guided tour tailor-made "
+          "holiday expert island retreat wildlife adventure honeymoon family journey").split()
+
+
+def _phrase(rng, words):
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize()
+
+
+def google_ads_output(ads, sitelinks=4, seed=1):
+    rng = random.Random(seed)
+    out = []
+    for i in range(ads):
+        out.append(f"**Ad {i + 1}**")
+        for n in range(1, sitelinks + 1):
+            out.append(f"SiteLink ({n}): {_phrase(rng, 3)}")
+            out.append(f"SiteLink Description ({n}): {_phrase(rng, 6)}")
+            out.append(f"SiteLink URL ({n}): https://example.com/{rng.choice(_WORDS)}/{n}")
+        headline = _phrase(rng, 4)
+        out.append(f"Headline (1): {headline} ({len(headline)})")
+        out.append(f"Headline (2): {_phrase(rng, 4)}")
+        out.append(f"Description (1): {_phrase(rng, 12)}")
+        out.append(f"Description (2): {_phrase(rng, 12)}")
+        out.append(f"Path (1): {rng.choice(_WORDS)}")
+        out.append(f"Path (2): {rng.choice(_WORDS)}")
+        out.append("---")
+    return "\n".join(out)
+
+
+def facebook_output(ads, seed=1):
+    rng = random.Random(seed)
+    channels = ("Image Facebook Feed", "Facebook Stories", "Facebook Reels", "Facebook Video Feed")
+    out = []
+    for i in range(ads):
+        if i % 3 == 0:
+            out.append(f"### {i // 3 % 4 + 1}. **{channels[i // 3 % 4]}**")
+        out.append(f"Primary text: {_phrase(rng, 25)}")
+        out.append(f"Headline: {_phrase(rng, 5)}")
+        out.append("")
+    return "\n".join(out)
+
+
+def seo_output(pages, seed=1):
+    rng = random.Random(seed)
+    out = []
+    for i in range(pages):
+        title = _phrase(rng, 6)
+        meta = _phrase(rng, 20)
+        out.append(f"Line {i + 1} (URL: https://example.com/{rng.choice(_WORDS)}/{i}):")
+        out.append("For input: Page {%s} Brand {Acme Travel}" % title)
+        out.append(f"Title {i + 1}: {title} ({len(title)})")
+        out.append(f"Meta Description {i + 1}: {meta}")
+        out.append("")
+    return "\n".join(out)
+
+
+GENERATORS = {
+    "google": google_ads_output,
+    "facebook": facebook_output,
+    "seo": seo_output,
+}
+
+
+def messy_markdown(text, seed=1):
+    """The same output wrapped the way chat models tend to: preamble, code fence,
+    CRLF line endings, stray bold labels, bullets, trailing spaces and blank lines"""
+    rng = random.Random(seed)
+    out = ["Sure! Here is the copy you asked for:", "", "```markdown"]
+    for line in text.splitlines():
+        roll = rng.random()
+        if roll < 0.05 and ":" in line:
+            label, value = line.split(":", 1)
+            line = f"**{label}:**{value}"
+        elif roll < 0.10:
+            line = f"- {line}"
+        elif roll < 0.20:
+            line = line + "  "
+        out.append(line)
+        if rng.random() < 0.1:
+            out.append("")
+    out += ["```", "", "Let me know if you would like any changes!"]
+    return "\r\n".join(out)
+
+
+# Named inputs for benchmarks/golden.py: (kind, generator arguments, messy)
+CASES = {
+    "google-small": ("google", {"ads": 3}, False),
+    "google-20-sitelinks": ("google", {"ads": 25, "sitelinks": 20}, False),
+    "google-large": ("google", {"ads": 2000}, False),
+    "google-messy": ("google", {"ads": 60}, True),
+    "facebook-small": ("facebook", {"ads": 6}, False),
+    "facebook-large": ("facebook", {"ads": 3000}, False),
+    "facebook-messy": ("facebook", {"ads": 90}, True),
+    "seo-small": ("seo", {"pages": 5}, False),
+    "seo-large": ("seo", {"pages": 2000}, False),
+    "seo-messy": ("seo", {"pages": 90}, True),
+}
+
+
+def case_output(name):
+    kind, kwargs, messy = CASES[name]
+    seed = zlib.crc32(name.encode("utf-8"))
+    text = GENERATORS[kind](**kwargs, seed=seed)
+    return messy_markdown(text, seed=seed) if messy else text
@@ -0,0 +1,231 @@
+# benchmarks/fakes.py
+# Local stand-ins for external services, used by the benchmarks and for running
+# the handlers without credentials.
+#
+#   SECRET_PROVIDER=benchmarks.fakes:get_json_note_sync   (with the repo root on sys.path)
+#   install_pipeline_fakes(pipeline)                      BigQuery and S3 for brand-sentiment
+#   install_app_fakes()                                   the _app package the example endpoint imports
+#   benchmarks/mock_openai.py                             OpenAI chat completions
+import gzip
+import io
+import json
+import os
+import sys
+import threading
+import time
+import types
+
+_lock = threading.Lock()
+calls = {"get_json_note_sync": 0}
+
+
+def get_json_note_sync(vault_id, item_id):
+    """Fake 1Password note lookup with a configurable round-trip delay"""
+    with _lock:
+        calls["get_json_note_sync"] += 1
+    time.sleep(float(os.getenv("FAKE_SECRET_LATENCY", "0.2")))
+    return {"vault_id": vault_id, "item_id": item_id, "note": {"api_key": "fake-key"}}
+
+
+# ---------------- BigQuery ----------------
+class _FakeJob:
+    def __init__(self, rows=(), bytes_processed=0):
+        self._rows = list(rows)
+        self.total_bytes_processed = bytes_processed
+
+    def result(self):
+        return self._rows
+
+
+class FakeBigQueryClient:
+    """
+    Enough of google.cloud.bigquery.Client for the brand-sentiment pipeline.
+    Every job waits FAKE_BQ_LATENCY seconds. The weekly query fetch returns
+    FAKE_BQ_ROWS synthetic search queries per dataset.
+
+    Quotas: at most FAKE_BQ_MAX_JOBS jobs run at once (0 = unlimited) and at
+    most 2 MERGEs per table. Past a limit the job waits, or with
+    FAKE_BQ_REJECT=1 fails with a rate-limit error like BigQuery does.
+    FAKE_BQ_ERROR_RATE adds random rate-limit errors on top.
+
+    Bytes processed are nominal, at FAKE_BQ_ROW_BYTES per source row and day.
+    A 7-day source scan is rows * 7 days. A query index refresh reads
+    QUERY_INDEX_LOOKBACK_DAYS + 1 days plus the index. An index read is a
+    quarter of a row per query. Dry runs return the bytes without running a job.
+    """
+
+    def __init__(self, project="fake-project"):
+        self.project = project
+        self.latency = float(os.getenv("FAKE_BQ_LATENCY", "0.2"))
+        self.rows = int(os.getenv("FAKE_BQ_ROWS", "2000"))
+        self.row_bytes = int(os.getenv("FAKE_BQ_ROW_BYTES", "200"))
+        self.max_jobs = int(os.getenv("FAKE_BQ_MAX_JOBS", "0"))
+        self.reject = os.getenv("FAKE_BQ_REJECT", "") == "1"
+        self.error_rate = float(os.getenv("FAKE_BQ_ERROR_RATE", "0"))
+        self._cond = threading.Condition()
+        self._running = 0
+        self._dml = {}
+        self.peak_running = 0
+        self.rejected = 0
+        self.tables = {}
+
+    def _rate_limited(self, message):
+        from google.api_core.exceptions import Forbidden
+
+        with _lock:
+            self.rejected += 1
+        return Forbidden(message, errors=[{"reason": "rateLimitExceeded", "message": message}])
+
+    def _job(self, table=None):
+        import random
+
+        if self.error_rate and random.random() < self.error_rate:
+            raise self._rate_limited("Exceeded rate limits: too many api requests per user per method")
+        with self._cond:
+            while True:
+                jobs_full = self.max_jobs and self._running >= self.max_jobs
+                dml_full = table is not None and self._dml.get(table, 0) >= 2
+                if not jobs_full and not dml_full:
+                    break
+                if self.reject:
+                    raise self._rate_limited("Exceeded rate limits: too many concurrent queries for this project"
+                                             if jobs_full else f"Too many DML statements outstanding against table {table}")
+                self._cond.wait()
+            self._running += 1
+            self.peak_running = max(self.peak_running, self._running)
+            if table is not None:
+                self._dml[table] = self._dml.get(table, 0) + 1
+        try:
+            time.sleep(self.latency)
+        finally:
+            with self._cond:
+                self._running -= 1
+                if table is not None:
+                    self._dml[table] -= 1
+                self._cond.notify_all()
+
+    def query(self, sql, job_config=None):
+        source_scan = self.rows * self.row_bytes * 7
+        if getattr(job_config, "dry_run", False):
+            return _FakeJob(bytes_processed=source_scan)
+        with _lock:
+            calls["bigquery.query"] = calls.get("bigquery.query", 0) + 1
+        merge = sql.lstrip().startswith("MERGE")
+        self._job(sql.split("`")[1] if merge else None)
+        dataset = sql.split("`")[1].split(".")[1] if "`" in sql else None
+        if "SELECT DISTINCT query" in sql:
+            return _FakeJob(({"query": q} for q in search_queries(dataset, self.rows)), source_scan)
+        if sql.lstrip().startswith("DECLARE since"):
+            days = int(os.getenv("QUERY_INDEX_LOOKBACK_DAYS", "3")) + 1
+            return _FakeJob(bytes_processed=int(self.rows * self.row_bytes * (days + 0.25)))
+        if sql.lstrip().startswith("SELECT query") and "last_seen" in sql:
+            return _FakeJob(({"query": q} for q in search_queries(dataset, self.rows)), self.rows * self.row_bytes // 4)
+        return _FakeJob()
+
+    def load_table_from_file(self, file_obj, destination, job_config=None):
+        with _lock:
+            calls["bigquery.load"] = calls.get("bigquery.load", 0) + 1
+        self.tables[destination] = file_obj.read()
+        self._job()
+        return _FakeJob()
+
+    def delete_table(self, table, not_found_ok=False):
+        self.tables.pop(table, None)
+
+
+def search_queries(dataset, count):
+    """Deterministic Search Console-style queries for a dataset"""
+    import random
+
+    rng = random.Random(dataset)
+    words = ("luxury safari kenya tanzania beach villa private guided tour honeymoon family holiday "
+             "best worst cheap amazing terrible review cancel refund scam wonderful disappointing "
+             "maldives mauritius bali hotel resort yacht st lucia").split()
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(2, 6))) + f" {i}" for i in range(count)]
+
+
+# ---------------- S3 ----------------
+class FakeS3Client:
+    """
+    In-memory S3 with get/put/delete; missing keys raise NoSuchKey like boto3.
+    Objects carry an ETag, and puts and deletes honour IfNoneMatch="*" and IfMatch.
+    Any sentiment/.../negatives.json.gz that was never put returns `negatives`.
+    """
+
+    def __init__(self, negatives=("scam", "refund", "terrible")):
+        self.latency = float(os.getenv("FAKE_S3_LATENCY", "0.05"))
+        self.objects = {}
+        self.etags = {}
+        self._versions = 0
+        self._negatives = gzip.compress(json.dumps({"keywords": list(negatives)}).encode("utf-8"))
+
+    def _error(self, code, operation):
+        from botocore.exceptions import ClientError
+        return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+    def _check(self, Bucket, Key, IfMatch, operation):
+        if IfMatch is None:
+            return
+        if (Bucket, Key) not in self.objects:
+            raise self._error("NoSuchKey", operation)
+        if self.etags[(Bucket, Key)] != IfMatch:
+            raise self._error("PreconditionFailed", operation)
+
+    def get_object(self, Bucket, Key, **kwargs):
+        time.sleep(self.latency)
+        with _lock:
+            calls["s3.get_object"] = calls.get("s3.get_object", 0) + 1
+            body = self.objects.get((Bucket, Key))
+            etag = self.etags.get((Bucket, Key))
+        if body is None and Key.startswith("sentiment/") and Key.endswith("/negatives.json.gz"):
+            body, etag = self._negatives, '"negatives"'
+        if body is None:
+            raise self._error("NoSuchKey", "GetObject")
+        return {"Body": io.BytesIO(body), "ETag": etag}
+
+    def put_object(self, Bucket, Key, Body, IfNoneMatch=None, IfMatch=None, **kwargs):
+        time.sleep(self.latency)
+        with _lock:
+            if IfNoneMatch == "*" and (Bucket, Key) in self.objects:
+                raise self._error("PreconditionFailed", "PutObject")
+            self._check(Bucket, Key, IfMatch, "PutObject")
+            self._versions += 1
+            self.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.read()
+            self.etags[(Bucket, Key)] = f'"{self._versions}"'
+            return {"ETag": self.etags[(Bucket, Key)]}
+
+    def delete_object(self, Bucket, Key, IfMatch=None, **kwargs):
+        with _lock:
+            self._check(Bucket, Key, IfMatch, "DeleteObject")
+            self.objects.pop((Bucket, Key), None)
+            self.etags.pop((Bucket, Key), None)
+        return {}
+
+
+def install_pipeline_fakes(pipeline):
+    """Point a loaded brand-sentiment pipeline module at fake BigQuery and S3 clients"""
+    bq = FakeBigQueryClient()
+    s3 = FakeS3Client()
+    pipeline.BIGQUERY_PROJECT = bq.project
+    pipeline.OUTPUT_TABLE = "brand_sentiment"
+    pipeline.get_bq_client = lambda project: bq
+    pipeline._s3 = lambda: s3
+    return bq, s3
+
+
+# ---------------- _app ----------------
+def install_app_fakes():
+    """
+    Register a stand-in for the _app package (not part of this repo) so the
+    example endpoint imports; it always reports running in the cloud
+    """
+    if "_app.local.environment" in sys.modules:
+        return
+    environment = types.ModuleType("_app.local.environment")
+    environment.is_running_locally = lambda: False
+    environment.load_env = lambda *args, **kwargs: None
+    local = types.ModuleType("_app.local")
+    local.environment = environment
+    app = types.ModuleType("_app")
+    app.local = local
+    sys.modules.update({"_app": app, "_app.local": local, "_app.local.environment": environment})
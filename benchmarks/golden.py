@@ -0,0 +1,237 @@
+# benchmarks/golden.py
+# Equivalence check and benchmark for the generate-copy parsers and exports.
+#
+#   python benchmarks/golden.py            # compare every case against benchmarks/golden/
+#   python benchmarks/golden.py --bench    # ... and report parse throughput, export latency and memory
+#   python benchmarks/golden.py --update   # rewrite the golden files after an intended change
+#
+# Each case in corpus.CASES (plus two batch requests) is POSTed to its handler
+# over HTTP. The returned workbook is read back and reduced to every non-empty
+# cell's value and formatting, merged ranges, column widths and image count,
+# which must match the golden file cell for cell. Exits 1 on any difference.
+import argparse
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import zipfile
+from io import BytesIO
+
+# Measure real work, not export cache hits
+os.environ.setdefault("EXPORT_CACHE_MEMORY_MB", "0")
+os.environ.setdefault("EXPORT_CACHE_DISK_MB", "0")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_DIR = os.path.join(BENCH_DIR, "golden")
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_formats import serve
+from corpus import CASES, case_output
+from _helper.copy_batch import parse_document
+
+BATCH_CASES = {
+    "batch-workbook": ("workbook", ["google-small", "google-messy", "facebook-small", "seo-messy"]),
+    "batch-zip": ("zip", ["google-20-sitelinks", "facebook-messy", "seo-small"]),
+}
+
+
+def request_for(name):
+    """(endpoint kind, JSON body, input digest) for a case"""
+    if name in BATCH_CASES:
+        output, parts = BATCH_CASES[name]
+        docs = [{"type": CASES[p][0], "name": p, "llm_output": case_output(p)} for p in parts]
+        body = {"documents": docs, "output": output}
+        return "batch", body, hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+    text = case_output(name)
+    return CASES[name][0], {"llm_output": text}, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _color(color):
+    return None if color is None else str(getattr(color, "rgb", None) or getattr(color, "theme", None))
+
+
+def workbook_cells(data):
+    """A workbook reduced to what a reader of the spreadsheet sees"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(BytesIO(data))
+    sheets = []
+    for ws in wb.worksheets:
+        cells = []
+        for row in ws.iter_rows():
+            for cell in row:
+                if cell.value is None:
+                    continue
+                font = cell.font
+                cells.append([cell.coordinate, cell.value, cell.data_type, cell.number_format,
+                              bool(font.b), bool(font.i), font.sz, _color(font.color),
+                              _color(cell.fill.fgColor) if cell.fill.fill_type else None,
+                              cell.alignment.horizontal, bool(cell.alignment.wrap_text)])
+        sheets.append({
+            "title": ws.title,
+            "cells": cells,
+            "merged": sorted(str(r) for r in ws.merged_cells.ranges),
+            "widths": {k: d.width for k, d in sorted(ws.column_dimensions.items()) if d.width},
+            "images": len(getattr(ws, "_images", ())),
+        })
+    return sheets
+
+
+def export_snapshot(status, content_type, data):
+    if status != 200:
+        return {"status": status, "body": data.decode("utf-8", "replace")}
+    if content_type == "application/zip":
+        with zipfile.ZipFile(BytesIO(data)) as zf:
+            return {"status": status, "files": {n: workbook_cells(zf.read(n)) for n in sorted(zf.namelist())}}
+    return {"status": status, "sheets": workbook_cells(data)}
+
+
+def post(port, body):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    try:
+        conn.request("POST", "/", body=json.dumps(body), headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        return resp.status, resp.getheader("Content-Type", ""), resp.read()
+    finally:
+        conn.close()
+
+
+def differences(expected, actual, limit=10):
+    """Human-readable paths where two snapshots differ"""
+    out = []
+
+    def walk(path, a, b):
+        if len(out) >= limit:
+            return
+        if isinstance(a, dict) and isinstance(b, dict):
+            for key in sorted(set(a) | set(b), key=str):
+                walk(f"{path}.{key}", a.get(key), b.get(key))
+        elif isinstance(a, list) and isinstance(b, list) and a and isinstance(a[0], list) and isinstance(a[0][0], str):
+            # Cell lists: compare by coordinate
+            left = {c[0]: c for c in a}
+            right = {c[0]: c for c in b}
+            for coord in sorted(set(left) | set(right)):
+                if left.get(coord) != right.get(coord):
+                    out.append(f"{path}[{coord}]: expected {left.get(coord)}, got {right.get(coord)}")
+                    if len(out) >= limit:
+                        return
+        elif isinstance(a, list) and isinstance(b, list) and len(a) == len(b):
+            for i, (x, y) in enumerate(zip(a, b)):
+                walk(f"{path}[{i}]", x, y)
+        elif a != b:
+            out.append(f"{path}: expected {json.dumps(a)[:200]}, got {json.dumps(b)[:200]}")
+
+    walk("", expected, actual)
+    return out
+
+
+def golden_path(name):
+    return os.path.join(GOLDEN_DIR, f"{name}.json.gz")
+
+
+def load_golden(name):
+    try:
+        with gzip.open(golden_path(name), "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_golden(name, doc):
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    # mtime=0 keeps the file byte-identical when nothing changed
+    with open(golden_path(name), "wb") as f:
+        f.write(gzip.compress(json.dumps(doc, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), 9, mtime=0))
+
+
+def parse_throughput(name, min_seconds=0.3):
+    kind = CASES[name][0]
+    text = case_output(name)
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        parsed = parse_document(kind, text)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+    records = len(parsed[0]) + len(parsed[1]) if kind == "google" else len(parsed)
+    return runs * len(text) / elapsed / 1e6, runs * records / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golden-file equivalence and benchmarks for generate-copy")
+    parser.add_argument("--cases", default=",".join([*CASES, *BATCH_CASES]))
+    parser.add_argument("--update", action="store_true", help="rewrite golden files from the current code")
+    parser.add_argument("--bench", action="store_true", help="also measure parse throughput, export latency and memory")
+    parser.add_argument("--repeat", type=int, default=3, help="export requests per case when benchmarking")
+    args = parser.parse_args()
+
+    servers = {}
+    failures = 0
+    if args.bench:
+        print(f"{'case':<22} {'parse MB/s':>10} {'records/s':>10} {'export p50 ms':>13} {'peak MB':>8} {'bytes':>10}")
+    for name in args.cases.split(","):
+        kind, body, digest = request_for(name)
+        if kind not in servers:
+            servers[kind] = serve(kind)
+        port = servers[kind].server_address[1]
+
+        if args.bench:
+            # tracemalloc slows allocation-heavy code several times over, so only when asked
+            tracemalloc.start()
+        status, content_type, data = post(port, body)
+        if args.bench:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        snapshot = {"input_sha256": digest, **export_snapshot(status, content_type, data)}
+
+        if args.update:
+            save_golden(name, snapshot)
+            print(f"{name}: golden updated")
+        else:
+            golden = load_golden(name)
+            if golden is None:
+                failures += 1
+                print(f"{name}: MISSING golden file (run with --update)")
+            elif golden.get("input_sha256") != digest:
+                failures += 1
+                print(f"{name}: corpus input changed since the golden file was written (run with --update)")
+            else:
+                diffs = differences(golden, snapshot)
+                if diffs:
+                    failures += 1
+                    print(f"{name}: DIFFERS")
+                    for line in diffs:
+                        print(f"  {line}")
+                elif not args.bench:
+                    print(f"{name}: ok")
+
+        if args.bench:
+            latencies = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                post(port, body)
+                latencies.append((time.perf_counter() - start) * 1000)
+            parse = ("-", "-")
+            if name in CASES:
+                mb_s, records_s = parse_throughput(name)
+                parse = (f"{mb_s:.2f}", f"{records_s:.0f}")
+            print(f"{name:<22} {parse[0]:>10} {parse[1]:>10} {statistics.median(latencies):>13.1f} "
+                  f"{peak / 1e6:>8.1f} {len(data):>10}")
+
+    for server in servers.values():
+        server.shutdown()
+    if failures:
+        print(f"{failures} case(s) differ from the golden files")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/importtime.py
+# Cold-start import cost per endpoint, measured with `python -X importtime`.
+#
+#   python benchmarks/importtime.py              # report and check importtime_budget.json
+#   python benchmarks/importtime.py --runs 5 --top 8
+#
+# Each handler is loaded in a fresh interpreter; only imports triggered by the
+# handler itself are counted (interpreter start-up is excluded). Handlers that
+# import the _app package, which is not part of this repo, get the stand-in from
+# benchmarks/fakes.py, installed before measuring. Exits 1 when an endpoint is
+# over its budget so it can gate CI or a deploy script.
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+API_DIR = os.path.join(ROOT, "vercel", "api")
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BUDGET_FILE = os.path.join(BENCH_DIR, "importtime_budget.json")
+MARKER = "--- handler import starts ---"
+
+_PROBE = """
+import sys, time
+sys.path.insert(0, {root!r})
+from _helper.handler_loader import load_handler_module
+if {fake_app!r}:
+    sys.path.insert(0, {bench!r})
+    from fakes import install_app_fakes
+    install_app_fakes()
+print({marker!r}, file=sys.stderr, flush=True)
+start = time.perf_counter()
+load_handler_module({path!r})
+print("wall_ms=%.3f" % ((time.perf_counter() - start) * 1000), file=sys.stderr, flush=True)
+"""
+
+
+def endpoints():
+    for path in sorted(glob.glob(os.path.join(API_DIR, "**", "handler.py"), recursive=True)):
+        yield os.path.relpath(os.path.dirname(path), API_DIR), path
+
+
+def measure(path):
+    """Return (import_ms, wall_ms, {top-level module: cumulative ms}) for one cold load"""
+    with open(path, encoding="utf-8") as f:
+        fake_app = "_app" in f.read()
+    code = _PROBE.format(root=ROOT, bench=BENCH_DIR, marker=MARKER, path=path, fake_app=fake_app)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    lines = proc.stderr.split(MARKER, 1)[1].splitlines()
+    modules, wall_ms = {}, None
+    for line in lines:
+        if line.startswith("wall_ms="):
+            wall_ms = float(line.split("=", 1)[1])
+        elif line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split(":", 1)[1].split("|")
+            if not name.startswith("  ") and cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative) / 1000
+    return sum(modules.values()), wall_ms, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-endpoint import-time budget check")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--write-budget", action="store_true",
+                        help="record current medians (x1.5 headroom) as the new budget")
+    args = parser.parse_args()
+
+    budget = {}
+    if os.path.exists(BUDGET_FILE):
+        with open(BUDGET_FILE) as f:
+            budget = json.load(f)
+
+    over, measured = [], {}
+    print(f"{'endpoint':<26} {'import ms':>10} {'wall ms':>9} {'budget':>8}  heaviest imports")
+    for name, path in endpoints():
+        try:
+            runs = [measure(path) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:<26} {'error':>10} {'':>9} {'':>8}  {e}")
+            continue
+        import_ms = statistics.median(r[0] for r in runs)
+        wall_ms = statistics.median(r[1] for r in runs)
+        measured[name] = import_ms
+        heaviest = sorted(runs[-1][2].items(), key=lambda kv: -kv[1])[:args.top]
+        limit = budget.get(name)
+        status = f"{limit:>8.0f}" if limit is not None else f"{'-':>8}"
+        if limit is not None and import_ms > limit:
+            over.append(name)
+            status += " OVER"
+        print(f"{name:<26} {import_ms:>10.1f} {wall_ms:>9.1f} {status}  "
+              + ", ".join(f"{mod} {ms:.1f}" for mod, ms in heaviest))
+
+    if args.write_budget:
+        budget.update({name: round(ms * 1.5 + 5) for name, ms in measured.items()})
+        with open(BUDGET_FILE, "w") as f:
+            json.dump(budget, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Budget written to {os.path.relpath(BUDGET_FILE, ROOT)}")
+    elif over:
+        print(f"Over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# benchmarks/loadtest.py
+# Concurrency load test for the API handlers with every external service faked.
+#
+#   python benchmarks/loadtest.py [--endpoints seo,brand-sentiment] [--concurrency 50,100,200]
+#                                 [--requests 400] [--replay payloads.jsonl]
+#
+# Each endpoint is served by its own child process (the production router on
+# an HTTP/1.1 keep-alive server) in which BigQuery, S3, 1Password and OpenAI are
+# local fakes, so peak RSS is per endpoint. Client threads replay payloads at
+# the given concurrency and the run reports throughput, p50/p95/p99 latency,
+# error rate and the child's peak RSS.
+#
+# Replay files are JSONL, one request per line:
+#   {"endpoint": "generate-copy/seo", "method": "POST", "query": "format=xlsx", "body": {...}}
+# Without --replay, payloads are synthesised from benchmarks/corpus.py.
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+ENDPOINTS = {
+    "google": "generate-copy/google",
+    "facebook": "generate-copy/facebook",
+    "seo": "generate-copy/seo",
+    "google-brief": "generate-copy/google",
+    "batch": "generate-copy/batch",
+    "brand-sentiment": "brand-sentiment",
+    "example": "example",
+}
+DEFAULT_ENDPOINTS = "google,facebook,seo,google-brief,batch,brand-sentiment"
+
+
+def synthetic_payloads(name, size, count):
+    sys.path.insert(0, BENCH_DIR)
+    from corpus import GENERATORS
+
+    route = ENDPOINTS[name]
+    if name in ("google", "facebook", "seo"):
+        # A handful of distinct documents, like a day of real exports
+        return [{"endpoint": route, "method": "POST", "body": {"llm_output": GENERATORS[name](size, seed=i)}}
+                for i in range(8)]
+    if name == "google-brief":
+        return [{"endpoint": route, "method": "POST",
+                 "body": {"brief": {"brand": "Acme Travel", "urls": [f"https://example.com/p/{i}/{u}" for u in range(4)]},
+                          "regenerate": True}} for i in range(8)]
+    if name == "batch":
+        docs = [{"type": kind, "name": f"{kind} {i}", "llm_output": GENERATORS[kind](size // 4 or 1, seed=i)}
+                for i in range(3) for kind in ("google", "facebook", "seo")]
+        return [{"endpoint": route, "method": "POST", "body": {"documents": docs, "output": "workbook"}}]
+    if name == "brand-sentiment":
+        # Distinct datasets so requests are not coalesced into one run
+        return [{"endpoint": route, "method": "POST", "body": {"CLIENT_DATASETS": [f"dataset_{i}"]}}
+                for i in range(count)]
+    return [{"endpoint": route, "method": "GET"}]
+
+
+def load_replay(path, name):
+    route = ENDPOINTS[name]
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [r for r in records if r.get("endpoint") in (name, route)]
+
+
+# ---------------- server side ----------------
+def serve_child(name):
+    """Child process: install fakes, serve the router, print the port, run until SIGTERM"""
+    sys.path[:0] = [ROOT, BENCH_DIR]
+    import mock_openai
+    from _helper import server as api_server
+    from _helper.handler_loader import API_DIR, load_handler_module
+
+    mock = mock_openai.serve(latency=float(os.getenv("FAKE_OPENAI_LATENCY", "0.3")))
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{mock.server_address[1]}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+    if ENDPOINTS[name] == "example":
+        from fakes import install_app_fakes
+        install_app_fakes()
+    if ENDPOINTS[name] == "brand-sentiment":
+        from fakes import install_pipeline_fakes
+        load_handler_module(os.path.join(API_DIR, "brand-sentiment", "handler.py"))
+        install_pipeline_fakes(sys.modules["_api_brand_sentiment.pipeline"])
+
+    api_server.serve("127.0.0.1", 0, workers=1, ready=lambda port: print(port, flush=True))
+
+
+def start_child(name, cache):
+    env = dict(os.environ, SECRET_PROVIDER="fakes:get_json_note_sync", PYTHONPATH=BENCH_DIR)
+    if not cache:
+        env.update(EXPORT_CACHE_MEMORY_MB="0", EXPORT_CACHE_DISK_MB="0",
+                   COMPLETION_CACHE_MEMORY_MB="0", COMPLETION_CACHE_DISK_MB="0")
+    proc = subprocess.Popen([sys.executable, __file__, "--serve", name], env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    port = int(proc.stdout.readline())
+    return proc, port
+
+
+def peak_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# ---------------- client side ----------------
+def run_load(port, payloads, concurrency, total):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    next_index = [0]
+    encoded = [(p.get("method", "POST"), f"/api/{p['endpoint']}" + (f"?{p['query']}" if p.get("query") else ""),
+                json.dumps(p["body"]).encode("utf-8") if "body" in p else None) for p in payloads]
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        while True:
+            with lock:
+                i = next_index[0]
+                if i >= total:
+                    break
+                next_index[0] += 1
+            method, path, body = encoded[i % len(encoded)]
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                ok = 200 <= resp.status < 300
+                if resp.getheader("Connection", "").lower() == "close":
+                    conn.close()
+            except (OSError, http.client.HTTPException) as e:
+                ok = False
+                resp = e
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors.append(getattr(resp, "status", type(resp).__name__))
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, latencies, errors
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API handlers against local fakes")
+    parser.add_argument("--endpoints", default=DEFAULT_ENDPOINTS, help=f"any of: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--concurrency", default="50,100,200")
+    parser.add_argument("--requests", type=int, default=400, help="requests per endpoint per concurrency level")
+    parser.add_argument("--size", type=int, default=50, help="ads/pages per synthetic llm_output")
+    parser.add_argument("--replay", help="JSONL file of recorded requests")
+    parser.add_argument("--cache", action="store_true", help="keep the export and completion caches on")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve_child(args.serve)
+        return
+
+    if not args.json:
+        print(f"{'endpoint':<16} {'conc':>5} {'reqs':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+              f"{'p99 ms':>9} {'errors':>7} {'peak RSS MB':>12}")
+    for name in args.endpoints.split(","):
+        payloads = (load_replay(args.replay, name) if args.replay
+                    else synthetic_payloads(name, args.size, args.requests))
+        if not payloads:
+            print(f"{name}: no payloads to replay", file=sys.stderr)
+            continue
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            # A fresh server per level so peak RSS belongs to that level
+            proc, port = start_child(name, args.cache)
+            try:
+                run_load(port, payloads[:1], 1, 1)  # warm-up: imports and template load
+                elapsed, latencies, errors = run_load(port, payloads, concurrency, args.requests)
+                rss = peak_rss_mb(proc.pid)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=60)
+            result = {
+                "endpoint": name,
+                "concurrency": concurrency,
+                "requests": len(latencies),
+                "throughput_rps": round(len(latencies) / elapsed, 2),
+                "p50_ms": round(percentile(latencies, 50), 1),
+                "p95_ms": round(percentile(latencies, 95), 1),
+                "p99_ms": round(percentile(latencies, 99), 1),
+                "error_rate": round(len(errors) / len(latencies), 4),
+                "errors": sorted(set(map(str, errors))),
+                "peak_rss_mb": round(rss, 1) if rss is not None else None,
+            }
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(f"{name:<16} {concurrency:>5} {result['requests']:>6} {result['throughput_rps']:>8.1f} "
+                      f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+                      f"{result['error_rate']:>7.1%} {result['peak_rss_mb'] if rss is not None else '-':>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/mock_openai.py
+# Minimal OpenAI-compatible chat completions server for running copy generation
+# locally. It answers every prompt by filling the ```format``` block from the
+# prompt with synthetic text, repeated "Write exactly N" times.
+#
+#   python benchmarks/mock_openai.py --port 8765 --latency 0.5
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock ...
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORDS = ("luxury safari kenya tanzania escape beach villa private guided tour tailor-made "
+          "holiday expert island retreat wildlife adventure honeymoon family journey").split()
+_LIMIT = re.compile(r"max (\d+) characters")
+
+
+def _fill(placeholder, rng):
+    if "url" in placeholder:
+        return f"https://example.com/{rng.choice(_WORDS)}"
+    limit = int(m.group(1)) if (m := _LIMIT.search(placeholder)) else 60
+    words = []
+    while True:
+        word = rng.choice(_WORDS)
+        if len(" ".join(words + [word])) > limit:
+            break
+        words.append(word)
+    text = " ".join(words or [rng.choice(_WORDS)[:limit]]).capitalize()
+    return text.replace(" ", "-") if "no spaces" in placeholder else text
+
+
+def complete(prompt):
+    """Deterministic completion for a prompt; same prompt, same copy"""
+    rng = random.Random(prompt)
+    m = re.search(r"```\n(.*?)\n```", prompt, re.S)
+    template = m.group(1) if m else "<reply>"
+    n = re.search(r"Write exactly (\d+)", prompt)
+    blocks = [re.sub(r"<([^>]*)>", lambda p: _fill(p.group(1), rng), template)
+              for _ in range(int(n.group(1)) if n else 1)]
+    return "\n".join(blocks)
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    calls = 0
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with MockOpenAIHandler._lock:
+            MockOpenAIHandler.calls += 1
+        time.sleep(self.latency)
+        prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+        content = complete(prompt)
+        self._json(200, {
+            "id": f"chatcmpl-mock-{MockOpenAIHandler.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        })
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # load tests open hundreds of connections at once
+
+
+def serve(port=0, latency=0.0):
+    """Start the mock in a background thread; returns the server (base URL is http://127.0.0.1:<port>/v1)"""
+    MockOpenAIHandler.latency = latency
+    server = MockOpenAIServer(("127.0.0.1", port), MockOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    args = parser.parse_args()
+    server = serve(args.port, args.latency)
+    print(f"Mock OpenAI API on http://127.0.0.1:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
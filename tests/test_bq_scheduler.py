@@ -0,0 +1,155 @@
+import threading
+import time
+
+import pytest
+
+from _helper.bq_scheduler import FETCH, HOUSEKEEPING, WRITE, JobScheduler, is_throttled
+
+
+class Throttled(Exception):
+    code = 429
+
+
+def fail(error, attempts=None):
+    def job():
+        if attempts is not None:
+            attempts.append(1)
+        raise error
+    return job
+
+
+def scheduler(**kwargs):
+    kwargs.setdefault("backoff", 0)
+    return JobScheduler(**kwargs)
+
+
+def test_throttle_classification():
+    assert is_throttled(Throttled())
+    assert is_throttled(Exception("Exceeded rate limits: too many api requests"))
+
+    class Reasoned(Exception):
+        errors = [{"reason": "quotaExceeded"}]
+
+    assert is_throttled(Reasoned())
+    assert not is_throttled(ValueError("Syntax error"))
+
+
+def test_burst_of_throttles_halves_the_limit_once():
+    s = scheduler(max_concurrency=8, retries=0)
+    gate = threading.Barrier(8, timeout=5)
+
+    def throttled_job():
+        gate.wait()  # every job was admitted under the same epoch
+        raise Throttled()
+
+    def run():
+        with pytest.raises(Throttled):
+            s.run(throttled_job)
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert s.stats()["limit"] == 4
+    assert s.stats()["throttled"] == 8
+
+
+def test_separate_throttles_keep_halving_down_to_the_minimum():
+    s = scheduler(max_concurrency=8, retries=0, min_concurrency=2)
+    for expected in (4, 2, 2):
+        with pytest.raises(Throttled):
+            s.run(fail(Throttled()))
+        assert s.stats()["limit"] == expected
+
+
+def test_successes_grow_the_limit_additively():
+    s = scheduler(max_concurrency=8, retries=0)
+    with pytest.raises(Throttled):
+        s.run(fail(Throttled()))
+    assert s.stats()["limit"] == 4
+    for _ in range(4):
+        s.run(lambda: None)
+    # +1/limit per job: about one more slot per `limit` successful jobs
+    assert 4.9 < s.stats()["limit"] < 5
+    for _ in range(200):
+        s.run(lambda: None)
+    assert s.stats()["limit"] == 8
+
+
+def test_throttled_jobs_are_retried_then_given_up():
+    s = scheduler(retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise Throttled()
+        return "ok"
+
+    assert s.run(flaky) == "ok"
+    assert s.stats()["retries"] == 2
+
+    attempts.clear()
+    with pytest.raises(Throttled):
+        s.run(fail(Throttled(), attempts))
+    assert len(attempts) == 3
+    assert s.stats()["failed"] == 1
+
+
+def test_other_errors_are_not_retried():
+    s = scheduler(retries=5)
+    attempts = []
+    with pytest.raises(ValueError):
+        s.run(fail(ValueError("bad SQL"), attempts))
+    assert attempts == [1]
+    assert s.stats()["limit"] == s.max_concurrency
+
+
+def test_dml_per_table_cap_does_not_block_other_jobs():
+    s = scheduler(max_concurrency=8, dml_per_table=2)
+    release = threading.Event()
+    lock = threading.Lock()
+    running = {"merge": 0, "peak": 0}
+
+    def merge():
+        with lock:
+            running["merge"] += 1
+            running["peak"] = max(running["peak"], running["merge"])
+        release.wait(5)
+        with lock:
+            running["merge"] -= 1
+
+    threads = [threading.Thread(target=s.run, args=(merge,), kwargs={"table": "t"}) for _ in range(4)]
+    for t in threads:
+        t.start()
+    while s.stats()["queued"] < 2:
+        time.sleep(0.001)
+    # Two MERGEs wait on their table; a job of the same priority queued behind them still gets a slot
+    assert s.run(lambda: "loaded", priority=WRITE) == "loaded"
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert running["peak"] == 2
+
+
+def test_higher_priority_is_admitted_first():
+    s = scheduler(max_concurrency=1)
+    release = threading.Event()
+    order = []
+    holder = threading.Thread(target=s.run, args=(lambda: release.wait(5),))
+    holder.start()
+    while s.stats()["running"] < 1:
+        time.sleep(0.001)
+
+    threads = []
+    for name, priority in (("housekeeping", HOUSEKEEPING), ("write", WRITE), ("fetch", FETCH)):
+        t = threading.Thread(target=s.run, args=(lambda name=name: order.append(name),), kwargs={"priority": priority})
+        t.start()
+        threads.append(t)
+        while s.stats()["queued"] < len(threads):
+            time.sleep(0.001)
+    release.set()
+    for t in [holder, *threads]:
+        t.join(5)
+    assert order == ["fetch", "write", "housekeeping"]
@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("google.cloud.bigquery")
+pytest.importorskip("vaderSentiment")
+
+from fakes import install_pipeline_fakes
+from _helper.handler_loader import API_DIR, load_handler_module
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setenv("SCORE_STORE_BACKEND", "none")
+    load_handler_module(os.path.join(API_DIR, "brand-sentiment", "handler.py"))
+    module = sys.modules["_api_brand_sentiment.pipeline"]
+    monkeypatch.setattr(module, "_score_store", None)
+    bq, s3 = install_pipeline_fakes(module)
+    bq.latency = s3.latency = 0
+    bq.rows = 50
+    return module, bq
+
+
+def staging_tables(bq):
+    return [t for t in bq.tables if "._staging_" in t]
+
+
+def test_run_merges_and_drops_its_staging_table(pipeline):
+    module, bq = pipeline
+    result = module.run_one("ds_ok")
+    assert result["rows"] == 50
+    assert staging_tables(bq) == []
+
+
+def test_failed_ddl_never_stages(pipeline, monkeypatch):
+    module, bq = pipeline
+    loads = []
+
+    def ensure_table_schema(bq_client, table_id):
+        # Slower than fetching and scoring, so staging would otherwise be done first
+        time.sleep(0.3)
+        raise RuntimeError("DDL failed")
+
+    monkeypatch.setattr(module, "ensure_table_schema", ensure_table_schema)
+    original = module.stage_rows
+    monkeypatch.setattr(module, "stage_rows", lambda *args: loads.append(1) or original(*args))
+    with pytest.raises(RuntimeError, match="DDL failed"):
+        module.run_one("ds_ddl")
+    assert loads == []
+    assert staging_tables(bq) == []
+
+
+def test_staging_table_is_dropped_when_another_stage_fails(pipeline, monkeypatch):
+    module, bq = pipeline
+    staged = threading.Event()
+    scan_failed = threading.Event()
+    original = module.stage_rows
+
+    def stage_rows(*args):
+        # The staging table exists when the unrelated source scan fails, and the
+        # run stops before the MERGE that would have dropped it
+        staging_table_id = original(*args)
+        staged.set()
+        scan_failed.wait(5)
+        time.sleep(0.05)
+        return staging_table_id
+
+    def source_scan_bytes(bq_client, project, dataset):
+        staged.wait(5)
+        scan_failed.set()
+        raise RuntimeError("scan failed")
+
+    monkeypatch.setattr(module, "stage_rows", stage_rows)
+    monkeypatch.setattr(module, "source_scan_bytes", source_scan_bytes)
+    with pytest.raises(RuntimeError, match="scan failed"):
+        module.run_one("ds_scan")
+    assert staged.is_set()
+    assert staging_tables(bq) == []
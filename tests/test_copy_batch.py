@@ -0,0 +1,24 @@
+import pytest
+
+from _helper.copy_batch import validate_documents
+
+
+def test_valid_documents_get_default_names():
+    docs = validate_documents([{"type": "seo", "llm_output": "x"}, {"type": "google", "llm_output": "y", "name": "Q3"}])
+    assert docs == [("seo", "x", "Seo 1"), ("google", "y", "Q3")]
+
+
+@pytest.mark.parametrize("documents, message", [
+    ([], "non-empty"),
+    ({"type": "seo"}, "non-empty"),
+    (["seo"], "must be an object"),
+    ([{"type": "tiktok", "llm_output": "x"}], "type must be one of"),
+    ([{"type": ["seo"], "llm_output": "x"}], "type must be one of"),
+    ([{"type": "seo"}], "has no llm_output"),
+    ([{"type": "seo", "llm_output": 5}], "llm_output must be a string"),
+    ([{"type": "seo", "llm_output": ["a", "b"]}], "llm_output must be a string"),
+    ([{"type": "seo", "llm_output": {"text": "a"}}], "llm_output must be a string"),
+])
+def test_invalid_documents_are_rejected(documents, message):
+    with pytest.raises(ValueError, match=message):
+        validate_documents(documents)
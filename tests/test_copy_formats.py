@@ -0,0 +1,21 @@
+import pytest
+
+from _helper.copy_formats import XLSX, negotiate_format
+
+
+def test_query_wins_over_body_and_accept():
+    assert negotiate_format({"Accept": "text/csv"}, "/?format=json", "ndjson") == "json"
+    assert negotiate_format({"Accept": "text/csv"}, "/", "ndjson") == "ndjson"
+    assert negotiate_format({"Accept": "text/csv"}, "/") == "csv"
+    assert negotiate_format({}, "/") == XLSX
+
+
+@pytest.mark.parametrize("requested", [5, ["csv"], {"format": "csv"}, True])
+def test_non_string_body_format_is_rejected(requested):
+    with pytest.raises(ValueError, match="must be a string"):
+        negotiate_format({}, "/", requested)
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported format"):
+        negotiate_format({}, "/", "pdf")
@@ -0,0 +1,106 @@
+import random
+import socket
+import threading
+import time
+
+import pytest
+
+from _helper.fanout import ShardError, post_json, scatter_gather, split
+
+
+def test_split():
+    assert split([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+    assert split([1, 2], 5) == [[1, 2]]
+    assert split([1, 2], 0) == [[1], [2]]
+    assert split([], 3) == []
+
+
+def test_results_keep_input_order():
+    def call(shard):
+        time.sleep(random.uniform(0, 0.02))
+        return [item * 10 for item in shard]
+
+    results, report = scatter_gather(list(range(20)), 3, call, concurrency=8, backoff=0)
+    assert results == [item * 10 for item in range(20)]
+    assert report == {"shards": 7, "attempts": 7, "retried_shards": 0, "failed_shards": []}
+
+
+def test_retryable_errors_are_retried():
+    calls = {}
+    lock = threading.Lock()
+
+    def call(shard):
+        with lock:
+            calls[shard[0]] = calls.get(shard[0], 0) + 1
+            n = calls[shard[0]]
+        if shard[0] == "b" and n < 3:
+            raise ShardError("HTTP 503")
+        return [item.upper() for item in shard]
+
+    results, report = scatter_gather(["a", "b", "c"], 1, call, retries=2, backoff=0)
+    assert results == ["A", "B", "C"]
+    assert calls == {"a": 1, "b": 3, "c": 1}
+    assert report["attempts"] == 5
+    assert report["retried_shards"] == 1
+
+
+def test_non_retryable_error_fails_the_shard_at_once():
+    calls = []
+
+    def call(shard):
+        calls.append(shard)
+        if shard == ["b"]:
+            raise ShardError("HTTP 400", retryable=False)
+        return shard
+
+    results, report = scatter_gather(["a", "b", "c"], 1, call, retries=5, backoff=0,
+                                     on_failure=lambda item, error: {"item": item, "error": error})
+    assert calls.count(["b"]) == 1
+    assert results == ["a", {"item": "b", "error": "HTTP 400"}, "c"]
+    assert report["failed_shards"] == [{"items": ["b"], "error": "HTTP 400"}]
+
+
+def test_without_on_failure_the_error_is_raised():
+    def call(shard):
+        raise ShardError("down", retryable=False)
+
+    with pytest.raises(ShardError, match="down"):
+        scatter_gather(["a"], 1, call, backoff=0)
+
+
+@pytest.mark.parametrize("bad", [None, {"x": 1}, "ab", ["only one"]])
+def test_malformed_results_are_shard_failures(bad):
+    def call(shard):
+        return bad
+
+    results, report = scatter_gather(["a", "b"], 2, call, retries=1, backoff=0,
+                                     on_failure=lambda item, error: None)
+    assert results == [None, None]
+    assert report["attempts"] == 2
+    assert len(report["failed_shards"]) == 1
+
+
+@pytest.mark.parametrize("reply", [
+    b"",  # closed without a response: RemoteDisconnected
+    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 100\r\n\r\n{\"ok\": tr",  # IncompleteRead
+])
+def test_post_json_turns_a_broken_response_into_a_shard_error(reply):
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+
+    def respond_and_close():
+        conn, _ = server.accept()
+        conn.recv(65536)
+        conn.sendall(reply)
+        conn.close()
+
+    thread = threading.Thread(target=respond_and_close, daemon=True)
+    thread.start()
+    try:
+        with pytest.raises(ShardError) as info:
+            post_json(f"http://127.0.0.1:{server.getsockname()[1]}/", {"a": 1}, timeout=5)
+        assert info.value.retryable
+    finally:
+        thread.join(5)
+        server.close()
@@ -0,0 +1,91 @@
+from email.message import Message
+from io import BytesIO
+
+import pytest
+
+from _helper.export_cache import ExportKey
+from _helper.request_body import BodyError, iter_body_lines, read_body
+
+
+def headers(**fields):
+    msg = Message()
+    for name, value in fields.items():
+        msg[name.replace("_", "-")] = value
+    return msg
+
+
+def chunked(body, size):
+    out = b""
+    for i in range(0, len(body), size):
+        piece = body[i:i + size]
+        out += b"%x\r\n%s\r\n" % (len(piece), piece)
+    return out + b"0\r\n\r\n"
+
+
+TEXTS = [
+    b"abc\r\ndef\r\nghi",
+    b"abc\rdef\nghi\r\n",
+    b"a\r\n\r\nb\r",
+    b"\r\n\r\n\r\n",
+    "héllo\r\nwörld end".encode("utf-8"),
+]
+
+
+@pytest.mark.parametrize("body", TEXTS)
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 5, 64])
+def test_lines_match_splitlines_at_any_chunk_boundary(body, chunk_size):
+    h = headers(Content_Length=str(len(body)), Content_Type="text/plain; charset=utf-8")
+    lines = list(iter_body_lines(BytesIO(body), h, chunk_size=chunk_size))
+    assert lines == body.decode("utf-8").splitlines()
+
+
+def test_crlf_split_across_chunks():
+    body = b"abc\r\ndef\r\nghi"
+    h = headers(Content_Length=str(len(body)))
+    assert list(iter_body_lines(BytesIO(body), h, chunk_size=4)) == ["abc", "def", "ghi"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 7])
+def test_chunked_framing(chunk_size):
+    body = b"abc\r\ndef\r\nghi"
+    h = headers(Transfer_Encoding="chunked")
+    assert list(iter_body_lines(BytesIO(chunked(body, 4)), h, chunk_size=chunk_size)) == ["abc", "def", "ghi"]
+    assert read_body(BytesIO(chunked(body, 3)), h) == body
+
+
+def test_truncated_chunked_body():
+    h = headers(Transfer_Encoding="chunked")
+    with pytest.raises(BodyError):
+        read_body(BytesIO(b"5\r\nab"), h)
+    with pytest.raises(BodyError):
+        read_body(BytesIO(b"zz\r\n"), h)
+
+
+def test_truncated_content_length():
+    with pytest.raises(BodyError):
+        read_body(BytesIO(b"abc"), headers(Content_Length="10"))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 64])
+def test_streamed_key_matches_json_key(chunk_size):
+    text = "Headline (1): A\r\nHeadline (2): B\r\nDescription (1): C"
+    body = text.encode("utf-8")
+    streamed = ExportKey("google")
+    list(streamed.lines(iter_body_lines(BytesIO(body), headers(Content_Length=str(len(body))), chunk_size)))
+    decoded = ExportKey("google")
+    decoded.update_text(text)
+    assert streamed.etag("xlsx") == decoded.etag("xlsx")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 64])
+def test_blank_lines_at_either_end_do_not_change_the_key(chunk_size):
+    text = "\r\n  \r\nHeadline (1): A\r\n\r\nHeadline (2): B\r\n\r\n\t\r\n"
+    body = text.encode("utf-8")
+    streamed = ExportKey("google")
+    lines = list(streamed.lines(iter_body_lines(BytesIO(body), headers(Content_Length=str(len(body))), chunk_size)))
+    assert lines == text.splitlines()
+    decoded = ExportKey("google")
+    decoded.update_text(text)
+    trimmed = ExportKey("google")
+    trimmed.update_text("Headline (1): A\n\nHeadline (2): B")
+    assert streamed.etag("xlsx") == decoded.etag("xlsx") == trimmed.etag("xlsx")
@@ -0,0 +1,175 @@
+import json
+import threading
+import time
+
+import pytest
+
+from fakes import FakeS3Client
+from _helper.run_coalescer import RemoteRunError, RunCoalescer, S3RunStore, SqliteRunStore
+
+BUCKET = "locks"
+
+
+@pytest.fixture
+def s3():
+    client = FakeS3Client()
+    client.latency = 0.005
+    return client
+
+
+def s3_store(client):
+    return S3RunStore(BUCKET, client=client)
+
+
+def expired_lease(client, store, key, run_id="dead"):
+    body = json.dumps({"run_id": run_id, "expires_at": time.time() - 1}).encode("utf-8")
+    client.put_object(Bucket=BUCKET, Key=store._lease_key(key), Body=body)
+
+
+def test_two_acquirers_on_an_expired_lease(s3):
+    for attempt in range(20):
+        key = f"ds{attempt}"
+        store = s3_store(s3)
+        expired_lease(s3, store, key)
+        barrier = threading.Barrier(2)
+        results = {}
+
+        def acquire(run_id):
+            barrier.wait()
+            results[run_id] = store.acquire(key, run_id, ttl=60)
+
+        threads = [threading.Thread(target=acquire, args=(run_id,)) for run_id in ("a", "b")]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+        winners = [run_id for run_id, holder in results.items() if holder is None]
+        assert len(winners) == 1, results
+        loser = "b" if winners == ["a"] else "a"
+        assert results[loser] == winners[0]
+        assert store.holds(key, winners[0])
+
+
+def test_takeover_does_not_replace_a_lease_renewed_since_it_was_read(s3):
+    store = s3_store(s3)
+    expired_lease(s3, store, "ds")
+    read = store._read
+
+    def stale_read(object_key):
+        # Another instance takes the lease over right after we read the expired one
+        result = read(object_key)
+        if result[0] and result[0]["run_id"] == "dead":
+            s3.put_object(Bucket=BUCKET, Key=object_key,
+                          Body=json.dumps({"run_id": "other", "expires_at": time.time() + 60}).encode("utf-8"))
+        return result
+
+    store._read = stale_read
+    assert store.acquire("ds", "mine", ttl=60) == "other"
+    assert store.holds("ds", "other")
+
+
+def test_release_leaves_a_lease_taken_over_by_another_run(s3):
+    store = s3_store(s3)
+    assert store.acquire("ds", "mine", ttl=60) is None
+    expired_lease(s3, store, "ds", run_id="mine")
+    assert store.acquire("ds", "other", ttl=60) is None
+    store.release("ds", "mine", True, {"rows": 1})
+    assert store.holds("ds", "other")
+    assert store.outcome("mine") == (True, {"rows": 1})
+
+
+def test_renew_fails_once_the_lease_is_lost(s3):
+    store = s3_store(s3)
+    assert store.acquire("ds", "mine", ttl=60) is None
+    assert store.renew("ds", "mine", ttl=60)
+    s3.delete_object(Bucket=BUCKET, Key=store._lease_key("ds"))
+    assert not store.renew("ds", "mine", ttl=60)
+
+
+@pytest.fixture(params=["s3", "sqlite"])
+def store(request, s3, tmp_path):
+    if request.param == "s3":
+        return s3_store(s3)
+    return SqliteRunStore(str(tmp_path / "locks.sqlite"))
+
+
+def test_lease_is_renewed_while_a_run_outlasts_its_ttl(store):
+    ttl = 0.3
+    calls = []
+    started = threading.Event()
+
+    def slow_run():
+        calls.append(1)
+        started.set()
+        time.sleep(ttl * 4)
+        return {"rows": 42}
+
+    leader = RunCoalescer(store, lease_ttl=ttl, poll_interval=0.02)
+    follower = RunCoalescer(store, lease_ttl=ttl, poll_interval=0.02)
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(leader=leader.run("ds", slow_run)))
+    thread.start()
+    started.wait(5)
+    # Well past the original expiry, the second instance still attaches to the run
+    time.sleep(ttl * 2)
+    results["follower"] = follower.run("ds", slow_run)
+    thread.join(5)
+
+    assert len(calls) == 1
+    assert results["leader"][0] == results["follower"][0] == {"rows": 42}
+    assert results["follower"][1]["role"] == "joined_remote"
+    assert results["follower"][1]["run_id"] == results["leader"][1]["run_id"]
+
+
+def test_failed_remote_run_is_reported_to_followers(store):
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing_run():
+        started.set()
+        release.wait(5)
+        raise ValueError("no data")
+
+    leader = RunCoalescer(store, lease_ttl=5, poll_interval=0.02)
+    follower = RunCoalescer(store, lease_ttl=5, poll_interval=0.02)
+    errors = []
+
+    def lead():
+        try:
+            leader.run("ds", failing_run)
+        except ValueError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=lead)
+    thread.start()
+    started.wait(5)
+    threading.Timer(0.1, release.set).start()
+    with pytest.raises(RemoteRunError, match="no data"):
+        follower.run("ds", failing_run)
+    thread.join(5)
+    assert len(errors) == 1
+
+
+def test_in_process_callers_share_one_run():
+    coalescer = RunCoalescer()
+    gate = threading.Event()
+    calls = []
+
+    def run():
+        calls.append(1)
+        gate.wait(5)
+        return "done"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(coalescer.run("ds", run))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while coalescer.stats()["joined"] < len(threads) - 1:
+        time.sleep(0.001)
+    gate.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert sorted(info["role"] for _, info in results) == ["joined"] * 4 + ["leader"]
@@ -0,0 +1,103 @@
+import gzip
+import json
+import threading
+
+import pytest
+
+from fakes import FakeS3Client
+from _helper.score_store import FileSnapshot, S3Snapshot, ScoreStore, SnapshotConflict
+
+
+@pytest.fixture(params=["file", "s3"])
+def snapshot(request, tmp_path):
+    if request.param == "file":
+        return FileSnapshot(str(tmp_path / "scores.json.gz"))
+    client = FakeS3Client()
+    client.latency = 0.002
+    return S3Snapshot("bucket", "scores.json.gz", client=client)
+
+
+def stored(snapshot):
+    data, _ = snapshot.read()
+    return json.loads(gzip.decompress(data))["scores"]
+
+
+def test_write_is_conditional_on_the_version_read(snapshot):
+    _, missing = snapshot.read()
+    snapshot.write(b"first", missing)
+    with pytest.raises(SnapshotConflict):
+        snapshot.write(b"second", missing)
+    data, version = snapshot.read()
+    assert data == b"first"
+    snapshot.write(b"third", version)
+    with pytest.raises(SnapshotConflict):
+        snapshot.write(b"fourth", version)
+    assert snapshot.read()[0] == b"third"
+
+
+def test_concurrent_saves_keep_every_entry(snapshot):
+    stores = [ScoreStore(snapshot, "v1") for _ in range(4)]
+    for i, store in enumerate(stores):
+        store.get_many([f"q{i}a", f"q{i}b"], lambda q: 0.5)
+    barrier = threading.Barrier(len(stores))
+
+    def save(store):
+        barrier.wait()
+        store.save()
+
+    threads = [threading.Thread(target=save, args=(store,)) for store in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    assert set(stored(snapshot)) == {f"q{i}{s}" for i in range(4) for s in "ab"}
+    assert all(store.stats()["pending"] == 0 for store in stores)
+
+
+def test_save_is_a_no_op_without_new_entries(snapshot):
+    store = ScoreStore(snapshot, "v1")
+    assert store.save() == 0
+    assert snapshot.read() == (None, None)
+    store.get_many(["a", "b", "a"], lambda q: 0.1)
+    assert store.save() == 2
+    assert store.save() == 0
+
+
+def test_other_versions_are_ignored(snapshot):
+    old = ScoreStore(snapshot, "v1")
+    old.get_many(["a"], lambda q: 0.1)
+    old.save()
+    calls = []
+    new = ScoreStore(snapshot, "v2")
+    new.get_many(["a"], lambda q: calls.append(q) or 0.9)
+    assert calls == ["a"]
+    assert new.stats()["invalidated"] == 1
+
+
+def test_memory_is_capped_least_recently_used_first():
+    store = ScoreStore(None, "v1", memory_entries=3)
+    calls = []
+
+    def compute(q):
+        calls.append(q)
+        return 0.1
+
+    store.get_many(["a", "b", "c"], compute)
+    store.get_many(["a"], compute)  # a is now the most recently used
+    store.get_many(["d"], compute)  # evicts b
+    assert store.stats()["entries"] == 3
+    assert store.stats()["evicted"] == 1
+    calls.clear()
+    store.get_many(["a", "c", "d", "b"], compute)
+    assert calls == ["b"]
+
+
+def test_load_keeps_the_newest_entries_within_the_cap(snapshot):
+    writer = ScoreStore(snapshot, "v1")
+    writer.get_many([f"q{i}" for i in range(10)], lambda q: 0.2)
+    writer.save()
+    reader = ScoreStore(snapshot, "v1", memory_entries=4)
+    calls = []
+    reader.get_many(["q9", "q6", "q0"], lambda q: calls.append(q) or 0.2)
+    assert calls == ["q0"]
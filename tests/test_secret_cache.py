@@ -0,0 +1,139 @@
+import importlib
+import threading
+import time
+
+import pytest
+
+from _helper import secret_cache
+from _helper.secret_cache import SecretCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowProvider:
+    """Counts fetches and holds each one until released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    def __call__(self, vault_id, item_id):
+        with self.lock:
+            self.calls += 1
+            n = self.calls
+        self.release.wait(5)
+        return {"item": item_id, "version": n}
+
+
+def test_concurrent_misses_share_one_fetch():
+    provider = SlowProvider()
+    cache = SecretCache(provider, ttl=300, refresh_ahead=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("v", "i"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while cache.stats()["misses"] + cache.stats()["coalesced"] < len(threads):
+        time.sleep(0.001)
+    provider.release.set()
+    for t in threads:
+        t.join(5)
+
+    assert provider.calls == 1
+    assert results == [{"item": "i", "version": 1}] * len(threads)
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"]) == (1, len(threads) - 1)
+
+
+def test_distinct_keys_fetch_separately():
+    provider = SlowProvider()
+    provider.release.set()
+    cache = SecretCache(provider)
+    cache.get("v", "a")
+    cache.get("v", "b")
+    cache.get("v", "a")
+    assert provider.calls == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    gate = threading.Event()
+    calls = []
+
+    def failing(vault_id, item_id):
+        calls.append(item_id)
+        gate.wait(5)
+        raise RuntimeError("vault down")
+
+    cache = SecretCache(failing)
+    errors = []
+
+    def get():
+        try:
+            cache.get("v", "i")
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=get) for _ in range(4)]
+    for t in threads:
+        t.start()
+    while cache.stats()["misses"] + cache.stats()["coalesced"] < len(threads):
+        time.sleep(0.001)
+    gate.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert len(errors) == len(threads)
+    with pytest.raises(RuntimeError):
+        cache.get("v", "i")
+    assert len(calls) == 2
+
+
+def test_refresh_ahead_serves_cached_value_and_refreshes_once():
+    clock = Clock()
+    provider = SlowProvider()
+    provider.release.set()
+    cache = SecretCache(provider, ttl=100, refresh_ahead=10, clock=clock)
+    assert cache.get("v", "i")["version"] == 1
+
+    provider.release.clear()
+    clock.now = 95
+    assert cache.get("v", "i")["version"] == 1
+    assert cache.get("v", "i")["version"] == 1
+    assert cache.stats()["background_refreshes"] == 1
+    provider.release.set()
+    while cache._inflight:
+        time.sleep(0.001)
+    clock.now = 150
+    assert cache.get("v", "i")["version"] == 2
+    assert provider.calls == 2
+
+
+def test_expired_entry_is_fetched_again():
+    clock = Clock()
+    provider = SlowProvider()
+    provider.release.set()
+    cache = SecretCache(provider, ttl=100, refresh_ahead=0, clock=clock)
+    cache.get("v", "i")
+    clock.now = 100
+    assert cache.get("v", "i")["version"] == 2
+
+
+def test_malformed_env_falls_back_with_warning(monkeypatch, capsys):
+    monkeypatch.setenv("SECRET_CACHE_TTL", "5m")
+    monkeypatch.setenv("SECRET_REFRESH_AHEAD", "30")
+    try:
+        module = importlib.reload(secret_cache)
+        assert module.note_cache.ttl == 300.0
+        assert module.note_cache.refresh_ahead == 30.0
+        assert "SECRET_CACHE_TTL" in capsys.readouterr().err
+    finally:
+        monkeypatch.undo()
+        importlib.reload(secret_cache)
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from _helper.task_graph import Task, run_graph
+
+
+def test_results_flow_to_dependents_by_name():
+    results, timings = run_graph({
+        "a": Task(lambda: 1),
+        "b": Task(lambda: time.sleep(0.02) or 2),
+        "sum": Task(lambda a, b: a + b, needs=["a", "b"]),
+        "double": Task(lambda sum: time.sleep(0.02) or sum * 2, needs=["sum"]),
+    })
+    assert results == {"a": 1, "b": 2, "sum": 3, "double": 6}
+    assert timings["critical_path"] == ["b", "sum", "double"]
+    assert set(timings["stages"]) == {"a", "b", "sum", "double"}
+
+
+def test_independent_tasks_overlap():
+    barrier = threading.Barrier(2, timeout=5)
+    # Each task waits for the other, so this only finishes if they run concurrently
+    results, _ = run_graph({"a": Task(lambda: barrier.wait()), "b": Task(lambda: barrier.wait())})
+    assert sorted(results.values()) == [0, 1]
+
+
+def test_error_skips_dependents_and_tasks_not_yet_started():
+    ran = []
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        run_graph({
+            "fail": Task(fail),
+            "after_fail": Task(lambda fail: ran.append("after_fail"), needs=["fail"]),
+            "slow": Task(lambda: time.sleep(0.1) or ran.append("slow")),
+            "after_slow": Task(lambda slow: ran.append("after_slow"), needs=["slow"]),
+        })
+    # A task already running when the error lands finishes; nothing new starts
+    assert ran == ["slow"]
+
+
+def test_first_error_wins_once_running_tasks_finish():
+    finished = []
+
+    def late_error():
+        time.sleep(0.1)
+        finished.append("late")
+        raise KeyError("late")
+
+    def early_error():
+        raise ValueError("early")
+
+    with pytest.raises(ValueError, match="early"):
+        run_graph({"late": Task(late_error), "early": Task(early_error)})
+    assert finished == ["late"]
+
+
+def test_unknown_and_circular_dependencies_are_rejected():
+    with pytest.raises(ValueError, match="unknown"):
+        run_graph({"a": Task(lambda missing: None, needs=["missing"])})
+    with pytest.raises(ValueError, match="circular"):
+        run_graph({
+            "a": Task(lambda b: None, needs=["b"]),
+            "b": Task(lambda a: None, needs=["a"]),
+        })
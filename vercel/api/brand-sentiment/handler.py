@@ -1,10 +1,30 @@
-from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import json
+import os
+import sys
+import uuid
 
-from .pipeline import run_for_datasets
+# Add project root to Python path (need to go up 3 levels from vercel/api/brand-sentiment/)
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
-class handler(BaseHTTPRequestHandler):
+from _helper import prewarm
+from _helper.fanout import ShardError, post_json, scatter_gather
+from _helper.timing import TimedRequestHandler, span
+
+from .pipeline import bq_jobs, run_for_datasets, warmup_steps
+
+# Coordinator mode: POST {"CLIENT_DATASETS": [...], "FANOUT": true} splits the
+# datasets into shards and runs each shard in its own invocation of this endpoint
+FANOUT_URL = os.getenv("FANOUT_URL", "").strip()  # default: this endpoint on this deployment
+FANOUT_PATH = "/api/brand-sentiment"
+FANOUT_SHARD_SIZE = int(os.getenv("FANOUT_SHARD_SIZE", "1"))
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "8"))
+FANOUT_RETRIES = int(os.getenv("FANOUT_RETRIES", "2"))
+FANOUT_TIMEOUT = float(os.getenv("FANOUT_TIMEOUT", "300"))
+
+class handler(TimedRequestHandler):
     def _json(self, code, payload):
         body = json.dumps(payload).encode("utf-8")
         self.send_response(code)
@@ -13,22 +33,71 @@ class handler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(body)
 
+    def _shard_url(self):
+        # Never built from request headers: shards carry the caller's Authorization
+        # and the bypass secret, so they may only go to this deployment
+        if FANOUT_URL:
+            return FANOUT_URL
+        deployment = os.getenv("VERCEL_URL", "").strip()
+        if deployment:
+            return f"https://{deployment}{FANOUT_PATH}"
+        raise RuntimeError("Fan-out needs FANOUT_URL or VERCEL_URL to be set")
+
+    def _fanout(self, datasets, shard_size):
+        url = self._shard_url()
+        headers = {"X-Fanout-Shard": uuid.uuid4().hex[:12]}
+        if self.headers.get("Authorization"):
+            headers["Authorization"] = self.headers["Authorization"]
+        bypass = os.getenv("VERCEL_AUTOMATION_BYPASS_SECRET")
+        if bypass:
+            headers["x-vercel-protection-bypass"] = bypass
+
+        def call(shard):
+            resp = post_json(url, {"CLIENT_DATASETS": shard}, headers, timeout=FANOUT_TIMEOUT)
+            if not isinstance(resp, dict):
+                raise ShardError("Shard response is not a JSON object")
+            if not resp.get("ok"):
+                raise ShardError(resp.get("error") or "Shard failed")
+            if not isinstance(resp.get("result"), list):
+                raise ShardError("Shard response has no result list")
+            return resp["result"]
+
+        return scatter_gather(
+            datasets, shard_size, call,
+            concurrency=FANOUT_CONCURRENCY, retries=FANOUT_RETRIES,
+            on_failure=lambda ds, error: {"dataset": ds, "ok": False, "error": error},
+        )
+
     def do_POST(self):
         try:
-            length = int(self.headers.get("Content-Length", 0))
-            body = self.rfile.read(length).decode("utf-8") if length else "{}"
-            data = json.loads(body) if body else {}
+            with span("body"):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode("utf-8") if length else "{}"
+            with span("decode"):
+                data = json.loads(body) if body else {}
             datasets = data.get("CLIENT_DATASETS")
             if not datasets:
                 raise ValueError("POST body must include CLIENT_DATASETS: [\"dataset_a\", \"dataset_b\", ...]")
             if not isinstance(datasets, list) or not all(isinstance(x, str) for x in datasets):
                 raise ValueError("CLIENT_DATASETS must be a JSON array of strings")
+            # A shard request never fans out again
+            if data.get("FANOUT") and not self.headers.get("X-Fanout-Shard"):
+                shard_size = data.get("SHARD_SIZE") or FANOUT_SHARD_SIZE
+                if not isinstance(shard_size, int) or shard_size < 1:
+                    raise ValueError("SHARD_SIZE must be a positive integer")
+                with span("fanout"):
+                    result, report = self._fanout(datasets, shard_size)
+                self._json(200, {"ok": not report["failed_shards"], "result": result, "fanout": report})
+                return
             result = run_for_datasets(datasets)
-            self._json(200, {"ok": True, "result": result})
+            self._json(200, {"ok": True, "result": result, "bigquery": bq_jobs.stats()})
         except Exception as e:
             self._json(500, {"ok": False, "error": str(e)})
 
     def do_GET(self):
+        if prewarm.requested(self.path):
+            prewarm.respond(self, warmup_steps())
+            return
         try:
             # 3 ways to supply datasets on GET:
             # 1) ?CLIENT_DATASETS=[...] (JSON)
@@ -53,6 +122,6 @@ class handler(BaseHTTPRequestHandler):
                 raise ValueError("Provide datasets via CLIENT_DATASETS (JSON or comma list) or WEBSITE_BIGQUERY_ID.")
 
             result = run_for_datasets(datasets)
-            self._json(200, {"ok": True, "result": result})
+            self._json(200, {"ok": True, "result": result, "bigquery": bq_jobs.stats()})
         except Exception as e:
             self._json(500, {"ok": False, "error": str(e)})
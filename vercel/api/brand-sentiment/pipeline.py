@@ -4,6 +4,13 @@ import json
 import gzip
 import logging
 import uuid
+from array import array
+import hashlib
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from importlib.metadata import PackageNotFoundError, version as package_version
 from datetime import date, timedelta, datetime, timezone
 import os
 import boto3
@@ -11,6 +18,11 @@ from google.cloud import bigquery
 from google.oauth2 import service_account
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
+from _helper.bq_scheduler import FETCH, HOUSEKEEPING, WRITE, JobScheduler
+from _helper.run_coalescer import RunCoalescer, store_from_env
+from _helper.score_store import ScoreStore, snapshot_from_env
+from _helper.task_graph import Task, run_graph
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # ========= Runtime configuration from ENV =========
@@ -19,6 +31,10 @@ OUTPUT_TABLE            = os.getenv("OUTPUT_TABLE", "").strip()
 S3_NEGATIVES_BUCKET     = os.getenv("S3_NEGATIVES_BUCKET", "ems-codex-versioned").strip()
 GCP_SA_JSON             = (os.getenv("GCP_SERVICE_ACCOUNT_JSON") or "").strip()
 GCP_SA_JSON_B64         = (os.getenv("GCP_SERVICE_ACCOUNT_JSON_B64") or "").strip()
+DATASET_CONCURRENCY     = int(os.getenv("DATASET_CONCURRENCY", "4"))
+QUERY_INDEX_TABLE       = os.getenv("QUERY_INDEX_TABLE", "brand_sentiment_query_index").strip()  # "" reads the source table
+QUERY_INDEX_LOOKBACK    = int(os.getenv("QUERY_INDEX_LOOKBACK_DAYS", "3"))
+QUERY_INDEX_RETENTION   = int(os.getenv("QUERY_INDEX_RETENTION_DAYS", "90"))
 # ==================================================
 
 # ------------- GCP auth helpers -------------
@@ -33,26 +49,134 @@ def _load_service_account_info():
         return json.loads(base64.b64decode(GCP_SA_JSON).decode("utf-8"))
     raise RuntimeError("Missing GCP creds. Set GCP_SERVICE_ACCOUNT_JSON_B64 or GCP_SERVICE_ACCOUNT_JSON.")
 
+# Credentials and clients are built once per process and shared by every run;
+# the access token is cached inside the credentials until it expires
+_clients_lock = threading.Lock()
+_credentials = None
+_bq_clients = {}
+_s3_client = None
+
+def get_credentials() -> service_account.Credentials:
+    global _credentials
+    with _clients_lock:
+        if _credentials is None:
+            _credentials = service_account.Credentials.from_service_account_info(
+                _load_service_account_info(), scopes=bigquery.Client.SCOPE)
+        return _credentials
+
 def get_bq_client(project: str) -> bigquery.Client:
-    info = _load_service_account_info()
-    creds = service_account.Credentials.from_service_account_info(info)
-    return bigquery.Client(project=project, credentials=creds)
+    creds = get_credentials()
+    with _clients_lock:
+        client = _bq_clients.get(project)
+        if client is None:
+            client = _bq_clients[project] = bigquery.Client(project=project, credentials=creds)
+        return client
 
 # ------------- BigQuery IO -------------
-def fetch_queries(bq: bigquery.Client, project: str, dataset: str):
-    sql = f"""
-    SELECT DISTINCT query
-    FROM `{project}.{dataset}.google_search_console_web_url_query`
-    WHERE DATE(date) >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)
-    """
+# Every BigQuery job in this process is queued here: it bounds concurrency,
+# backs off on rate-limit/quota errors and runs fetches ahead of cleanup
+bq_jobs = JobScheduler()
+
+FETCH_WINDOW_DAYS = 7
+SOURCE_TABLE = "google_search_console_web_url_query"
+
+SOURCE_FETCH_SQL = """
+SELECT DISTINCT query
+FROM `{source_id}`
+WHERE DATE(date) >= DATE_SUB(CURRENT_DATE(), INTERVAL {window} DAY)
+"""
+
+# One distinct query per row with the first and last day it was seen. Each run
+# folds in only the source partitions since the index's newest day (less a few
+# days, which Search Console keeps filling in), so the raw rows are read once
+# or twice instead of on every run for a week
+QUERY_INDEX_SQL = """
+DECLARE since DATE;
+CREATE TABLE IF NOT EXISTS `{index_id}` (
+  query STRING NOT NULL,
+  first_seen DATE,
+  last_seen DATE
+)
+PARTITION BY last_seen
+CLUSTER BY query
+OPTIONS (partition_expiration_days = {retention});
+SET since = (
+  SELECT GREATEST(
+    DATE_SUB(CURRENT_DATE(), INTERVAL {window} DAY),
+    IFNULL(DATE_SUB(MAX(last_seen), INTERVAL {lookback} DAY), DATE '1970-01-01'))
+  FROM `{index_id}`
+  WHERE last_seen >= DATE_SUB(CURRENT_DATE(), INTERVAL {window} DAY)
+);
+MERGE `{index_id}` T
+USING (
+  SELECT query, MIN(DATE(date)) AS first_seen, MAX(DATE(date)) AS last_seen
+  FROM `{source_id}`
+  WHERE DATE(date) >= since AND query IS NOT NULL AND query != ''
+  GROUP BY query
+) S
+ON T.query = S.query
+WHEN MATCHED AND (S.last_seen > T.last_seen OR S.first_seen < T.first_seen) THEN UPDATE SET
+  first_seen = LEAST(T.first_seen, S.first_seen),
+  last_seen  = GREATEST(T.last_seen, S.last_seen)
+WHEN NOT MATCHED THEN
+  INSERT (query, first_seen, last_seen) VALUES (S.query, S.first_seen, S.last_seen);
+"""
+
+INDEX_FETCH_SQL = """
+SELECT query
+FROM `{index_id}`
+WHERE last_seen >= DATE_SUB(CURRENT_DATE(), INTERVAL {window} DAY)
+"""
+
+def _query_bytes(bq: bigquery.Client, sql: str):
+    """(result rows, bytes processed) of one query job"""
+    job = bq.query(sql)
+    rows = job.result()
+    return rows, job.total_bytes_processed or 0
+
+def refresh_query_index(bq: bigquery.Client, project: str, dataset: str):
+    """Bring the dataset's query index up to date; bytes processed, or None to read the source table"""
+    if not QUERY_INDEX_TABLE:
+        return None
+    index_id = f"{project}.{dataset}.{QUERY_INDEX_TABLE}"
+    sql = QUERY_INDEX_SQL.format(index_id=index_id, source_id=f"{project}.{dataset}.{SOURCE_TABLE}",
+                                 window=FETCH_WINDOW_DAYS, lookback=QUERY_INDEX_LOOKBACK,
+                                 retention=QUERY_INDEX_RETENTION)
+    try:
+        _, scanned = bq_jobs.run(lambda: _query_bytes(bq, sql), priority=FETCH, table=index_id)
+        return scanned
+    except Exception as e:
+        logging.warning(f"[{dataset}] Query index update failed, reading the source table: {e}")
+        return None
+
+def source_scan_bytes(bq: bigquery.Client, project: str, dataset: str):
+    """Bytes the plain 7-day DISTINCT over the source table would process (a free dry run)"""
+    sql = SOURCE_FETCH_SQL.format(source_id=f"{project}.{dataset}.{SOURCE_TABLE}", window=FETCH_WINDOW_DAYS)
+    try:
+        # Dry runs are not jobs, so they skip the scheduler's queue
+        return bq.query(sql, job_config=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)).total_bytes_processed
+    except Exception as e:
+        logging.warning(f"[{dataset}] Dry run failed: {e}")
+        return None
+
+def fetch_queries(bq: bigquery.Client, project: str, dataset: str, from_index: bool = False):
+    """(distinct queries seen in the last 7 days, bytes processed)"""
+    if from_index:
+        sql = INDEX_FETCH_SQL.format(index_id=f"{project}.{dataset}.{QUERY_INDEX_TABLE}", window=FETCH_WINDOW_DAYS)
+    else:
+        sql = SOURCE_FETCH_SQL.format(source_id=f"{project}.{dataset}.{SOURCE_TABLE}", window=FETCH_WINDOW_DAYS)
+    def run():
+        rows, scanned = _query_bytes(bq, sql)
+        return [r["query"] for r in rows if r["query"]], scanned
+
     try:
-        rows = bq.query(sql).result()
-        out = [r["query"] for r in rows if r["query"]]
-        logging.info(f"[{dataset}] Fetched {len(out)} queries from last 7 days")
-        return out
+        out, scanned = bq_jobs.run(run, priority=FETCH)
+        logging.info(f"[{dataset}] Fetched {len(out)} queries from last 7 days "
+                     f"({'index' if from_index else 'source table'}, {scanned} bytes)")
+        return out, scanned
     except Exception as e:
         logging.error(f"[{dataset}] BigQuery fetch failed: {e}")
-        return []
+        return [], 0
 
 # Schema without Sentiment_Category
 CREATE_TABLE_SQL = """
@@ -65,36 +189,40 @@ CREATE TABLE IF NOT EXISTS `{table_id}` (
 )
 """
 
+# Output tables already verified by this process; warm runs skip the DDL
+_verified_tables = set()
+
 def ensure_table_schema(bq: bigquery.Client, table_id: str):
-    bq.query(CREATE_TABLE_SQL.format(table_id=table_id)).result()
-    bq.query(f"ALTER TABLE `{table_id}` ADD COLUMN IF NOT EXISTS inserted_at TIMESTAMP").result()
-    bq.query(f"ALTER TABLE `{table_id}` ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP").result()
+    if table_id in _verified_tables:
+        return
+    for sql in (CREATE_TABLE_SQL.format(table_id=table_id),
+                f"ALTER TABLE `{table_id}` ADD COLUMN IF NOT EXISTS inserted_at TIMESTAMP",
+                f"ALTER TABLE `{table_id}` ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP"):
+        bq_jobs.run(lambda sql=sql: bq.query(sql).result(), priority=WRITE)
+    _verified_tables.add(table_id)
 
-def upsert_rows_to_bq(bq: bigquery.Client, rows: list, project: str, dataset: str, table: str):
-    table_id = f"{project}.{dataset}.{table}"
+def stage_rows(bq: bigquery.Client, batch: "SentimentBatch", project: str, dataset: str, table: str) -> str:
+    """Load a batch into a fresh staging table and return its id"""
     staging_table = f"_staging_{table}_{uuid.uuid4().hex[:8]}"
     staging_table_id = f"{project}.{dataset}.{staging_table}"
 
-    ensure_table_schema(bq, table_id)
-
     now_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
 
-    staged_rows = [{
-        "MONDAY": r["MONDAY"],
-        "query": r["query"],
-        "Sentiment_Score": r["Sentiment_Score"],
-        "inserted_at": now_str,
-        "updated_at": now_str
-    } for r in rows]
-
     job_config = bigquery.LoadJobConfig(
         source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
         write_disposition="WRITE_TRUNCATE",
         autodetect=True,
     )
-    ndjson = ("\n".join(json.dumps(x, separators=(",", ":")) for x in staged_rows)).encode("utf-8")
-    bq.load_table_from_file(io.BytesIO(ndjson), staging_table_id, job_config=job_config).result()
+    ndjson = batch.to_ndjson(now_str)
+
+    def load():
+        ndjson.seek(0)  # a retried load reads the file again
+        return bq.load_table_from_file(ndjson, staging_table_id, job_config=job_config).result()
 
+    bq_jobs.run(load, priority=WRITE)
+    return staging_table_id
+
+def merge_staged(bq: bigquery.Client, table_id: str, staging_table_id: str):
     merge_sql = f"""
     MERGE `{table_id}` T
     USING `{staging_table_id}` S
@@ -115,18 +243,28 @@ def upsert_rows_to_bq(bq: bigquery.Client, rows: list, project: str, dataset: st
       CURRENT_TIMESTAMP()
     );
     """
-    bq.query(merge_sql).result()
+    try:
+        bq_jobs.run(lambda: bq.query(merge_sql).result(), priority=WRITE, table=table_id)
+    except Exception:
+        # The table may have been dropped since it was verified; check it again next run
+        _verified_tables.discard(table_id)
+        raise
+    finally:
+        drop_staging(bq, staging_table_id)
 
+def drop_staging(bq: bigquery.Client, staging_table_id: str):
     try:
-        bq.delete_table(staging_table_id, not_found_ok=True)
+        bq_jobs.run(lambda: bq.delete_table(staging_table_id, not_found_ok=True), priority=HOUSEKEEPING)
     except Exception:
         pass
 
-    logging.info(f" Upserted {len(rows)} rows into {table_id}")
-
 # ------------- S3 helpers -------------
 def _s3():
-    return boto3.client("s3")
+    global _s3_client
+    with _clients_lock:
+        if _s3_client is None:
+            _s3_client = boto3.client("s3")
+        return _s3_client
 
 def s3_load_negative_keywords(dataset: str):
     bucket = S3_NEGATIVES_BUCKET
@@ -157,13 +295,92 @@ def last_monday_str() -> str:
     monday = today if today.weekday() == 0 else today - timedelta(days=today.weekday())
     return monday.strftime("%Y-%m-%d")
 
+# Bump when the way a query's compound score is computed changes, so stored
+# scores from the old method are discarded
+SCORER_VERSION = 1
+
+_analyzer = None
+_score_store = None
+_score_store_lock = threading.Lock()
+
+def get_analyzer() -> SentimentIntensityAnalyzer:
+    # Loading the lexicon takes tens of milliseconds; do it once per process
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+def scorer_version(sia: SentimentIntensityAnalyzer) -> str:
+    """Identifies the VADER release and lexicon that produced a compound score"""
+    try:
+        vader = package_version("vaderSentiment")
+    except PackageNotFoundError:
+        vader = "unknown"
+    digest = hashlib.sha1()
+    for table in (sia.lexicon, sia.emojis):
+        digest.update(json.dumps(sorted(table.items())).encode("utf-8"))
+    return f"vader-{vader}-{digest.hexdigest()[:12]}-v{SCORER_VERSION}"
+
+def get_score_store() -> ScoreStore:
+    global _score_store
+    with _score_store_lock:
+        if _score_store is None:
+            _score_store = ScoreStore(snapshot_from_env(S3_NEGATIVES_BUCKET), scorer_version(get_analyzer()))
+    return _score_store
+
+class SentimentBatch:
+    """
+    One dataset's scored queries as columns: the query strings, a float64
+    array of scores and the MONDAY they all share. A million rows cost the
+    strings plus 8 bytes a score, instead of a dict (and a boxed float) per row.
+    """
+    __slots__ = ("queries", "scores", "monday")
+
+    def __init__(self, queries: list, scores: array, monday: str):
+        if len(queries) != len(scores):
+            raise ValueError(f"{len(queries)} queries but {len(scores)} scores")
+        self.queries = queries
+        self.scores = scores
+        self.monday = monday
+
+    def __len__(self):
+        return len(self.queries)
+
+    def to_ndjson(self, now_str: str) -> io.BytesIO:
+        """
+        Staging rows as newline-delimited JSON, written straight into one buffer.
+        The shared columns are encoded once per batch; the bytes match
+        json.dumps of each row dict.
+        """
+        head = ('{"MONDAY":%s,"query":' % json.dumps(self.monday)).encode("utf-8")
+        tail = (',"inserted_at":%s,"updated_at":%s}' % (json.dumps(now_str), json.dumps(now_str))).encode("utf-8")
+        # float repr is what json.dumps writes for a finite float
+        lines = (b"%s%s,\"Sentiment_Score\":%s%s" % (head, json.dumps(q).encode("utf-8"), repr(s).encode("ascii"), tail)
+                 for q, s in zip(self.queries, self.scores))
+        buf = io.BytesIO()
+        sep = b""
+        while True:
+            chunk = list(islice(lines, 4096))
+            if not chunk:
+                break
+            buf.write(sep)
+            buf.write(b"\n".join(chunk))
+            sep = b"\n"
+        buf.seek(0)
+        return buf
+
+def normalize_query(q: str) -> str:
+    # VADER tokenises on whitespace and is case-sensitive, so only whitespace is folded
+    return " ".join(q.split())
+
 def analyze_sentiment(queries, destinations, exclusions, negative_keywords):
-    sia  = SentimentIntensityAnalyzer()
+    sia  = get_analyzer()
     excl = set(x.lower() for x in exclusions)
     dest = set(destinations)
     negs = set(negative_keywords or [])
 
-    def score(q: str) -> float:
+    def rule(q: str):
+        """The score fixed by the exclusion/negative rules, or None if VADER decides"""
         t = q.lower()
         if 'st lucia' in t and not any(kw in t for kw in negs):
             return 0.0
@@ -171,35 +388,153 @@ def analyze_sentiment(queries, destinations, exclusions, negative_keywords):
             return 0.0
         if negs and any(kw in t for kw in negs):
             return -1.0
-        s = sia.polarity_scores(q)['compound']
-        return s if abs(s) > 0.3 or any(d in t for d in dest) else 0.0
+        return None
+
+    fixed = [rule(q) for q in queries]
+    # Only the compound score is stored: it depends on the query text alone, while
+    # the rules above and the threshold below are reapplied on every run
+    to_score = [normalize_query(q) for q, f in zip(queries, fixed) if f is None]
+    compounds = iter(get_score_store().get_many(to_score, lambda q: sia.polarity_scores(q)['compound']))
 
-    monday = last_monday_str()
-    return [{
-        "query": q,
-        "Sentiment_Score": float(score(q)),
-        "MONDAY": monday
-    } for q in queries]
+    def score(q: str, f) -> float:
+        if f is not None:
+            return f
+        s = next(compounds)
+        return s if abs(s) > 0.3 or any(d in q.lower() for d in dest) else 0.0
+
+    scores = array("d", (score(q, f) for q, f in zip(queries, fixed)))
+    return SentimentBatch(queries, scores, last_monday_str())
 
 # ------------- Orchestration -------------
 def run_one(dataset: str):
+    """
+    Fetch, score and upsert one dataset. Independent waits overlap: the
+    negatives download and the table DDL run alongside the query index
+    update and fetch, and the staging load starts as soon as scoring and
+    the DDL have finished. A staging table that never reaches the MERGE is
+    dropped. The result carries per-stage offsets, the critical path and
+    the bytes the fetch processed.
+    """
     if not BIGQUERY_PROJECT:
         raise RuntimeError("BIGQUERY_PROJECT env is required.")
-    bq = get_bq_client(BIGQUERY_PROJECT)
+    table_id = f"{BIGQUERY_PROJECT}.{dataset}.{OUTPUT_TABLE}"
+
+    def score(fetch, negatives):
+        queries, _ = fetch
+        return analyze_sentiment(queries, DEFAULT_DESTINATIONS, EXCLUSION_BASE, negatives) if queries else None
 
-    queries = fetch_queries(bq, BIGQUERY_PROJECT, dataset)
-    if not queries:
-        return {"dataset": dataset, "rows": 0, "note": "no queries"}
+    # Staging tables not yet handed to merge_staged, dropped if the run fails first
+    staged = []
 
-    negs = s3_load_negative_keywords(dataset)
-    rows = analyze_sentiment(queries, DEFAULT_DESTINATIONS, EXCLUSION_BASE, negs)
-    upsert_rows_to_bq(bq, rows, BIGQUERY_PROJECT, dataset, OUTPUT_TABLE)
-    return {"dataset": dataset, "rows": len(rows), "ok": True}
+    def stage(bq_client, sentiment, schema):
+        if not sentiment:
+            return None
+        staging_table_id = stage_rows(bq_client, sentiment, BIGQUERY_PROJECT, dataset, OUTPUT_TABLE)
+        staged.append((bq_client, staging_table_id))
+        return staging_table_id
+
+    def merge(bq_client, stage):
+        if stage:
+            # merge_staged drops the staging table whatever the outcome
+            staged.remove((bq_client, stage))
+            merge_staged(bq_client, table_id, stage)
+
+    try:
+        results, timings = run_graph({
+            "bq_client":   Task(lambda: get_bq_client(BIGQUERY_PROJECT)),
+            "negatives":   Task(lambda: s3_load_negative_keywords(dataset)),
+            "index":       Task(lambda bq_client: refresh_query_index(bq_client, BIGQUERY_PROJECT, dataset),
+                                needs=["bq_client"]),
+            "full_scan":   Task(lambda bq_client: source_scan_bytes(bq_client, BIGQUERY_PROJECT, dataset)
+                                if QUERY_INDEX_TABLE else None, needs=["bq_client"]),
+            "fetch":       Task(lambda bq_client, index: fetch_queries(bq_client, BIGQUERY_PROJECT, dataset,
+                                                                       from_index=index is not None),
+                                needs=["bq_client", "index"]),
+            "schema":      Task(lambda bq_client: ensure_table_schema(bq_client, table_id), needs=["bq_client"]),
+            "sentiment":   Task(score, needs=["fetch", "negatives"]),
+            "stage":       Task(stage, needs=["bq_client", "sentiment", "schema"]),
+            "upsert":      Task(merge, needs=["bq_client", "stage"]),
+        })
+    except Exception:
+        for bq_client, staging_table_id in staged:
+            drop_staging(bq_client, staging_table_id)
+        raise
+    logging.info(f"[{dataset}] Stages {timings['wall_ms']} ms wall vs {timings['serial_ms']} ms serial; "
+                 f"critical path {' > '.join(timings['critical_path'])}")
+    scanned = bytes_scanned(results["index"], results["fetch"][1], results["full_scan"])
+    logging.info(f"[{dataset}] Query fetch processed {scanned['total']} bytes "
+                 f"(source scan would be {scanned.get('full_scan', 'n/a')})")
+    batch = results["sentiment"]
+    if not batch:
+        return {"dataset": dataset, "rows": 0, "note": "no queries", "timings": timings, "bytes_scanned": scanned}
+    logging.info(f" Upserted {len(batch)} rows into {table_id}")
+    return {"dataset": dataset, "rows": len(batch), "ok": True, "timings": timings, "bytes_scanned": scanned}
+
+def bytes_scanned(index_bytes, fetch_bytes, full_scan_bytes):
+    """Bytes processed getting the week's queries, against a plain scan of the source table"""
+    out = {"fetch": fetch_bytes}
+    if index_bytes is not None:
+        out["index_update"] = index_bytes
+    out["total"] = fetch_bytes + (index_bytes or 0)
+    if index_bytes is not None and full_scan_bytes:
+        out["full_scan"] = full_scan_bytes
+        out["saved_pct"] = round(100 * (1 - out["total"] / full_scan_bytes), 1)
+    return out
+
+# ------------- Warm-up -------------
+def warmup_steps():
+    """Process-level setup a first run would pay for; no BigQuery jobs are started"""
+    def vader():
+        return f"{len(get_analyzer().lexicon)} lexicon entries"
+
+    def score_store():
+        store = get_score_store()
+        store.load()
+        return store.stats()["entries"]
+
+    def gcp_credentials():
+        from google.auth.transport.requests import Request
+
+        creds = get_credentials()
+        if not creds.valid:
+            creds.refresh(Request())
+        return f"token valid until {creds.expiry.isoformat()}Z" if creds.expiry else "token valid"
+
+    def bigquery_client():
+        if not BIGQUERY_PROJECT:
+            raise RuntimeError("BIGQUERY_PROJECT env is required.")
+        get_bq_client(BIGQUERY_PROJECT)
+        return BIGQUERY_PROJECT
+
+    def s3_client():
+        _s3()
+        return S3_NEGATIVES_BUCKET
+
+    return [("vader", vader), ("score_store", score_store), ("gcp_credentials", gcp_credentials),
+            ("bigquery_client", bigquery_client), ("s3_client", s3_client)]
+
+# Concurrent requests for a dataset already being processed wait for that run
+# instead of fetching, scoring and MERGEing the same rows again
+coalescer = RunCoalescer(store_from_env())
 
 def run_for_datasets(datasets):
-    results = []
-    for ds in datasets:
+    """
+    Process datasets DATASET_CONCURRENCY at a time; results keep the input
+    order. Scores computed along the way are saved once, after all of them.
+    """
+    def run(ds):
         logging.info(f"=== Processing dataset: {ds} ===")
-        results.append(run_one(ds))
-    return results
+        key = f"{BIGQUERY_PROJECT}.{ds}.{OUTPUT_TABLE}"
+        result, info = coalescer.run(key, lambda: run_one(ds))
+        if info["role"] != "leader":
+            logging.info(f"[{ds}] Attached to in-flight run ({info['role']})")
+        return dict(result, coalesced=info["role"] != "leader")
 
+    try:
+        if DATASET_CONCURRENCY <= 1 or len(datasets) <= 1:
+            return [run(ds) for ds in datasets]
+        with ThreadPoolExecutor(max_workers=min(DATASET_CONCURRENCY, len(datasets))) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, run, ds) for ds in datasets]
+            return [f.result() for f in futures]
+    finally:
+        get_score_store().save()
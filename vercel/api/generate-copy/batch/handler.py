@@ -0,0 +1,110 @@
+import json
+import os
+import sys
+
+# Add project root to Python path (need to go up 4 levels from vercel/api/generate-copy/batch/)
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from _helper.copy_batch import OUTPUT_MODES, SHEETS, load_handler, run_batch
+from _helper.request_body import BodyError, read_body
+from _helper.timing import TimedRequestHandler, span
+from _helper.xlsx_stream import send_file
+
+CONTENT_TYPES = {
+    "workbook": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "CopyBatch.xlsx"),
+    "zip": ("application/zip", "CopyBatch.zip"),
+}
+
+def debug(msg):
+    sys.stderr.write(msg + "\n")
+    sys.stderr.flush()
+
+# The templates and logo the google, facebook and seo exports use, for warm-up
+SCRIPT_DIR = os.path.dirname(__file__)
+TEMPLATE_PATHS = [os.path.join(SCRIPT_DIR, "../resources/templates/template_ad_copy.xlsx"),
+                  os.path.join(SCRIPT_DIR, "../resources/templates/template_seo.xlsx")]
+IMAGE_PATH = os.path.join(SCRIPT_DIR, "../resources/image/8ms.png")
+
+def warmup_steps():
+    from _helper import prewarm
+
+    def handlers():
+        for kind in SHEETS:
+            load_handler(kind)
+        return ", ".join(SHEETS)
+
+    return [("handlers", handlers),
+            *prewarm.generate_copy_steps(TEMPLATE_PATHS, IMAGE_PATH, pooled=True, generation=False)]
+
+class handler(TimedRequestHandler):
+    def _json(self, code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if "warm=" in self.path:
+            # Imported here so cold starts that never see ?warm=1 skip it
+            from _helper import prewarm
+            if prewarm.requested(self.path):
+                prewarm.respond(self, warmup_steps())
+                return
+        self._json(200, {
+            "message": "Generate copy - batch export",
+            "method": "GET",
+            "usage": {
+                "documents": [{"type": "google | facebook | seo", "name": "Campaign name", "llm_output": "..."}],
+                "output": " | ".join(OUTPUT_MODES),
+            },
+        })
+
+    def do_POST(self):
+        debug("Generate copy batch handler started - POST")
+        try:
+            with span("body"):
+                raw = read_body(self.rfile, self.headers)
+            with span("decode"):
+                data = json.loads(raw)
+            if not isinstance(data, dict):
+                raise ValueError("Invalid JSON")
+        except ValueError as e:
+            self._json(400, {"error": str(e) if isinstance(e, BodyError) else "Invalid JSON"})
+            return
+
+        output = data.get("output") or "workbook"
+        try:
+            file_obj, report = run_batch(data.get("documents"), output=output)
+        except ValueError as e:
+            self._json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._json(500, {"error": str(e)})
+            return
+        debug(f"Batch exported: {json.dumps(report)}")
+
+        content_type, filename = CONTENT_TYPES[output]
+        with file_obj:
+            self.send_response(200)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Disposition', f'attachment; filename={filename}')
+            self.send_header('Content-Length', str(report["bytes"]))
+            self.send_header('X-Batch-Exported', str(report["exported"]))
+            self.send_header('X-Batch-Skipped', json.dumps(report["skipped"]))
+            self.end_headers()
+            with span("send"):
+                send_file(self.wfile, file_obj)
+
+    def do_OPTIONS(self):
+        debug("Handling OPTIONS preflight")
+        self.send_response(204)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
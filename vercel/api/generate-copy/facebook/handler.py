@@ -2,23 +2,32 @@ import json
 import os
 import re
 import sys
-from http.server import BaseHTTPRequestHandler
 from io import BytesIO
 
-from openpyxl import load_workbook
-from openpyxl.drawing.image import Image
-
 # Add project root to Python path (need to go up 4 levels from vercel/api/generate-copy/facebook/)
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
-sys.path.insert(0, project_root)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
 # Try importing helpers if available
 try:
     from _app.local.environment import is_running_locally, load_env
-    from _helper.one_password import get_json_note_sync
 except ImportError as ie:
     sys.stderr.write(f"Could not import local helpers: {ie}\n")
 
+from _helper.copy_formats import CONTENT_TYPES, XLSX, negotiate_format, render_records
+from _helper.export_cache import ExportKey, etag_matches, export_cache
+from _helper.request_body import BodyError, is_text_body, iter_body_lines, read_body
+from _helper.timing import TimedRequestHandler, span
+from _helper.xlsx_templates import checkout
+
+SCRIPT_DIR = os.path.dirname(__file__)
+TEMPLATE_PATH = os.path.join(SCRIPT_DIR, "../resources/templates/template_ad_copy.xlsx")
+IMAGE_PATH = os.path.join(SCRIPT_DIR, "../resources/image/8ms.png")
+
+# Per-request diagnostics (dependency check, 1Password probe) are opt-in so GETs stay cheap
+DEBUG_DIAGNOSTICS = os.getenv("HANDLER_DEBUG", "").lower() in ("1", "true", "yes")
+
 def debug(msg):
     sys.stderr.write(msg + "\n")
     sys.stderr.flush()
@@ -64,12 +73,14 @@ def extract_text_and_count(text):
     return t, len(t)
 
 def parse_llm_output(llm_text: str):
+    return parse_llm_lines(llm_text.strip().splitlines())
+
+def parse_llm_lines(lines):
     data_rows = []
     current_channel = None
     primary_text = None
     headline = None
 
-    lines = llm_text.strip().splitlines()
     for line in lines:
         line = line.strip()
         if not line or re.match(r"^[-]{2,}$", line):
@@ -101,9 +112,62 @@ def parse_llm_output(llm_text: str):
 
     return data_rows
 
-class handler(BaseHTTPRequestHandler):
+def facebook_records(rows):
+    records = []
+    for row in rows:
+        headline_text, headline_count = extract_text_and_count(row.get("headline", ""))
+        primary_text, primary_count = extract_text_and_count(row.get("primary_text", ""))
+        records.append({
+            "channel": row.get("channel", ""),
+            "headline": headline_text,
+            "headline_count": headline_count,
+            "primary_text": primary_text,
+            "primary_text_count": primary_count,
+        })
+    return records
+
+def fill_facebook_sheet(ws, rows):
+    from openpyxl.drawing.image import Image
+
+    try:
+        img = Image(IMAGE_PATH)
+        img.width = 500
+        img.height = 77.45
+        ws.add_image(img, 'B2')
+        debug("Image added to workbook")
+    except Exception as img_e:
+        debug(f"Error adding image: {img_e}. Skipping image addition.")
+
+    start_row = 10
+    for idx, row in enumerate(rows):
+        excel_row = start_row + idx
+        channel = row.get("channel", "")
+        primary = row.get("primary_text", "")
+        headline = row.get("headline", "")
+
+        headline_text, headline_count = extract_text_and_count(headline)
+        primary_text, primary_count = extract_text_and_count(primary)
+
+        ws.cell(row=excel_row, column=2, value=channel)       # Column B: Channel
+        ws.cell(row=excel_row, column=6, value=headline_text)    # Column F: Headline
+        ws.cell(row=excel_row, column=7, value=headline_count) # Column G: Headline char count
+        ws.cell(row=excel_row, column=8, value=primary_text)    # Column H: Primary Text
+        ws.cell(row=excel_row, column=9, value=primary_count)   # Column I: Primary Text char count
+
+def warmup_steps():
+    from _helper import prewarm
+
+    return prewarm.generate_copy_steps([TEMPLATE_PATH], IMAGE_PATH, pooled=True)
+
+class handler(TimedRequestHandler):
     def do_GET(self):
         debug("Facebook Ads XLSX handler started - GET")
+        if "warm=" in self.path:
+            # Imported here so cold starts that never see ?warm=1 skip it
+            from _helper import prewarm
+            if prewarm.requested(self.path):
+                prewarm.respond(self, warmup_steps())
+                return
         # Uncomment if you want diagnostics
         # explore_filesystem()
         # debug_environment()
@@ -115,18 +179,14 @@ class handler(BaseHTTPRequestHandler):
         except Exception as e:
             debug(f"Env load error: {e}")
 
-        check_dependencies()
+        if DEBUG_DIAGNOSTICS:
+            check_dependencies()
 
-        try:
-            if 'get_json_note_sync' in globals():
-                get_json_note_sync("eftj3nyjzwx6xf4mpjdep4jmpu", "bnl2n2hc6kldzgnusvrae3lbcy")
-        except Exception as e:
-            debug(f"get_json_note_sync error: {e}")
-
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
+            try:
+                from _helper.secret_cache import get_json_note
+                get_json_note("eftj3nyjzwx6xf4mpjdep4jmpu", "bnl2n2hc6kldzgnusvrae3lbcy")
+            except Exception as e:
+                debug(f"get_json_note error: {e}")
 
         response_data = {
             "message": "Facebook Ads - XLSX - Export Done!",
@@ -135,102 +195,147 @@ class handler(BaseHTTPRequestHandler):
                 "EMS_ENVIRONMENT": os.environ.get('EMS_ENVIRONMENT', 'not set'),
                 "VERCEL_ENV": os.environ.get('VERCEL_ENV', 'not set')
             },
-            "timestamp": str(os.environ.get('VERCEL_REQUEST_TIME', 'not available'))
+            "timestamp": str(os.environ.get('VERCEL_REQUEST_TIME', 'not available')),
+            "export_cache": export_cache.stats()
         }
         debug(f"Returning response: {response_data}")
-        self.wfile.write(json.dumps(response_data, indent=2).encode())
+        body = json.dumps(response_data, indent=2).encode()
 
-    def do_POST(self):
-        debug("Facebook Ads XLSX handler started - POST")
-        content_length = int(self.headers.get('Content-Length', 0))
-        post_data = self.rfile.read(content_length)
-        try:
-            data = json.loads(post_data.decode())
-        except Exception:
-            self.send_response(400)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            error = {"error": "Invalid JSON"}
-            self.wfile.write(json.dumps(error).encode())
-            return
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-        llm_output = data.get("llm_output")
-        if not llm_output:
-            self.send_response(400)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            error = {"error": "No llm_output provided"}
-            self.wfile.write(json.dumps(error).encode())
-            return
+    def _error(self, code, message):
+        body = json.dumps({"error": message}).encode()
+        self.send_response(code)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-        script_dir = os.path.dirname(__file__)
-        template_path = os.path.join(script_dir, "../resources/templates/template_ad_copy.xlsx")
-        image_path = os.path.join(script_dir, "../resources/image/8ms.png")
+    def _send_export(self, body, fmt, etag, cache_status):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', CONTENT_TYPES[fmt])
+        if fmt == XLSX:
+            self.send_header('Content-Disposition', 'attachment; filename=FacebookCopyFilled.xlsx')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Vary', 'Accept')
+        self.send_header('X-Cache', cache_status)
+        self.end_headers()
+        self.wfile.write(body)
 
+    def do_POST(self):
+        debug("Facebook Ads XLSX handler started - POST")
+        data = None
+        parsed = None
+        llm_output = None
+        key = ExportKey("facebook", TEMPLATE_PATH, IMAGE_PATH)
         try:
-            wb = load_workbook(template_path)
-
-            # Check for 'Ad Copy' sheet and select it
-            if "Ad Copy" not in wb.sheetnames:
-                ws = wb.create_sheet("Ad Copy")
+            if is_text_body(self.headers):
+                # Raw text/plain upload: parse lines as they come off the socket
+                with span("parse"):
+                    parsed = parse_llm_lines(key.lines(iter_body_lines(self.rfile, self.headers)))
             else:
-                ws = wb["Ad Copy"]
+                with span("body"):
+                    raw = read_body(self.rfile, self.headers)
+                with span("decode"):
+                    data = json.loads(raw)
+                if not isinstance(data, dict):
+                    raise ValueError("Invalid JSON")
+                llm_output = data.get("llm_output")
+        except ValueError as e:
+            self._error(400, str(e) if isinstance(e, BodyError) else "Invalid JSON")
+            return
+        if llm_output is not None and not isinstance(llm_output, str):
+            self._error(400, "llm_output must be a string")
+            return
 
+        if data is not None and not llm_output:
+            if data.get("brief") is None:
+                self._error(400, "No llm_output or brief provided")
+                return
+            # Generate the copy here instead of the caller doing it and POSTing the text
             try:
-                img = Image(image_path)
-                img.width = 500
-                img.height = 77.45
-                ws.add_image(img, 'B2')
-                debug("Image added to workbook")
-            except Exception as img_e:
-                debug(f"Error adding image: {img_e}. Skipping image addition.")
-
-            rows = parse_llm_output(llm_output)
-            if len(rows) == 0:
-                self.send_response(400)
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                error = {"error": "No valid ad copy parsed."}
-                self.wfile.write(json.dumps(error).encode())
+                from _helper.copy_generation import generate_llm_output
+                with span("generate"):
+                    llm_output, report = generate_llm_output("facebook", data["brief"], use_cache=not data.get("regenerate"))
+            except ValueError as e:
+                self._error(400, str(e))
                 return
+            except Exception as e:
+                self._error(502, f"Copy generation failed: {e}")
+                return
+            debug(f"Generated copy: {json.dumps(report)}")
+        if data is not None:
+            key.update_text(llm_output)
 
-            start_row = 10
-            for idx, row in enumerate(rows):
-                excel_row = start_row + idx
-                channel = row.get("channel", "")
-                primary = row.get("primary_text", "")
-                headline = row.get("headline", "")
+        try:
+            fmt = negotiate_format(self.headers, self.path, data.get("format") if data else None)
+        except ValueError as e:
+            self._error(400, str(e))
+            return
 
-                headline_text, headline_count = extract_text_and_count(headline)
-                primary_text, primary_count = extract_text_and_count(primary)
+        # Same input, template and format always export to the same bytes
+        etag = key.etag(fmt)
+        if etag_matches(self.headers, etag):
+            export_cache.not_modified()
+            self.send_response(304)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept')
+            self.end_headers()
+            return
+        with span("cache"):
+            cached = export_cache.get(etag)
+        if cached is not None:
+            self._send_export(cached, fmt, etag, "HIT")
+            return
 
-                ws.cell(row=excel_row, column=2, value=channel)       # Column B: Channel
-                ws.cell(row=excel_row, column=6, value=headline_text)    # Column F: Headline
-                ws.cell(row=excel_row, column=7, value=headline_count) # Column G: Headline char count
-                ws.cell(row=excel_row, column=8, value=primary_text)    # Column H: Primary Text
-                ws.cell(row=excel_row, column=9, value=primary_count)   # Column I: Primary Text char count
+        with span("parse"):
+            rows = parsed if parsed is not None else parse_llm_output(llm_output)
+        if len(rows) == 0:
+            self._error(400, "No valid ad copy parsed.")
+            return
 
-            output = BytesIO()
-            wb.save(output)
-            file_bytes = output.getvalue()
-            debug(f"Workbook saved to BytesIO, length: {len(file_bytes)} bytes")
+        if fmt != XLSX:
+            # Rows and character counts only: no template, workbook or zip compression
+            with span("render"):
+                body, _ = render_records(facebook_records(rows), fmt)
+            with span("cache_store"):
+                export_cache.put(etag, body)
+            self._send_export(body, fmt, etag, "MISS")
+            return
 
-            self.send_response(200)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            self.send_header('Content-Disposition', 'attachment; filename=FacebookCopyFilled.xlsx')
-            self.end_headers()
-            self.wfile.write(file_bytes)
+        try:
+            # Parsed once per process and lent out; the block must save before it exits
+            with checkout(TEMPLATE_PATH) as (wb, _):
+                # Check for 'Ad Copy' sheet and select it
+                if "Ad Copy" not in wb.sheetnames:
+                    ws = wb.create_sheet("Ad Copy")
+                else:
+                    ws = wb["Ad Copy"]
+
+                with span("fill"):
+                    fill_facebook_sheet(ws, rows)
+
+                with span("save"):
+                    output = BytesIO()
+                    wb.save(output)
+                    file_bytes = output.getvalue()
+                debug(f"Workbook saved to BytesIO, length: {len(file_bytes)} bytes")
         except Exception as e:
-            self.send_response(500)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            error = {"error": str(e)}
-            self.wfile.write(json.dumps(error).encode())
+            self._error(500, str(e))
+            return
+
+        with span("cache_store"):
+            export_cache.put(etag, file_bytes)
+        self._send_export(file_bytes, fmt, etag, "MISS")
 
     def do_OPTIONS(self):
         debug("Handling OPTIONS preflight")
@@ -2,23 +2,32 @@ import json
 import os
 import re
 import sys
-from http.server import BaseHTTPRequestHandler
 from io import BytesIO
 
-from openpyxl import load_workbook
-from openpyxl.drawing.image import Image
-
 # Add project root to Python path (need to go up 4 levels from vercel/api/generate-copy/google/)
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
-sys.path.insert(0, project_root)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
 # Try importing helpers if available
 try:
     from _app.local.environment import is_running_locally, load_env
-    from _helper.one_password import get_json_note_sync
 except ImportError as ie:
     sys.stderr.write(f"Could not import local helpers: {ie}\n")
 
+from _helper.copy_formats import CONTENT_TYPES, XLSX, negotiate_format, render_records
+from _helper.export_cache import ExportKey, etag_matches, export_cache
+from _helper.request_body import BodyError, is_text_body, iter_body_lines, read_body
+from _helper.timing import TimedRequestHandler, span
+from _helper.xlsx_templates import checkout
+
+SCRIPT_DIR = os.path.dirname(__file__)
+TEMPLATE_PATH = os.path.join(SCRIPT_DIR, "../resources/templates/template_ad_copy.xlsx")
+IMAGE_PATH = os.path.join(SCRIPT_DIR, "../resources/image/8ms.png")
+
+# Per-request diagnostics (dependency check, 1Password probe) are opt-in so GETs stay cheap
+DEBUG_DIAGNOSTICS = os.getenv("HANDLER_DEBUG", "").lower() in ("1", "true", "yes")
+
 def debug(msg):
     sys.stderr.write(msg + "\n")
     sys.stderr.flush()
@@ -64,6 +73,9 @@ def extract_text_and_count(text):
     return t, len(t)
 
 def parse_google_ads_output(llm_text: str):
+    return parse_google_ads_lines(llm_text.strip().splitlines())
+
+def parse_google_ads_lines(lines):
     FIELD_BASE = [
         "Headline (1)", "Headline (2)",
         "Description (1)", "Description (2)",
@@ -73,7 +85,6 @@ def parse_google_ads_output(llm_text: str):
     sitelinks_data = []
     ad_block = {}
     ad_index = 0
-    lines = llm_text.strip().splitlines()
     for line in lines:
         line = line.strip()
         if not line or re.match(r"^[-]{2,}$", line):
@@ -115,9 +126,105 @@ def parse_google_ads_output(llm_text: str):
             ad_block = {}
     return data_rows, sitelinks_data
 
-class handler(BaseHTTPRequestHandler):
+def google_ads_records(rows, sitelinks):
+    records = []
+    for idx, row in enumerate(rows):
+        record = {"type": "ad", "ad_index": idx}
+        for field in ("Headline (1)", "Headline (2)", "Description (1)", "Description (2)", "Path (1)", "Path (2)"):
+            key = field.lower().replace(" (", "_").rstrip(")")
+            text, count = extract_text_and_count(row.get(field, ""))
+            record[key] = text
+            if not field.startswith("Path"):
+                record[f"{key}_count"] = count
+        records.append(record)
+    for entry in sitelinks:
+        text, text_count = extract_text_and_count(entry["text"])
+        desc, desc_count = extract_text_and_count(entry["description"])
+        records.append({
+            "type": "sitelink",
+            "ad_index": entry["ad_index"],
+            "index": entry["index"],
+            "text": text,
+            "text_count": text_count,
+            "description": desc,
+            "description_count": desc_count,
+            "url": entry["url"],
+        })
+    return records
+
+def fill_google_ads_sheets(ws_main, ws_sitelinks, rows, sitelinks):
+    from openpyxl.drawing.image import Image
+
+    try:
+        img_main = Image(IMAGE_PATH)
+        img_main.width = 500
+        img_main.height = 77.45
+        ws_main.add_image(img_main, 'B2')
+        debug("Image added to 'Ad Copy'.")
+    except Exception as img_e:
+        debug(f"Image error: {img_e}")
+
+    try:
+        img_sitelinks = Image(IMAGE_PATH)
+        img_sitelinks.width = 500
+        img_sitelinks.height = 77.45
+        ws_sitelinks.add_image(img_sitelinks, 'B2')
+        debug("Image added to 'Sitelinks'.")
+    except Exception as img_e:
+        debug(f"Image error: {img_e}")
+
+    start_row = 10
+    for idx, row in enumerate(rows):
+        row1 = start_row + idx * 2
+        row2 = row1 + 1
+
+        h1_text, h1_count = extract_text_and_count(row.get("Headline (1)", ""))
+        h2_text, h2_count = extract_text_and_count(row.get("Headline (2)", ""))
+        d1_text, d1_count = extract_text_and_count(row.get("Description (1)", ""))
+        d2_text, d2_count = extract_text_and_count(row.get("Description (2)", ""))
+        p1_text, _ = extract_text_and_count(row.get("Path (1)", ""))
+        p2_text, _ = extract_text_and_count(row.get("Path (2)", ""))
+
+        ws_main.cell(row=row1, column=2, value="Google Ads")
+        ws_main.cell(row=row2, column=2, value="Google Ads")
+
+        ws_main.cell(row=row1, column=6, value=h1_text)
+        ws_main.cell(row=row1, column=7, value=h1_count)
+        ws_main.cell(row=row1, column=5, value=p1_text)
+        ws_main.cell(row=row1, column=8, value=d1_text)
+        ws_main.cell(row=row1, column=9, value=d1_count)
+
+        ws_main.cell(row=row2, column=6, value=h2_text)
+        ws_main.cell(row=row2, column=7, value=h2_count)
+        ws_main.cell(row=row2, column=5, value=p2_text)
+        ws_main.cell(row=row2, column=8, value=d2_text)
+        ws_main.cell(row=row2, column=9, value=d2_count)
+
+    sitelink_start_row = 10
+    for idx, entry in enumerate(sitelinks):
+        row = sitelink_start_row + idx
+        text, text_count = extract_text_and_count(entry["text"])
+        desc, desc_count = extract_text_and_count(entry["description"])
+        ws_sitelinks.cell(row=row, column=2, value=text)
+        ws_sitelinks.cell(row=row, column=3, value=text_count)
+        ws_sitelinks.cell(row=row, column=4, value=desc)
+        ws_sitelinks.cell(row=row, column=5, value=desc_count)
+        ws_sitelinks.cell(row=row, column=8, value=entry["url"])
+
+def warmup_steps():
+    from _helper import prewarm
+
+    return prewarm.generate_copy_steps([TEMPLATE_PATH], IMAGE_PATH, pooled=True)
+
+class handler(TimedRequestHandler):
     def do_GET(self):
         debug("Google Ads XLSX handler started - GET")
+        if "warm=" in self.path:
+            # Imported here so cold starts that never see ?warm=1 skip it
+            from _helper import prewarm
+            if prewarm.requested(self.path):
+                prewarm.respond(self, warmup_steps())
+                return
         # Uncomment if you want diagnostics
         # explore_filesystem()
         # debug_environment()
@@ -129,18 +236,14 @@ class handler(BaseHTTPRequestHandler):
         except Exception as e:
             debug(f"Env load error: {e}")
 
-        check_dependencies()
+        if DEBUG_DIAGNOSTICS:
+            check_dependencies()
 
-        try:
-            if 'get_json_note_sync' in globals():
-                get_json_note_sync("eftj3nyjzwx6xf4mpjdep4jmpu", "bnl2n2hc6kldzgnusvrae3lbcy")
-        except Exception as e:
-            debug(f"get_json_note_sync error: {e}")
-
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
+            try:
+                from _helper.secret_cache import get_json_note
+                get_json_note("eftj3nyjzwx6xf4mpjdep4jmpu", "bnl2n2hc6kldzgnusvrae3lbcy")
+            except Exception as e:
+                debug(f"get_json_note error: {e}")
 
         response_data = {
             "message": "Google Ads - XLSX - Export Done!",
@@ -149,138 +252,153 @@ class handler(BaseHTTPRequestHandler):
                 "EMS_ENVIRONMENT": os.environ.get('EMS_ENVIRONMENT', 'not set'),
                 "VERCEL_ENV": os.environ.get('VERCEL_ENV', 'not set')
             },
-            "timestamp": str(os.environ.get('VERCEL_REQUEST_TIME', 'not available'))
+            "timestamp": str(os.environ.get('VERCEL_REQUEST_TIME', 'not available')),
+            "export_cache": export_cache.stats()
         }
         debug(f"Returning response: {response_data}")
-        self.wfile.write(json.dumps(response_data, indent=2).encode())
+        body = json.dumps(response_data, indent=2).encode()
+
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code, message):
+        body = json.dumps({"error": message}).encode()
+        self.send_response(code)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_export(self, body, fmt, etag, cache_status):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', CONTENT_TYPES[fmt])
+        if fmt == XLSX:
+            self.send_header('Content-Disposition', 'attachment; filename=GoogleAdsCopyFilled.xlsx')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Vary', 'Accept')
+        self.send_header('X-Cache', cache_status)
+        self.end_headers()
+        self.wfile.write(body)
 
     def do_POST(self):
         debug("Google Ads XLSX handler started - POST")
-        content_length = int(self.headers.get('Content-Length', 0))
-        post_data = self.rfile.read(content_length)
+        data = None
+        parsed = None
+        llm_output = None
+        key = ExportKey("google", TEMPLATE_PATH, IMAGE_PATH)
         try:
-            data = json.loads(post_data.decode())
-        except Exception:
-            self.send_response(400)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            error = {"error": "Invalid JSON"}
-            self.wfile.write(json.dumps(error).encode())
+            if is_text_body(self.headers):
+                # Raw text/plain upload: parse lines as they come off the socket
+                with span("parse"):
+                    parsed = parse_google_ads_lines(key.lines(iter_body_lines(self.rfile, self.headers)))
+            else:
+                with span("body"):
+                    raw = read_body(self.rfile, self.headers)
+                with span("decode"):
+                    data = json.loads(raw)
+                if not isinstance(data, dict):
+                    raise ValueError("Invalid JSON")
+                llm_output = data.get("llm_output")
+        except ValueError as e:
+            self._error(400, str(e) if isinstance(e, BodyError) else "Invalid JSON")
+            return
+        if llm_output is not None and not isinstance(llm_output, str):
+            self._error(400, "llm_output must be a string")
+            return
+
+        if data is not None and not llm_output:
+            if data.get("brief") is None:
+                self._error(400, "No llm_output or brief provided")
+                return
+            # Generate the copy here instead of the caller doing it and POSTing the text
+            try:
+                from _helper.copy_generation import generate_llm_output
+                with span("generate"):
+                    llm_output, report = generate_llm_output("google", data["brief"], use_cache=not data.get("regenerate"))
+            except ValueError as e:
+                self._error(400, str(e))
+                return
+            except Exception as e:
+                self._error(502, f"Copy generation failed: {e}")
+                return
+            debug(f"Generated copy: {json.dumps(report)}")
+        if data is not None:
+            key.update_text(llm_output)
+
+        try:
+            fmt = negotiate_format(self.headers, self.path, data.get("format") if data else None)
+        except ValueError as e:
+            self._error(400, str(e))
             return
 
-        llm_output = data.get("llm_output")
-        if not llm_output:
-            self.send_response(400)
+        # Same input, template and format always export to the same bytes
+        etag = key.etag(fmt)
+        if etag_matches(self.headers, etag):
+            export_cache.not_modified()
+            self.send_response(304)
             self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/json')
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept')
             self.end_headers()
-            error = {"error": "No llm_output provided"}
-            self.wfile.write(json.dumps(error).encode())
+            return
+        with span("cache"):
+            cached = export_cache.get(etag)
+        if cached is not None:
+            self._send_export(cached, fmt, etag, "HIT")
             return
 
-        script_dir = os.path.dirname(__file__)
-        template_path = os.path.join(script_dir, "../resources/templates/template_ad_copy.xlsx")
-        image_path = os.path.join(script_dir, "../resources/image/8ms.png")
+        with span("parse"):
+            rows, sitelinks = parsed if parsed is not None else parse_google_ads_output(llm_output)
+        if len(rows) == 0:
+            self._error(400, "No valid ad copy parsed.")
+            return
+
+        if fmt != XLSX:
+            # Rows and character counts only: no template, workbook or zip compression
+            with span("render"):
+                body, _ = render_records(google_ads_records(rows, sitelinks), fmt)
+            with span("cache_store"):
+                export_cache.put(etag, body)
+            self._send_export(body, fmt, etag, "MISS")
+            return
 
         try:
-            wb = load_workbook(template_path)
+            # Parsed once per process and lent out; the block must save before it exits
+            with checkout(TEMPLATE_PATH) as (wb, _):
+                # Main worksheet
+                if "Ad Copy" not in wb.sheetnames:
+                    ws_main = wb.create_sheet("Ad Copy")
+                else:
+                    ws_main = wb["Ad Copy"]
 
-            # Main worksheet
-            if "Ad Copy" not in wb.sheetnames:
-                ws_main = wb.create_sheet("Ad Copy")
-            else:
-                ws_main = wb["Ad Copy"]
+                # Sitelinks worksheet
+                if "Sitelinks" in wb.sheetnames:
+                    ws_sitelinks = wb["Sitelinks"]
+                else:
+                    ws_sitelinks = wb.create_sheet("Sitelinks")
 
-            try:
-                img_main = Image(image_path)
-                img_main.width = 500
-                img_main.height = 77.45
-                ws_main.add_image(img_main, 'B2')
-                debug("Image added to 'Ad Copy'.")
-            except Exception as img_e:
-                debug(f"Image error: {img_e}")
-
-            # Sitelinks worksheet
-            if "Sitelinks" in wb.sheetnames:
-                ws_sitelinks = wb["Sitelinks"]
-            else:
-                ws_sitelinks = wb.create_sheet("Sitelinks")
-            try:
-                img_sitelinks = Image(image_path)
-                img_sitelinks.width = 500
-                img_sitelinks.height = 77.45
-                ws_sitelinks.add_image(img_sitelinks, 'B2')
-                debug("Image added to 'Sitelinks'.")
-            except Exception as img_e:
-                debug(f"Image error: {img_e}")
-
-            rows, sitelinks = parse_google_ads_output(llm_output)
-            if len(rows) == 0:
-                self.send_response(400)
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                error = {"error": "No valid ad copy parsed."}
-                self.wfile.write(json.dumps(error).encode())
-                return
+                with span("fill"):
+                    fill_google_ads_sheets(ws_main, ws_sitelinks, rows, sitelinks)
 
-            start_row = 10
-            for idx, row in enumerate(rows):
-                row1 = start_row + idx * 2
-                row2 = row1 + 1
-
-                h1_text, h1_count = extract_text_and_count(row.get("Headline (1)", ""))
-                h2_text, h2_count = extract_text_and_count(row.get("Headline (2)", ""))
-                d1_text, d1_count = extract_text_and_count(row.get("Description (1)", ""))
-                d2_text, d2_count = extract_text_and_count(row.get("Description (2)", ""))
-                p1_text, _ = extract_text_and_count(row.get("Path (1)", ""))
-                p2_text, _ = extract_text_and_count(row.get("Path (2)", ""))
-
-                ws_main.cell(row=row1, column=2, value="Google Ads")
-                ws_main.cell(row=row2, column=2, value="Google Ads")
-
-                ws_main.cell(row=row1, column=6, value=h1_text)
-                ws_main.cell(row=row1, column=7, value=h1_count)
-                ws_main.cell(row=row1, column=5, value=p1_text)
-                ws_main.cell(row=row1, column=8, value=d1_text)
-                ws_main.cell(row=row1, column=9, value=d1_count)
-
-                ws_main.cell(row=row2, column=6, value=h2_text)
-                ws_main.cell(row=row2, column=7, value=h2_count)
-                ws_main.cell(row=row2, column=5, value=p2_text)
-                ws_main.cell(row=row2, column=8, value=d2_text)
-                ws_main.cell(row=row2, column=9, value=d2_count)
-
-            sitelink_start_row = 10
-            for idx, entry in enumerate(sitelinks):
-                row = sitelink_start_row + idx
-                text, text_count = extract_text_and_count(entry["text"])
-                desc, desc_count = extract_text_and_count(entry["description"])
-                ws_sitelinks.cell(row=row, column=2, value=text)
-                ws_sitelinks.cell(row=row, column=3, value=text_count)
-                ws_sitelinks.cell(row=row, column=4, value=desc)
-                ws_sitelinks.cell(row=row, column=5, value=desc_count)
-                ws_sitelinks.cell(row=row, column=8, value=entry["url"])
-
-            output = BytesIO()
-            wb.save(output)
-            file_bytes = output.getvalue()
-            debug(f"Workbook saved to BytesIO, length: {len(file_bytes)} bytes")
-
-            self.send_response(200)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            self.send_header('Content-Disposition', 'attachment; filename=GoogleAdsCopyFilled.xlsx')
-            self.end_headers()
-            self.wfile.write(file_bytes)
+                with span("save"):
+                    output = BytesIO()
+                    wb.save(output)
+                    file_bytes = output.getvalue()
+                debug(f"Workbook saved to BytesIO, length: {len(file_bytes)} bytes")
         except Exception as e:
-            self.send_response(500)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            error = {"error": str(e)}
-            self.wfile.write(json.dumps(error).encode())
+            self._error(500, str(e))
+            return
+
+        with span("cache_store"):
+            export_cache.put(etag, file_bytes)
+        self._send_export(file_bytes, fmt, etag, "MISS")
 
     def do_OPTIONS(self):
         debug("Handling OPTIONS preflight")
@@ -2,24 +2,33 @@ import json
 import os
 import re
 import sys
-from http.server import BaseHTTPRequestHandler
 from io import BytesIO
 
-from openpyxl import load_workbook
-from openpyxl.drawing.image import Image
-
 # Add project root to Python path (need to go up 4 levels from vercel/api/generate-copy/seo/)
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
-sys.path.insert(0, project_root)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
 # Now you can import from _app / _helper (these must exist in your repo!)
 try:
     from _app.local.environment import is_running_locally, load_env
-    from _helper.one_password import get_json_note_sync
 except ImportError as ie:
     # Log and skip if not available (for deployment/debug)
     sys.stderr.write(f"Could not import local helpers: {ie}\n")
 
+from _helper.copy_formats import CONTENT_TYPES, XLSX, negotiate_format, render_records
+from _helper.export_cache import ExportKey, etag_matches, export_cache
+from _helper.request_body import BodyError, is_text_body, iter_body_lines, read_body
+from _helper.timing import TimedRequestHandler, span
+from _helper.xlsx_templates import checkout
+
+SCRIPT_DIR = os.path.dirname(__file__)
+TEMPLATE_PATH = os.path.join(SCRIPT_DIR, "../resources/templates/template_seo.xlsx")
+IMAGE_PATH = os.path.join(SCRIPT_DIR, "../resources/image/8ms.png")
+
+# Per-request diagnostics (dependency check, 1Password probe) are opt-in so GETs stay cheap
+DEBUG_DIAGNOSTICS = os.getenv("HANDLER_DEBUG", "").lower() in ("1", "true", "yes")
+
 def check_dependencies():
     """
     Check if required dependencies are available.
@@ -70,6 +79,9 @@ def explore_filesystem():
                 debug(f"Found _app/local: {os.listdir(local_path)}")
 
 def parse_seo_output(llm_text: str):
+    return parse_seo_lines(llm_text.strip().splitlines())
+
+def parse_seo_lines(lines):
     rows = []
     current_url = None
     current_brand = None
@@ -77,7 +89,6 @@ def parse_seo_output(llm_text: str):
     meta = None
     title_count = None
     meta_count = None
-    lines = llm_text.strip().splitlines()
     for line in lines:
         line = line.strip()
         m = re.match(r"^Line \d+ \(URL: ([^)]+)\):", line)
@@ -106,9 +117,53 @@ def parse_seo_output(llm_text: str):
             continue
     return rows
 
-class handler(BaseHTTPRequestHandler):
+def seo_records(rows):
+    return [{
+        "brand": brand,
+        "url": url,
+        "title": title,
+        "title_count": title_count,
+        "meta_description": meta,
+        "meta_description_count": meta_count,
+    } for brand, url, title, title_count, meta, meta_count in rows]
+
+def fill_seo_sheet(ws, rows):
+    from openpyxl.drawing.image import Image
+
+    try:
+        img = Image(IMAGE_PATH)
+        img.width = 500
+        img.height = 77.45
+        ws.add_image(img, 'B2')
+        debug("Image added to workbook")
+    except Exception as img_e:
+        debug(f"Image error: {img_e}")
+
+    start_row = 10
+    for idx, (brand, url, title, title_count, meta, meta_count) in enumerate(rows):
+        row = start_row + idx
+        ws.cell(row=row, column=2, value=brand)
+        ws.cell(row=row, column=3, value=url)
+        ws.cell(row=row, column=4, value=title)
+        ws.cell(row=row, column=5, value=title_count)
+        ws.cell(row=row, column=6, value=meta)
+        ws.cell(row=row, column=7, value=meta_count)
+    debug("Excel cells filled")
+
+def warmup_steps():
+    from _helper import prewarm
+
+    return prewarm.generate_copy_steps([TEMPLATE_PATH], IMAGE_PATH, pooled=True)
+
+class handler(TimedRequestHandler):
     def do_GET(self):
         debug("SEO XLSX handler started - GET")
+        if "warm=" in self.path:
+            # Imported here so cold starts that never see ?warm=1 skip it
+            from _helper import prewarm
+            if prewarm.requested(self.path):
+                prewarm.respond(self, warmup_steps())
+                return
 
         # Demo: filesystem and environment diagnostics (uncomment if needed)
         # explore_filesystem()
@@ -123,18 +178,14 @@ class handler(BaseHTTPRequestHandler):
         except Exception as e:
             debug(f"Env load error: {e}")
 
-        check_dependencies()
-
-        try:
-            if 'get_json_note_sync' in globals():
-                get_json_note_sync("eftj3nyjzwx6xf4mpjdep4jmpu", "bnl2n2hc6kldzgnusvrae3lbcy")
-        except Exception as e:
-            debug(f"get_json_note_sync error: {e}")
+        if DEBUG_DIAGNOSTICS:
+            check_dependencies()
 
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
+            try:
+                from _helper.secret_cache import get_json_note
+                get_json_note("eftj3nyjzwx6xf4mpjdep4jmpu", "bnl2n2hc6kldzgnusvrae3lbcy")
+            except Exception as e:
+                debug(f"get_json_note error: {e}")
 
         response_data = {
             "message": "SEO - XLSX - Export Done!",
@@ -143,94 +194,144 @@ class handler(BaseHTTPRequestHandler):
                 "EMS_ENVIRONMENT": os.environ.get('EMS_ENVIRONMENT', 'not set'),
                 "VERCEL_ENV": os.environ.get('VERCEL_ENV', 'not set')
             },
-            "timestamp": str(os.environ.get('VERCEL_REQUEST_TIME', 'not available'))
+            "timestamp": str(os.environ.get('VERCEL_REQUEST_TIME', 'not available')),
+            "export_cache": export_cache.stats()
         }
 
         debug(f"Returning response: {response_data}")
-        self.wfile.write(json.dumps(response_data, indent=2).encode())
+        body = json.dumps(response_data, indent=2).encode()
+
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code, message):
+        body = json.dumps({"error": message}).encode()
+        self.send_response(code)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_export(self, body, fmt, etag, cache_status):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', CONTENT_TYPES[fmt])
+        if fmt == XLSX:
+            self.send_header('Content-Disposition', 'attachment; filename=SEO_Metadata.xlsx')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Vary', 'Accept')
+        self.send_header('X-Cache', cache_status)
+        self.end_headers()
+        self.wfile.write(body)
 
     def do_POST(self):
         debug("SEO XLSX handler started - POST")
-        content_length = int(self.headers.get('Content-Length', 0))
-        post_data = self.rfile.read(content_length)
+        data = None
+        parsed = None
+        llm_output = None
+        key = ExportKey("seo", TEMPLATE_PATH, IMAGE_PATH)
         try:
-            data = json.loads(post_data.decode())
-        except Exception:
-            self.send_response(400)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            error = {"error": "Invalid JSON"}
-            self.wfile.write(json.dumps(error).encode())
+            if is_text_body(self.headers):
+                # Raw text/plain upload: parse lines as they come off the socket
+                with span("parse"):
+                    parsed = parse_seo_lines(key.lines(iter_body_lines(self.rfile, self.headers)))
+            else:
+                with span("body"):
+                    raw = read_body(self.rfile, self.headers)
+                with span("decode"):
+                    data = json.loads(raw)
+                if not isinstance(data, dict):
+                    raise ValueError("Invalid JSON")
+                llm_output = data.get("llm_output")
+        except ValueError as e:
+            self._error(400, str(e) if isinstance(e, BodyError) else "Invalid JSON")
+            return
+        if llm_output is not None and not isinstance(llm_output, str):
+            self._error(400, "llm_output must be a string")
             return
 
-        llm_output = data.get("llm_output")
-        if not llm_output:
-            self.send_response(400)
+        if data is not None and not llm_output:
+            if data.get("brief") is None:
+                self._error(400, "No llm_output or brief provided")
+                return
+            # Generate the copy here instead of the caller doing it and POSTing the text
+            try:
+                from _helper.copy_generation import generate_llm_output
+                with span("generate"):
+                    llm_output, report = generate_llm_output("seo", data["brief"], use_cache=not data.get("regenerate"))
+            except ValueError as e:
+                self._error(400, str(e))
+                return
+            except Exception as e:
+                self._error(502, f"Copy generation failed: {e}")
+                return
+            debug(f"Generated copy: {json.dumps(report)}")
+        if data is not None:
+            key.update_text(llm_output)
+
+        try:
+            fmt = negotiate_format(self.headers, self.path, data.get("format") if data else None)
+        except ValueError as e:
+            self._error(400, str(e))
+            return
+
+        # Same input, template and format always export to the same bytes
+        etag = key.etag(fmt)
+        if etag_matches(self.headers, etag):
+            export_cache.not_modified()
+            self.send_response(304)
             self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/json')
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept')
             self.end_headers()
-            error = {"error": "No llm_output provided"}
-            self.wfile.write(json.dumps(error).encode())
+            return
+        with span("cache"):
+            cached = export_cache.get(etag)
+        if cached is not None:
+            self._send_export(cached, fmt, etag, "HIT")
             return
 
-        # Path relative to this file's location
-        script_dir = os.path.dirname(__file__)
-        template_path = os.path.join(script_dir, "../resources/templates/template_seo.xlsx")
-        image_path = os.path.join(script_dir, "../resources/images/8ms.png")
+        with span("parse"):
+            rows = parsed if parsed is not None else parse_seo_output(llm_output)
+        if len(rows) == 0:
+            self._error(400, "No valid SEO metadata parsed.")
+            return
+
+        if fmt != XLSX:
+            # Rows and character counts only: no template, workbook or zip compression
+            with span("render"):
+                body, _ = render_records(seo_records(rows), fmt)
+            with span("cache_store"):
+                export_cache.put(etag, body)
+            self._send_export(body, fmt, etag, "MISS")
+            return
 
         try:
-            wb = load_workbook(template_path)
-            ws = wb.active
+            # Parsed once per process and lent out; the block must save before it exits
+            with checkout(TEMPLATE_PATH) as (wb, _):
+                ws = wb.active
 
-            try:
-                img = Image(image_path)
-                img.width = 500
-                img.height = 77.45
-                ws.add_image(img, 'B2')
-                debug("Image added to workbook")
-            except Exception as img_e:
-                debug(f"Image error: {img_e}")
-
-            rows = parse_seo_output(llm_output)
-            if len(rows) == 0:
-                self.send_response(400)
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                error = {"error": "No valid SEO metadata parsed."}
-                self.wfile.write(json.dumps(error).encode())
-                return
+                with span("fill"):
+                    fill_seo_sheet(ws, rows)
 
-            start_row = 10
-            for idx, (brand, url, title, title_count, meta, meta_count) in enumerate(rows):
-                row = start_row + idx
-                ws.cell(row=row, column=2, value=brand)
-                ws.cell(row=row, column=3, value=url)
-                ws.cell(row=row, column=4, value=title)
-                ws.cell(row=row, column=5, value=title_count)
-                ws.cell(row=row, column=6, value=meta)
-                ws.cell(row=row, column=7, value=meta_count)
-            debug("Excel cells filled")
-
-            output = BytesIO()
-            wb.save(output)
-            file_bytes = output.getvalue()
-            debug(f"Workbook saved to BytesIO, length: {len(file_bytes)} bytes")
-
-            self.send_response(200)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            self.send_header('Content-Disposition', 'attachment; filename=SEO_Metadata.xlsx')
-            self.end_headers()
-            self.wfile.write(file_bytes)
+                with span("save"):
+                    output = BytesIO()
+                    wb.save(output)
+                    file_bytes = output.getvalue()
+                debug(f"Workbook saved to BytesIO, length: {len(file_bytes)} bytes")
         except Exception as e:
-            self.send_response(500)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            error = {"error": str(e)}
-            self.wfile.write(json.dumps(error).encode())
+            self._error(500, str(e))
+            return
+
+        with span("cache_store"):
+            export_cache.put(etag, file_bytes)
+        self._send_export(file_bytes, fmt, etag, "MISS")
 
     def do_OPTIONS(self):
         debug("Handling OPTIONS preflight")
@@ -1,23 +1,31 @@
 import json
 import os
 import sys
-from http.server import BaseHTTPRequestHandler
+
+# Add project root to Python path (need to go up 3 levels from vercel/api/test/)
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from _helper.timing import TimedRequestHandler
 
 # from faker import Faker
 
 # fake = Faker()
 
-class handler(BaseHTTPRequestHandler):
+class handler(TimedRequestHandler):
     def do_GET(self):
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-
         response_data = {
             "message": "this is a test response",
             "method": "GET",
             "timestamp": str(os.environ.get('VERCEL_REQUEST_TIME', 'not available'))
         }
 
-        self.wfile.write(json.dumps(response_data, indent=2).encode())
+        body = json.dumps(response_data, indent=2).encode()
+
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
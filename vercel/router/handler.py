@@ -0,0 +1,13 @@
+import os
+import sys
+
+# Add project root to Python path (need to go up 2 levels from vercel/router/)
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from _helper.router import RouterHandler
+
+# Single function serving every /api/... route; deployed with vercel.router.json
+class handler(RouterHandler):
+    pass